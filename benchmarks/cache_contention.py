@@ -0,0 +1,96 @@
+"""
+Benchmark concurrent reads of a cached dataset.
+
+Starts an increasing number of worker processes which all call
+``openml.datasets.get_dataset`` for the same, completely cached dataset and
+reports the number of calls per second. As cache hits only take a shared
+lock, the throughput should scale with the number of workers (up to the
+number of CPU cores).
+
+The dataset is copied from the test files, no connection to a server is
+needed::
+
+    python benchmarks/cache_contention.py --workers 1 2 4 8 --duration 5
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import openml
+
+
+STATIC_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'tests', 'files')
+SERVER = 'https://test.openml.org/api/v1/xml'
+DATASET_ID = 2
+
+
+def _configure(cache_dir):
+    openml.config.server = SERVER
+    openml.config.cache_directory = cache_dir
+    # Measure the disk cache, not the in-memory cache
+    openml.config.memory_cache_size = 0
+
+
+def _populate_cache(cache_dir):
+    _configure(cache_dir)
+    did_cache_dir = openml.utils._create_cache_directory_for_id(
+        'datasets', DATASET_ID,
+    )
+    static_did_dir = os.path.join(STATIC_CACHE_DIR, 'org', 'openml', 'test',
+                                  'datasets', str(DATASET_ID))
+    for filename in ('description.xml', 'features.xml', 'qualities.xml',
+                     'dataset.arff'):
+        shutil.copy(os.path.join(static_did_dir, filename), did_cache_dir)
+    openml.utils.rebuild_cache_index()
+    # Creates the binary cache of the dataset
+    openml.datasets.get_dataset(DATASET_ID)
+
+
+def _worker(args):
+    cache_dir, start, duration = args
+    _configure(cache_dir)
+    while time.time() < start:
+        time.sleep(0.001)
+    calls = 0
+    while time.time() < start + duration:
+        openml.datasets.get_dataset(DATASET_ID)
+        calls += 1
+    return calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=[1, 2, 4, 8, 16])
+    parser.add_argument('--duration', type=float, default=5,
+                        help='Seconds to run each measurement.')
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        _populate_cache(cache_dir)
+        print('%8s %12s %12s' % ('workers', 'calls/s', 'speedup'))
+        baseline = None
+        for n_workers in args.workers:
+            pool = multiprocessing.Pool(n_workers)
+            # Give all workers time to start before measuring
+            start = time.time() + 1
+            calls = sum(pool.map(
+                _worker, [(cache_dir, start, args.duration)] * n_workers))
+            pool.close()
+            pool.join()
+            throughput = calls / args.duration
+            if baseline is None:
+                baseline = throughput
+            print('%8d %12.1f %12.2f' % (n_workers, throughput,
+                                         throughput / baseline))
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,14 @@
+import gzip
 import io
 import os
 import requests
+import tempfile
+import threading
+import uuid
 import warnings
 
 import arff
+import six
 import xmltodict
 
 from . import config
@@ -11,8 +16,23 @@ from .exceptions import (OpenMLServerError, OpenMLServerException,
                          OpenMLServerNoResult)
 
 
+# Number of rows of an ARFF file which are decoded to validate it before
+# uploading it (unless the full file is validated)
+ARFF_VALIDATION_SAMPLE_SIZE = 1000
+# Size of the chunks in which request bodies are read from disk
+UPLOAD_CHUNK_SIZE = 2 ** 16
+
+# Size in bytes of the last response received by each thread, used to adapt
+# the page size of listings
+_last_response = threading.local()
+# Timeout in seconds of the requests of each thread, only set while a page of
+# a listing is requested (see ``config.listing_timeout``)
+_request_timeout = threading.local()
+
+
 def _perform_api_call(call, data=None, file_dictionary=None,
-                      file_elements=None, add_authentication=True):
+                      file_elements=None, add_authentication=True,
+                      full_validation=False):
     """
     Perform an API call at the OpenML server.
     return self._read_url(url, data=data, filePath=filePath,
@@ -29,9 +49,13 @@ def _perform_api_call(call, data=None, file_dictionary=None,
         server.
     file_elements : dict
         Mapping of {filename: str} of strings which should be uploaded as
-        files to the server.
+        files to the server. Instead of a string, a file object or a
+        generator of strings can be given, which are streamed to the server.
     add_authentication : bool
         Whether to add authentication (api key) to the request.
+    full_validation : bool
+        Whether to decode a dataset file completely before uploading it.
+        Otherwise, only its header and a sample of its rows are decoded.
 
     Returns
     -------
@@ -49,7 +73,8 @@ def _perform_api_call(call, data=None, file_dictionary=None,
 
     if file_dictionary is not None or file_elements is not None:
         return _read_url_files(url, data=data, file_dictionary=file_dictionary,
-                               file_elements=file_elements)
+                               file_elements=file_elements,
+                               full_validation=full_validation)
     return _read_url(url, data)
 
 
@@ -65,35 +90,42 @@ def _file_id_to_url(file_id, filename=None):
     return url
 
 
-def _read_url_files(url, data=None, file_dictionary=None, file_elements=None):
+def _read_url_files(url, data=None, file_dictionary=None, file_elements=None,
+                    full_validation=False):
     """do a post request to url with data, file content of
-    file_dictionary and sending file_elements as files"""
+    file_dictionary and sending file_elements as files
+
+    The request body is streamed, files are read in chunks while they are
+    sent to the server."""
 
     data = {} if data is None else data
     data['api_key'] = config.apikey
     if file_elements is None:
         file_elements = {}
+    opened_files = []
     if file_dictionary is not None:
         for key, path in file_dictionary.items():
             path = os.path.abspath(path)
             if os.path.exists(path):
-                try:
-                    if key is 'dataset':
-                        # check if arff is valid?
-                        decoder = arff.ArffDecoder()
-                        with io.open(path, encoding='utf8') as fh:
-                            decoder.decode(fh, encode_nominal=True)
-                except:
-                    raise ValueError("The file you have provided is not a valid arff file")
-
+                if key == 'dataset':
+                    _check_arff(path, full=full_validation)
                 file_elements[key] = open(path, 'rb')
+                opened_files.append(file_elements[key])
 
             else:
                 raise ValueError("File doesn't exist")
 
+    body = _MultipartBody(data, file_elements,
+                          compression=config.upload_compression)
     # Using requests.post sets header 'Accept-encoding' automatically to
     # 'gzip,deflate'
-    response = requests.post(url, data=data, files=file_elements)
+    try:
+        response = requests.post(url, data=body,
+                                 headers={'Content-Type': body.content_type})
+    finally:
+        body.close()
+        for fh in opened_files:
+            fh.close()
     if response.status_code != 200:
         raise _parse_server_exception(response, url=url)
     if 'Content-Encoding' not in response.headers or \
@@ -102,20 +134,250 @@ def _read_url_files(url, data=None, file_dictionary=None, file_elements=None):
     return response.text
 
 
+def _check_arff(path, full=False, sample_size=ARFF_VALIDATION_SAMPLE_SIZE):
+    """Check that a file is a valid ARFF file before uploading it.
+
+    Unless ``full`` is given, only the header and ``sample_size`` rows are
+    decoded: the first half of them from the beginning of the data section,
+    the other half from evenly spaced positions of the remaining file. The
+    file is thereby never read completely.
+
+    Parameters
+    ----------
+    path : str
+
+    full : bool
+        Whether to decode the complete file.
+
+    sample_size : int
+
+    Raises
+    ------
+    ValueError
+        If the file could not be decoded.
+    """
+    decoder = arff.ArffDecoder()
+    try:
+        if full:
+            with io.open(path, encoding='utf8') as fh:
+                decoder.decode(fh, encode_nominal=True)
+            return
+
+        lines = []
+        with io.open(path, 'rb') as fh:
+            while True:
+                line = fh.readline()
+                if not line:
+                    raise ValueError('No data section.')
+                lines.append(line)
+                if line.strip()[:5].lower() == b'@data':
+                    break
+
+            def _is_row(line):
+                line = line.strip()
+                return len(line) > 0 and not line.startswith(b'%')
+
+            n_head = sample_size // 2
+            while n_head > 0:
+                line = fh.readline()
+                if not line:
+                    break
+                if _is_row(line):
+                    lines.append(line)
+                    n_head -= 1
+
+            start = fh.tell()
+            end = os.fstat(fh.fileno()).st_size
+            n_tail = sample_size - sample_size // 2
+            if end > start and n_head == 0:
+                step = (end - start) / float(n_tail)
+                for i in range(n_tail - 1):
+                    fh.seek(int(start + i * step))
+                    # Skip the rest of the row the position points into
+                    fh.readline()
+                    line = fh.readline()
+                    if _is_row(line):
+                        lines.append(line)
+                # Always check the last row, which is broken if the file
+                # was truncated
+                fh.seek(max(start, end - UPLOAD_CHUNK_SIZE))
+                rows = [line for line in fh.read().splitlines()[1:]
+                        if _is_row(line)]
+                lines.extend(rows[-1:])
+        text = b''.join(line if line.endswith(b'\n') else line + b'\n'
+                        for line in lines)
+        decoder.decode(text.decode('utf8'), encode_nominal=True)
+    except Exception:
+        raise ValueError("The file you have provided is not a valid arff file")
+
+
+class _MultipartBody(object):
+    """A multipart/form-data request body which is read lazily.
+
+    Behaves like a file of known length, so that requests sends it in chunks
+    with a ``Content-Length`` header. File objects are read while the body is
+    sent, generators (and iterators) are first written to temporary files to
+    determine their length. ARFF files are optionally compressed on their
+    way to the temporary file.
+
+    Parameters
+    ----------
+    fields : dict
+        Mapping of {name: str} of form fields.
+
+    files : dict
+        Mapping of {name: value} of files. Values are strings, file objects,
+        generators of strings or tuples ``(filename, value)``.
+
+    compression : str
+        Compression of files with the suffix ``.arff``, either ``none`` or
+        ``gzip``. Compressed files get the additional suffix ``.gz``.
+
+    Notes
+    -----
+    It is not verified that the server accepts gzip compressed ARFF files
+    (sent as ``<name>.arff.gz`` with the content type ``application/gzip``),
+    there is no test against the test server. Compression is therefore only
+    used if ``config.upload_compression`` is set to ``gzip`` explicitly.
+    """
+
+    def __init__(self, fields, files, compression='none'):
+        if compression not in ('none', 'gzip'):
+            raise ValueError('Unknown upload compression: %s' % compression)
+        self.boundary = uuid.uuid4().hex
+        self.content_type = 'multipart/form-data; boundary=%s' % self.boundary
+        self._temporary_files = []
+        self._parts = []
+        for name, value in sorted(fields.items()):
+            if value is None:
+                continue
+            self._add_part(name, None, _to_bytes(value))
+        for name, value in sorted(files.items()):
+            if isinstance(value, tuple):
+                filename, value = value[:2]
+            else:
+                filename = os.path.basename(getattr(value, 'name', name))
+            if compression == 'gzip' and filename.endswith('.arff'):
+                self._add_part(name, filename + '.gz',
+                               self._to_readable(value, compress=True),
+                               content_type='application/gzip')
+            else:
+                self._add_part(name, filename, self._to_readable(value))
+        self._parts.append(_to_bytes('--%s--\r\n' % self.boundary))
+        self._length = sum(_get_size(part) for part in self._parts)
+        self._current = 0
+
+    def _add_part(self, name, filename, content, content_type=None):
+        header = '--%s\r\nContent-Disposition: form-data; name="%s"' % (
+            self.boundary, name)
+        if filename is not None:
+            header += '; filename="%s"' % filename
+        if content_type is not None:
+            header += '\r\nContent-Type: %s' % content_type
+        self._parts.append(_to_bytes(header + '\r\n\r\n'))
+        self._parts.append(content)
+        self._parts.append(b'\r\n')
+
+    def _to_readable(self, value, compress=False):
+        if not compress:
+            if isinstance(value, (six.binary_type, six.text_type)):
+                return _to_bytes(value)
+            if hasattr(value, 'read'):
+                return value
+        fh = tempfile.TemporaryFile()
+        self._temporary_files.append(fh)
+        if compress:
+            out = gzip.GzipFile(filename='', mode='wb', fileobj=fh,
+                                compresslevel=6)
+        else:
+            out = fh
+        for chunk in _iter_chunks(value):
+            out.write(chunk)
+        if compress:
+            # Does not close fh
+            out.close()
+        fh.seek(0)
+        return fh
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._length
+        chunks = []
+        while size > 0 and self._current < len(self._parts):
+            part = self._parts[self._current]
+            if isinstance(part, six.binary_type):
+                chunk = part[:size]
+                if len(chunk) == len(part):
+                    self._current += 1
+                else:
+                    self._parts[self._current] = part[len(chunk):]
+            else:
+                chunk = _to_bytes(part.read(min(size, UPLOAD_CHUNK_SIZE)))
+                if len(chunk) == 0:
+                    self._current += 1
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+    def close(self):
+        for fh in self._temporary_files:
+            fh.close()
+        self._temporary_files = []
+
+
+def _iter_chunks(value):
+    """Iterate over a string, file object or generator as byte strings."""
+    if isinstance(value, (six.binary_type, six.text_type)):
+        yield _to_bytes(value)
+    elif hasattr(value, 'read'):
+        while True:
+            chunk = value.read(UPLOAD_CHUNK_SIZE)
+            if len(chunk) == 0:
+                break
+            yield _to_bytes(chunk)
+    else:
+        for chunk in value:
+            yield _to_bytes(chunk)
+
+
+def _to_bytes(value):
+    if isinstance(value, six.text_type):
+        return value.encode('utf8')
+    if isinstance(value, six.binary_type):
+        return value
+    return _to_bytes(six.text_type(value))
+
+
+def _get_size(part):
+    """Remaining number of bytes of a byte string or file object."""
+    if isinstance(part, six.binary_type):
+        return len(part)
+    position = part.tell()
+    part.seek(0, os.SEEK_END)
+    size = part.tell() - position
+    part.seek(position)
+    return size
+
+
 def _read_url(url, data=None):
 
     data = {} if data is None else data
     if config.apikey is not None:
         data['api_key'] = config.apikey
+    timeout = getattr(_request_timeout, 'seconds', None)
 
     if len(data) == 0 or (len(data) == 1 and 'api_key' in data):
         # do a GET
-        response = requests.get(url, params=data)
+        response = requests.get(url, params=data, timeout=timeout)
     else: # an actual post request
         # Using requests.post sets header 'Accept-encoding' automatically to
         #  'gzip,deflate'
-        response = requests.post(url, data=data)
+        response = requests.post(url, data=data, timeout=timeout)
 
+    _last_response.size = len(response.content)
     if response.status_code != 200:
         raise _parse_server_exception(response, url=url)
     if 'Content-Encoding' not in response.headers or \
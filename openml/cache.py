@@ -0,0 +1,1260 @@
+"""
+Bookkeeping for the OpenML cache directory.
+
+Every cached entity (dataset, task, run, setup) lives in its own directory
+``<cache directory>/<entity type>/<entity id>``. This module keeps an index of
+these directories in a small SQLite database, tracking their files, size on
+disk, checksum, when they were fetched and last accessed, and a few parsed key
+fields (e.g. the name of a dataset). Listing the cache is thereby a query of
+the index instead of a scan of the cache directory; only entity directories
+which were added, removed or changed by other means than this package (as
+found by their modification time) are scanned again. The index is also used to
+enforce a limit on the size of the cache (``config.cache_size_limit``) by
+evicting the least recently (or least frequently) used entities.
+
+Dataset files are additionally stored once per checksum in a blob store
+(``<cache directory>/blobs``, shared by all servers). The dataset directories
+hold hard links to these blobs, so identical files of different dataset
+versions or servers only use disk space once. The size of an entity in the
+index only covers its own files, the blobs it links are recorded separately.
+Every blob counts once towards the size of the cache of each server whose
+entities link it.
+
+In addition, the most recently used parsed entities are kept in memory (up to
+``config.memory_cache_size`` of them) so that fetching the same entity
+repeatedly does not parse its description again.
+
+The command ``openml-cache`` inspects or prunes the cache from the command
+line, see ``openml-cache --help``.
+"""
+import argparse
+import collections
+import contextlib
+import copy
+import errno
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+import weakref
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import fasteners
+import six
+
+import openml
+from . import config
+
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE_NAME = 'cache_index.sqlite'
+# Increase this whenever the layout of the index changes, the index is then
+# rebuilt from the cache directory.
+INDEX_VERSION = 5
+
+CACHED_ENTITY_TYPES = ('datasets', 'tasks', 'runs', 'setups', 'flows')
+
+BLOBS_DIR_NAME = 'blobs'
+
+# Names of the reader/writer locks of entities. A shared lock is held while an
+# entity is read from the cache, an exclusive lock while it is downloaded or
+# evicted.
+ENTITY_LOCK_NAMES = {
+    'datasets': 'datasets.functions.get_dataset:%d',
+    'tasks': 'task.functions.get_task:%d',
+    'flows': 'flows.functions.get_flow:%d',
+}
+
+# Locks which are currently used by this process, by lock file
+_entity_locks = weakref.WeakValueDictionary()
+_entity_locks_lock = threading.Lock()
+
+EVICTION_POLICIES = {
+    'lru': 'last_access ASC',
+    'lfu': 'access_count ASC, last_access ASC',
+}
+
+# Calls which are currently fetching an entity, see ``_single_flight``
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+# Minimal time in seconds between two recorded accesses of an entity which is
+# read from the cache, see ``_touch``
+TOUCH_INTERVAL = 60
+_last_touched = {}
+_last_touched_lock = threading.Lock()
+
+# Fraction of ``config.cache_size_limit`` which this process has to add to the
+# cache before the limit is enforced again, see ``_record_access``
+PRUNE_THRESHOLD = 0.05
+_added_since_prune = 0
+_added_since_prune_lock = threading.Lock()
+
+# In-memory cache of parsed entities. Maps (server, entity type, entity id) to
+# (cache directory, entity, expiry time), the most recently used entity comes
+# last.
+_memory_cache = collections.OrderedDict()
+_memory_cache_counts = collections.Counter()
+_memory_cache_lock = threading.Lock()
+
+
+def _get_index_file():
+    return os.path.join(config.get_cache_directory(), INDEX_FILE_NAME)
+
+
+@contextlib.contextmanager
+def _connect():
+    """Open the cache index, creating or rebuilding it if necessary.
+
+    The connection is committed if the block exits without an exception.
+    """
+    cache_dir = config.get_cache_directory()
+    try:
+        os.makedirs(cache_dir)
+    except (IOError, OSError):
+        pass
+
+    connection = sqlite3.connect(_get_index_file(), timeout=60)
+    try:
+        version = connection.execute('PRAGMA user_version').fetchone()[0]
+        if version != INDEX_VERSION:
+            _create_index(connection)
+        yield connection
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def _create_index(connection):
+    """Create the index tables and fill them from the cache directory."""
+    with connection:
+        connection.execute('DROP TABLE IF EXISTS entities')
+        connection.execute(
+            'CREATE TABLE entities ('
+            ' entity_type TEXT NOT NULL,'
+            ' entity_id INTEGER NOT NULL,'
+            ' size INTEGER NOT NULL DEFAULT 0,'
+            ' last_access REAL NOT NULL,'
+            ' access_count INTEGER NOT NULL DEFAULT 0,'
+            ' files TEXT NOT NULL DEFAULT \'[]\','
+            ' checksum TEXT,'
+            ' fetch_time REAL,'
+            ' fields TEXT,'
+            ' directory_mtime REAL,'
+            ' blobs TEXT NOT NULL DEFAULT \'{}\','
+            ' PRIMARY KEY (entity_type, entity_id))'
+        )
+        connection.execute('CREATE INDEX entities_last_access '
+                           'ON entities (last_access)')
+        # Ids of server objects which were looked up by their content. They
+        # do not depend on the cache directory and are kept on a rebuild.
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS flow_ids ('
+            ' name TEXT NOT NULL,'
+            ' external_version TEXT NOT NULL,'
+            ' flow_id INTEGER NOT NULL,'
+            ' PRIMARY KEY (name, external_version))'
+        )
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS setup_ids ('
+            ' flow_id INTEGER NOT NULL,'
+            ' parameters_hash TEXT NOT NULL,'
+            ' setup_id INTEGER NOT NULL,'
+            ' PRIMARY KEY (flow_id, parameters_hash))'
+        )
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS run_ids ('
+            ' task_id INTEGER NOT NULL,'
+            ' setup_id INTEGER NOT NULL,'
+            ' run_ids TEXT NOT NULL,'
+            ' fetch_time REAL NOT NULL,'
+            ' PRIMARY KEY (task_id, setup_id))'
+        )
+        _scan_cache_directory(connection)
+        connection.execute('PRAGMA user_version = %d' % INDEX_VERSION)
+
+
+def _scan_cache_directory(connection):
+    """Add all entity directories found on disk to the index."""
+    for entity_type in CACHED_ENTITY_TYPES:
+        _sync_entity_type(connection, entity_type)
+
+
+def _sync_entity_type(connection, entity_type):
+    """Update the index entries of all entities of one type whose directories
+    were added, removed or changed since they were indexed.
+
+    Only the entity directories are inspected, an entity is scanned again if
+    the modification time of its directory changed (i.e. files were added,
+    removed or replaced).
+    """
+    type_dir = os.path.join(config.get_cache_directory(), entity_type)
+    directory_mtimes = {}
+    if os.path.isdir(type_dir):
+        for directory_name in os.listdir(type_dir):
+            try:
+                entity_id = int(directory_name)
+                directory_mtimes[entity_id] = os.stat(
+                    os.path.join(type_dir, directory_name)).st_mtime
+            except (ValueError, IOError, OSError):
+                continue
+
+    indexed = dict(connection.execute(
+        'SELECT entity_id, directory_mtime FROM entities '
+        'WHERE entity_type = ?', (entity_type, ),
+    ).fetchall())
+    for entity_id in set(indexed) - set(directory_mtimes):
+        connection.execute(
+            'DELETE FROM entities WHERE entity_type = ? AND entity_id = ?',
+            (entity_type, entity_id),
+        )
+    for entity_id, directory_mtime in directory_mtimes.items():
+        if entity_id not in indexed or \
+                indexed[entity_id] != directory_mtime:
+            _scan_entity_directory(connection, entity_type, entity_id,
+                                   directory_mtime)
+
+
+def _scan_entity_directory(connection, entity_type, entity_id,
+                           directory_mtime):
+    """Index the files of an entity directory.
+
+    As access times are not reliably tracked by all file systems, the last
+    modification time of a new entity is used as its last access time. Parsed
+    fields and checksums are only known for entities which were accessed
+    through this package since.
+    """
+    entity_dir = _get_entity_directory(entity_type, entity_id)
+    size, blobs, last_modified, files = _get_directory_usage(entity_dir)
+    connection.execute(
+        'INSERT OR IGNORE INTO entities (entity_type, entity_id, '
+        'last_access, fetch_time) VALUES (?, ?, ?, ?)',
+        (entity_type, entity_id, last_modified, last_modified),
+    )
+    # The files may have been replaced, the parsed fields are outdated
+    connection.execute(
+        'UPDATE entities SET size = ?, blobs = ?, files = ?, fields = NULL, '
+        'directory_mtime = ? WHERE entity_type = ? AND entity_id = ?',
+        (size, json.dumps(blobs), json.dumps(files), directory_mtime,
+         entity_type, entity_id),
+    )
+
+
+def _get_directory_usage(directory):
+    """Return the size in bytes, the linked blobs, the last modification time
+    and the sorted relative paths of the files in ``directory``.
+
+    Files with further hard links (i.e. blobs, see ``_store_blob``) do not
+    count towards the size. They are returned as a mapping of
+    ``'<device>:<inode>'`` to their size instead, so that every blob is
+    counted once.
+    """
+    size = 0
+    blobs = {}
+    last_modified = 0
+    files = []
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            try:
+                stat = os.stat(path)
+            except (IOError, OSError):
+                # File was removed concurrently
+                continue
+            if stat.st_nlink <= 1:
+                size += stat.st_size
+            else:
+                blobs['%d:%d' % (stat.st_dev, stat.st_ino)] = stat.st_size
+            last_modified = max(last_modified, stat.st_mtime)
+            files.append(os.path.relpath(path, directory).replace(os.sep, '/'))
+    return size, blobs, last_modified, sorted(files)
+
+
+def _get_entity_directory(entity_type, entity_id):
+    return os.path.join(config.get_cache_directory(), entity_type,
+                        str(entity_id))
+
+
+class _InterProcessLock(object):
+    """Shared or exclusive lock of a lock file, held by at most one thread.
+
+    Uses ``flock`` where available, which supports shared locks on all Python
+    versions supported by this package. On other platforms (i.e. Windows)
+    shared locks are exclusive as well.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._fallback = None
+        if fcntl is None:
+            self._fallback = fasteners.InterProcessLock(path)
+
+    def acquire(self, shared=False, blocking=True):
+        if self._fallback is not None:
+            return self._fallback.acquire(blocking=blocking)
+        lock_file = open(self.path, 'a')
+        operation = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        if not blocking:
+            operation |= fcntl.LOCK_NB
+        try:
+            fcntl.flock(lock_file.fileno(), operation)
+        except (IOError, OSError) as e:
+            lock_file.close()
+            if not blocking and e.errno in (errno.EAGAIN, errno.EACCES):
+                return False
+            raise
+        self._file = lock_file
+        return True
+
+    def release(self):
+        if self._fallback is not None:
+            self._fallback.release()
+            return
+        # Closing the file releases the lock
+        self._file.close()
+        self._file = None
+
+
+class _ReaderWriterLock(object):
+    """Reader/writer lock between the threads of this process and, through a
+    lock file, between processes.
+
+    Lock files can only be locked once per process, therefore the lock file
+    is held as long as any thread of this process holds the lock. The lock
+    file is acquired without holding ``_condition``, so that threads waiting
+    for another process do not block the threads of this process; other
+    threads wait while ``_acquiring`` is set.
+    """
+
+    def __init__(self, path):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._acquiring = False
+        self._process_lock = _InterProcessLock(path)
+
+    def acquire(self, shared=False, blocking=True):
+        with self._condition:
+            if shared:
+                while self._writer or self._acquiring:
+                    if not blocking:
+                        return False
+                    self._condition.wait()
+                if self._readers > 0:
+                    self._readers += 1
+                    return True
+                self._acquiring = True
+            else:
+                while self._writer or self._readers > 0 or self._acquiring:
+                    if not blocking:
+                        return False
+                    self._condition.wait()
+                self._writer = True
+
+        acquired = False
+        try:
+            acquired = self._process_lock.acquire(shared=shared,
+                                                  blocking=blocking)
+        finally:
+            with self._condition:
+                if shared:
+                    self._acquiring = False
+                    if acquired:
+                        self._readers += 1
+                elif not acquired:
+                    self._writer = False
+                self._condition.notify_all()
+        return acquired
+
+    def release(self, shared=False):
+        with self._condition:
+            if shared:
+                self._readers -= 1
+                if self._readers > 0:
+                    return
+            self._process_lock.release()
+            self._writer = False
+            self._condition.notify_all()
+
+
+def _get_entity_lock(entity_type, entity_id):
+    path = os.path.join(openml.utils._create_lockfiles_dir(),
+                        ENTITY_LOCK_NAMES[entity_type] % entity_id)
+    with _entity_locks_lock:
+        lock = _entity_locks.get(path)
+        if lock is None:
+            lock = _ReaderWriterLock(path)
+            _entity_locks[path] = lock
+        return lock
+
+
+@contextlib.contextmanager
+def _lock_entity(entity_type, entity_id, shared=False):
+    """Lock an entity against concurrent downloads and eviction.
+
+    Shared locks are held by readers of the cache, many processes and threads
+    can hold them at the same time. Exclusive locks are held for downloading
+    and evicting an entity.
+
+    This function is thread/multiprocessing safe.
+
+    Parameters
+    ----------
+    entity_type : str
+        One of ``ENTITY_LOCK_NAMES``.
+
+    entity_id : int
+
+    shared : bool
+        Whether to take a shared instead of an exclusive lock.
+    """
+    lock = _get_entity_lock(entity_type, entity_id)
+    lock.acquire(shared=shared)
+    try:
+        yield
+    finally:
+        lock.release(shared=shared)
+
+
+def _register_directory(entity_type, entity_id):
+    """Add a newly created, still empty entity directory to the index."""
+    if entity_type not in CACHED_ENTITY_TYPES:
+        return
+    now = time.time()
+    with _connect() as connection:
+        connection.execute(
+            'INSERT OR IGNORE INTO entities (entity_type, entity_id, size, '
+            'last_access, access_count, fetch_time) VALUES (?, ?, 0, ?, 0, ?)',
+            (entity_type, entity_id, now, now),
+        )
+
+
+def _record_access(entity_type, entity_id, fields=None, checksum=None):
+    """Record that an entity was written to the cache.
+
+    Updates the files, size and access statistics of the entity. Must be
+    called after all files of the entity were written, reads from the cache
+    are recorded by ``_touch`` instead. Once this process added more than
+    ``PRUNE_THRESHOLD`` times the cache size limit to the cache, the limit is
+    enforced.
+
+    Parameters
+    ----------
+    entity_type : str
+        One of ``CACHED_ENTITY_TYPES``.
+
+    entity_id : int
+
+    fields : dict, optional
+        JSON serializable key fields of the entity, which can later be
+        retrieved with ``_get_cached_entities`` without parsing any file.
+
+    checksum : str, optional
+        Checksum of the main file of the entity as given by the server.
+    """
+    entity_dir = _get_entity_directory(entity_type, entity_id)
+    directory_mtime = os.stat(entity_dir).st_mtime
+    size, blobs, last_modified, files = _get_directory_usage(entity_dir)
+    with _connect() as connection:
+        connection.execute(
+            'INSERT OR IGNORE INTO entities (entity_type, entity_id, size, '
+            'last_access, access_count) VALUES (?, ?, 0, 0, 0)',
+            (entity_type, entity_id),
+        )
+        connection.execute(
+            'UPDATE entities SET size = ?, blobs = ?, last_access = ?, '
+            'access_count = access_count + 1, files = ?, fetch_time = ?, '
+            'directory_mtime = ? WHERE entity_type = ? AND entity_id = ?',
+            (size, json.dumps(blobs), time.time(), json.dumps(files),
+             last_modified, directory_mtime, entity_type, entity_id),
+        )
+        if fields is not None:
+            connection.execute(
+                'UPDATE entities SET fields = ? '
+                'WHERE entity_type = ? AND entity_id = ?',
+                (json.dumps(fields), entity_type, entity_id),
+            )
+        if checksum is not None:
+            connection.execute(
+                'UPDATE entities SET checksum = ? '
+                'WHERE entity_type = ? AND entity_id = ?',
+                (checksum, entity_type, entity_id),
+            )
+
+    global _added_since_prune
+    size += sum(blobs.values())
+    if config.cache_size_limit is None:
+        return
+    with _added_since_prune_lock:
+        _added_since_prune += size
+        if _added_since_prune < PRUNE_THRESHOLD * config.cache_size_limit:
+            return
+        _added_since_prune = 0
+    prune_cache(config.cache_size_limit, keep=[(entity_type, entity_id)])
+
+
+def _touch(entity_type, entity_id):
+    """Record that an entity was read from the cache without changing it.
+
+    Unlike ``_record_access`` this does not look at the files of the entity
+    and does not enforce the cache size limit. To not contend for the index,
+    an entity is touched at most once every ``TOUCH_INTERVAL`` seconds by
+    each process.
+    """
+    key = (_get_index_file(), entity_type, entity_id)
+    now = time.time()
+    with _last_touched_lock:
+        if _last_touched.get(key, 0) > now - TOUCH_INTERVAL:
+            return
+        _last_touched[key] = now
+    with _connect() as connection:
+        connection.execute(
+            'UPDATE entities SET last_access = ?, '
+            'access_count = access_count + 1 '
+            'WHERE entity_type = ? AND entity_id = ?',
+            (now, entity_type, entity_id),
+        )
+
+
+def _forget(entity_type, entity_id):
+    """Remove an entity from the index and the in-memory cache (but not from
+    disk)."""
+    clear_memory_cache(entity_type, entity_id)
+    with _connect() as connection:
+        connection.execute(
+            'DELETE FROM entities WHERE entity_type = ? AND entity_id = ?',
+            (entity_type, entity_id),
+        )
+
+
+def _set_fields(entity_type, entity_id, fields):
+    """Store the parsed key fields of an entity which is already indexed."""
+    with _connect() as connection:
+        connection.execute(
+            'UPDATE entities SET fields = ? '
+            'WHERE entity_type = ? AND entity_id = ?',
+            (json.dumps(fields), entity_type, entity_id),
+        )
+
+
+_ENTRY_COLUMNS = ('entity_id, size, last_access, fetch_time, files, checksum, '
+                  'fields')
+
+
+def _row_to_entry(row):
+    entity_id, size, last_access, fetch_time, files, checksum, fields = row
+    return {
+        'entity_id': entity_id,
+        'size': size,
+        'last_access': last_access,
+        'fetch_time': fetch_time,
+        'files': json.loads(files),
+        'checksum': checksum,
+        'fields': json.loads(fields) if fields is not None else None,
+    }
+
+
+def _get_cached_entities(entity_type):
+    """Get the index entries of all cached entities of one type.
+
+    Parameters
+    ----------
+    entity_type : str
+        One of ``CACHED_ENTITY_TYPES``.
+
+    Returns
+    -------
+    OrderedDict
+        Maps the entity ids, in ascending order, to dictionaries with the keys
+        ``entity_id``, ``size``, ``last_access``, ``fetch_time``, ``files``
+        (paths relative to the entity directory), ``checksum`` and ``fields``
+        (``None`` if the entity was not parsed by this package yet).
+    """
+    with _connect() as connection:
+        # Entity directories may have been changed by other means
+        _sync_entity_type(connection, entity_type)
+        rows = connection.execute(
+            'SELECT %s FROM entities WHERE entity_type = ? '
+            'ORDER BY entity_id' % _ENTRY_COLUMNS,
+            (entity_type, ),
+        ).fetchall()
+    return collections.OrderedDict(
+        (row[0], _row_to_entry(row)) for row in rows
+    )
+
+
+def _get_cached_entity(entity_type, entity_id):
+    """Get the index entry of a single entity, see ``_get_cached_entities``.
+
+    Returns ``None`` if the entity is not in the cache.
+    """
+    with _connect() as connection:
+        row = connection.execute(
+            'SELECT %s FROM entities WHERE entity_type = ? AND entity_id = ?'
+            % _ENTRY_COLUMNS,
+            (entity_type, entity_id),
+        ).fetchone()
+    return _row_to_entry(row) if row is not None else None
+
+
+def _get_flow_id(name, external_version):
+    """Return the known server id of a flow, or ``None``."""
+    with _connect() as connection:
+        row = connection.execute(
+            'SELECT flow_id FROM flow_ids '
+            'WHERE name = ? AND external_version = ?',
+            (name, external_version),
+        ).fetchone()
+    return row[0] if row is not None else None
+
+
+def _set_flow_ids(flow_ids):
+    """Remember the server ids of flows.
+
+    Parameters
+    ----------
+    flow_ids : dict
+        Maps tuples ``(name, external_version)`` to flow ids.
+    """
+    with _connect() as connection:
+        connection.executemany(
+            'INSERT OR REPLACE INTO flow_ids (name, external_version, '
+            'flow_id) VALUES (?, ?, ?)',
+            [(name, external_version, flow_id) for (name, external_version),
+             flow_id in flow_ids.items()],
+        )
+
+
+def _get_setup_id(flow_id, parameters_hash):
+    """Return the known server id of a setup, or ``None``."""
+    with _connect() as connection:
+        row = connection.execute(
+            'SELECT setup_id FROM setup_ids '
+            'WHERE flow_id = ? AND parameters_hash = ?',
+            (flow_id, parameters_hash),
+        ).fetchone()
+    return row[0] if row is not None else None
+
+
+def _set_setup_ids(flow_id, setup_ids):
+    """Remember the server ids of setups of a flow.
+
+    Parameters
+    ----------
+    flow_id : int
+
+    setup_ids : dict
+        Maps hashes of the parameter settings to setup ids.
+    """
+    with _connect() as connection:
+        connection.executemany(
+            'INSERT OR REPLACE INTO setup_ids (flow_id, parameters_hash, '
+            'setup_id) VALUES (?, ?, ?)',
+            [(flow_id, parameters_hash, setup_id)
+             for parameters_hash, setup_id in setup_ids.items()],
+        )
+
+
+def _get_run_ids(task_id, setup_id):
+    """Return the ids of the runs of a setup on a task, or ``None`` if they
+    were not looked up within ``config.cache_ttl_run_lookups``."""
+    with _connect() as connection:
+        row = connection.execute(
+            'SELECT run_ids, fetch_time FROM run_ids '
+            'WHERE task_id = ? AND setup_id = ?',
+            (task_id, setup_id),
+        ).fetchone()
+    if row is None:
+        return None
+    ttl = config.cache_ttl_run_lookups
+    if ttl is not None and row[1] + ttl <= time.time():
+        return None
+    return set(json.loads(row[0]))
+
+
+def _set_run_ids(run_ids):
+    """Remember the ids of the runs of setups on tasks.
+
+    Parameters
+    ----------
+    run_ids : dict
+        Maps tuples ``(task_id, setup_id)`` to sets of run ids (which are
+        empty if the setup was not run on the task).
+    """
+    now = time.time()
+    with _connect() as connection:
+        connection.executemany(
+            'INSERT OR REPLACE INTO run_ids (task_id, setup_id, run_ids, '
+            'fetch_time) VALUES (?, ?, ?, ?)',
+            [(task_id, setup_id, json.dumps(sorted(ids)), now)
+             for (task_id, setup_id), ids in run_ids.items()],
+        )
+
+
+def _forget_run_ids(task_id):
+    """Forget the runs of all setups on a task, e.g. after a new run of the
+    task was published."""
+    with _connect() as connection:
+        connection.execute('DELETE FROM run_ids WHERE task_id = ?',
+                           (task_id,))
+
+
+def rebuild_cache_index():
+    """Rebuild the index of the cache directory from scratch.
+
+    Only needs to be called if the cache directory was changed by other means
+    than this package.
+    """
+    with _connect() as connection:
+        _create_index(connection)
+
+
+def cache_stats():
+    """Get statistics about the cache directory of the current server.
+
+    Returns
+    -------
+    dict
+        With keys ``size`` (total size in bytes), ``count`` (number of cached
+        entities), ``size_limit`` (``config.cache_size_limit``),
+        ``blob_size`` (size in bytes of the blobs linked by the cached
+        entities, included in ``size``) and ``entity_types``, which maps each
+        entity type to a dictionary with the keys ``size``, ``count`` and
+        ``last_access`` (timestamp of the most recent access of any entity of
+        this type). The sizes of the entity types do not include the blobs
+        they use.
+    """
+    with _connect() as connection:
+        rows = connection.execute(
+            'SELECT entity_type, SUM(size), COUNT(*), MAX(last_access) '
+            'FROM entities GROUP BY entity_type'
+        ).fetchall()
+        blob_sizes, _ = _get_linked_blobs(connection)
+    blob_size = sum(blob_sizes.values())
+    stats = {
+        'size': blob_size,
+        'count': 0,
+        'size_limit': config.cache_size_limit,
+        'blob_size': blob_size,
+        'entity_types': {},
+    }
+    for entity_type, size, count, last_access in rows:
+        stats['entity_types'][entity_type] = {
+            'size': size,
+            'count': count,
+            'last_access': last_access,
+        }
+        stats['size'] += size
+        stats['count'] += count
+    return stats
+
+
+def prune_cache(max_size=None, policy=None, entity_types=None, keep=None,
+                dry_run=False):
+    """Remove entities from the cache until it is smaller than ``max_size``.
+
+    Entities which are currently in use (i.e. they are being downloaded or
+    read) are skipped.
+
+    Parameters
+    ----------
+    max_size : int, optional
+        Maximal size of the cache in bytes. Defaults to
+        ``config.cache_size_limit``. If both are ``None`` nothing is removed.
+
+    policy : str, optional
+        Which entities to remove first, either ``lru`` (least recently used)
+        or ``lfu`` (least frequently used). Defaults to
+        ``config.cache_eviction_policy``.
+
+    entity_types : iterable, optional
+        Only remove entities of these types (e.g. ``['datasets']``). All types
+        count towards the size of the cache.
+
+    keep : iterable, optional
+        ``(entity_type, entity_id)`` tuples of entities which must not be
+        removed.
+
+    dry_run : bool
+        Only return which entities would be removed.
+
+    Returns
+    -------
+    list
+        ``(entity_type, entity_id)`` tuples of the removed entities.
+    """
+    if max_size is None:
+        max_size = config.cache_size_limit
+    if max_size is None:
+        return []
+    if policy is None:
+        policy = config.cache_eviction_policy
+    if policy not in EVICTION_POLICIES:
+        raise ValueError('Unknown eviction policy %s, must be one of %s' %
+                         (policy, sorted(EVICTION_POLICIES)))
+    keep = set() if keep is None else set(keep)
+
+    with _connect() as connection:
+        blob_sizes, blob_links = _get_linked_blobs(connection)
+        total_size = connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM entities'
+        ).fetchone()[0] + sum(blob_sizes.values())
+        if total_size <= max_size:
+            return []
+        candidates = connection.execute(
+            'SELECT entity_type, entity_id, size, blobs FROM entities '
+            'ORDER BY %s' % EVICTION_POLICIES[policy]
+        ).fetchall()
+
+    removed = []
+    for entity_type, entity_id, size, blobs in candidates:
+        if total_size <= max_size:
+            break
+        if (entity_type, entity_id) in keep:
+            continue
+        if entity_types is not None and entity_type not in entity_types:
+            continue
+        blobs = json.loads(blobs)
+        if not dry_run and not _evict(entity_type, entity_id):
+            continue
+        removed.append((entity_type, entity_id))
+        total_size -= size
+        # Blobs which no other entity of this server links do not count
+        # anymore
+        for blob in blobs:
+            blob_links[blob] -= 1
+            if blob_links[blob] == 0:
+                total_size -= blob_sizes[blob]
+    if removed and not dry_run:
+        remove_unused_blobs()
+    return removed
+
+
+def _evict(entity_type, entity_id):
+    """Remove an entity from disk and from the index.
+
+    Returns
+    -------
+    bool
+        Whether the entity was removed. Is ``False`` if the entity is locked by
+        this or another process.
+    """
+    lock = None
+    if entity_type in ENTITY_LOCK_NAMES:
+        lock = _get_entity_lock(entity_type, entity_id)
+        if not lock.acquire(blocking=False):
+            logger.debug('Not evicting %s %d, it is in use.',
+                         entity_type, entity_id)
+            return False
+    try:
+        entity_dir = _get_entity_directory(entity_type, entity_id)
+        if os.path.exists(entity_dir):
+            shutil.rmtree(entity_dir)
+        _forget(entity_type, entity_id)
+        logger.info('Evicted %s %d from the cache.', entity_type, entity_id)
+    finally:
+        if lock is not None:
+            lock.release()
+    return True
+
+
+class _Call(object):
+    """A call which is shared by all threads requesting the same entity."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exc_info = None
+
+
+def _single_flight(entity_type, entity_id, function, *args, **kwargs):
+    """Call ``function``, sharing the call with all threads of this process
+    which concurrently request the same entity.
+
+    Only the first thread calls ``function``, the other threads wait for it
+    and receive a copy of its result (or its exception).
+
+    Parameters
+    ----------
+    entity_type : str
+
+    entity_id : int
+
+    function : callable
+        Fetches the entity, called with ``args`` and ``kwargs``.
+
+    Returns
+    -------
+    object
+        The return value of ``function``.
+    """
+    key = (config.server, config.get_cache_directory(), entity_type,
+           entity_id)
+    with _in_flight_lock:
+        call = _in_flight.get(key)
+        is_leader = call is None
+        if is_leader:
+            call = _Call()
+            _in_flight[key] = call
+
+    if not is_leader:
+        call.done.wait()
+        if call.exc_info is not None:
+            six.reraise(*call.exc_info)
+        return copy.deepcopy(call.result)
+
+    try:
+        call.result = function(*args, **kwargs)
+        return call.result
+    except BaseException:
+        call.exc_info = sys.exc_info()
+        raise
+    finally:
+        with _in_flight_lock:
+            del _in_flight[key]
+        call.done.set()
+
+
+def _get_memoized(entity_type, entity_id):
+    """Get a copy of a parsed entity from the in-memory cache.
+
+    Parameters
+    ----------
+    entity_type : str
+        One of ``CACHED_ENTITY_TYPES``.
+
+    entity_id : int
+
+    Returns
+    -------
+    object or None
+        ``None`` if the entity is not in the in-memory cache or expired.
+    """
+    key = (config.server, entity_type, entity_id)
+    cache_dir = config.get_cache_directory()
+    with _memory_cache_lock:
+        entry = _memory_cache.get(key)
+        if entry is not None and entry[2] is not None and \
+                entry[2] < time.time():
+            del _memory_cache[key]
+            entry = None
+        # Entities point to files in the cache directory they were read from
+        if entry is None or entry[0] != cache_dir:
+            _memory_cache_counts['misses'] += 1
+            return None
+        _memory_cache_counts['hits'] += 1
+        del _memory_cache[key]
+        _memory_cache[key] = entry
+    return copy.deepcopy(entry[1])
+
+
+def _memoize(entity_type, entity_id, entity, expires=None):
+    """Put a copy of a parsed entity into the in-memory cache.
+
+    The least recently used entities are dropped once the cache holds more
+    than ``config.memory_cache_size`` entities.
+
+    Parameters
+    ----------
+    entity_type : str
+        One of ``CACHED_ENTITY_TYPES``.
+
+    entity_id : int
+
+    entity : object
+
+    expires : float, optional
+        Timestamp after which the entity must be fetched again.
+    """
+    if config.memory_cache_size <= 0:
+        return
+    key = (config.server, entity_type, entity_id)
+    entry = (config.get_cache_directory(), copy.deepcopy(entity), expires)
+    with _memory_cache_lock:
+        _memory_cache.pop(key, None)
+        _memory_cache[key] = entry
+        while len(_memory_cache) > config.memory_cache_size:
+            _memory_cache.popitem(last=False)
+
+
+def _get_expiry_time(filename, ttl):
+    """Get the time at which a cached file must be revalidated.
+
+    Parameters
+    ----------
+    filename : str
+
+    ttl : int or None
+        Time to live of the file in seconds, ``None`` for no limit.
+
+    Returns
+    -------
+    float or None
+        ``None`` if the file never expires.
+    """
+    if ttl is None:
+        return None
+    try:
+        return os.path.getmtime(filename) + ttl
+    except (IOError, OSError):
+        return 0
+
+
+def _is_expired(filename, ttl):
+    """Check whether a cached file is older than ``ttl`` seconds."""
+    expires = _get_expiry_time(filename, ttl)
+    return expires is not None and expires < time.time()
+
+
+def clear_memory_cache(entity_type=None, entity_id=None):
+    """Remove parsed entities from the in-memory cache.
+
+    Calling this function without arguments empties the in-memory cache and
+    resets the counters of ``memory_cache_stats``.
+
+    Parameters
+    ----------
+    entity_type : str, optional
+        Only remove entities of this type, e.g. ``'datasets'``.
+
+    entity_id : int, optional
+        Only remove the entity with this id.
+    """
+    with _memory_cache_lock:
+        for key in list(_memory_cache):
+            if entity_type is not None and key[1] != entity_type:
+                continue
+            if entity_id is not None and key[2] != entity_id:
+                continue
+            del _memory_cache[key]
+        if entity_type is None and entity_id is None:
+            _memory_cache_counts.clear()
+
+
+def memory_cache_stats():
+    """Get statistics about the in-memory cache of parsed entities.
+
+    Returns
+    -------
+    dict
+        With keys ``hits`` and ``misses`` (number of lookups which were
+        served or not served from memory), ``size`` (number of entities in
+        memory) and ``max_size`` (``config.memory_cache_size``).
+    """
+    with _memory_cache_lock:
+        return {
+            'hits': _memory_cache_counts['hits'],
+            'misses': _memory_cache_counts['misses'],
+            'size': len(_memory_cache),
+            'max_size': config.memory_cache_size,
+        }
+
+
+def _get_blob_directory():
+    # Blobs are shared by all servers, therefore they are not stored in the
+    # cache directory of the current server
+    return os.path.join(config.cache_directory, BLOBS_DIR_NAME)
+
+
+def _get_linked_blobs(connection):
+    """Find the blobs linked by the entities of the current server.
+
+    Returns
+    -------
+    tuple
+        A dict which maps every blob to its size in bytes and a
+        ``collections.Counter`` of the number of entities linking each blob.
+    """
+    blob_sizes = {}
+    blob_links = collections.Counter()
+    for blobs, in connection.execute('SELECT blobs FROM entities'):
+        blobs = json.loads(blobs)
+        blob_sizes.update(blobs)
+        blob_links.update(blobs.keys())
+    return blob_sizes, blob_links
+
+
+def _get_blob_file(checksum, suffix=''):
+    return os.path.join(_get_blob_directory(), checksum[:2],
+                        checksum + suffix)
+
+
+def _find_blob(checksum):
+    """Find a blob by its checksum.
+
+    Blobs in the configured compression are preferred, blobs which cannot be
+    read because a compression library is missing are ignored.
+
+    Returns
+    -------
+    tuple or None
+        The path of the blob and its compression suffix, ``None`` if there is
+        no blob with this checksum.
+    """
+    compressions = [config.cache_compression] + \
+        sorted(openml.utils.COMPRESSION_SUFFIXES)
+    for compression in compressions:
+        try:
+            suffix = openml.utils._get_compression_suffix(compression)
+        except ValueError:
+            continue
+        blob_file = _get_blob_file(checksum, suffix)
+        if os.path.exists(blob_file):
+            return blob_file, suffix
+    return None
+
+
+def _link(source, link_name):
+    """Create a hard link, falling back to copying the file if the file system
+    does not support hard links."""
+    try:
+        os.link(source, link_name)
+    except (AttributeError, OSError) as e:
+        if getattr(e, 'errno', None) in (errno.ENOENT, errno.EEXIST):
+            raise
+        shutil.copyfile(source, link_name)
+
+
+def _link_blob(blob_file, filename):
+    """Make a blob available under ``filename``.
+
+    Returns
+    -------
+    bool
+        Whether the file was created, is ``False`` if the blob was removed
+        concurrently.
+    """
+    try:
+        _link(blob_file, filename)
+    except (IOError, OSError) as e:
+        if e.errno != errno.ENOENT:
+            raise
+        return False
+    return True
+
+
+def _store_blob(filename, checksum, suffix=''):
+    """Add a file whose content has the given checksum to the blob store.
+
+    The blob is a hard link to ``filename``. If hard links are not supported
+    the file is not added, as a copy would not save any disk space.
+    """
+    blob_file = _get_blob_file(checksum, suffix)
+    try:
+        os.makedirs(os.path.dirname(blob_file))
+    except (IOError, OSError):
+        pass
+    try:
+        os.link(filename, blob_file)
+    except (AttributeError, OSError) as e:
+        if getattr(e, 'errno', None) != errno.EEXIST:
+            logger.debug('Not storing %s as a blob: %s', filename, e)
+
+
+def remove_unused_blobs(dry_run=False):
+    """Remove blobs which are no longer used by any cached dataset.
+
+    These are the blobs without any further hard link. This is also done
+    after entities were removed by ``prune_cache``.
+
+    Parameters
+    ----------
+    dry_run : bool
+        Only return which blobs would be removed.
+
+    Returns
+    -------
+    list
+        Paths of the removed blobs.
+    """
+    removed = []
+    for root, _, filenames in os.walk(_get_blob_directory()):
+        for filename in filenames:
+            blob_file = os.path.join(root, filename)
+            try:
+                if os.stat(blob_file).st_nlink > 1:
+                    continue
+                if not dry_run:
+                    os.remove(blob_file)
+            except (IOError, OSError):
+                # Blob was removed concurrently
+                continue
+            removed.append(blob_file)
+    return removed
+
+
+def _format_size(size):
+    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
+        if abs(size) < 1024 or unit == 'TB':
+            break
+        size /= 1024.0
+    return '%.1f%s' % (size, unit)
+
+
+def main(argv=None):
+    """Command line interface, see ``openml-cache --help``."""
+    parser = argparse.ArgumentParser(
+        description='Inspect and prune the OpenML cache directory.')
+    parser.add_argument('--cachedir', help='Cache directory to use instead '
+                                           'of the configured one.')
+    parser.add_argument('--server', help='Server whose cache to use instead '
+                                         'of the configured one.')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('stats', help='Show the size of the cache.')
+    prune_parser = subparsers.add_parser(
+        'prune', help='Remove entities until the cache is small enough.')
+    prune_parser.add_argument(
+        'max_size', help='Maximal size of the cache, e.g. 500M or 20G.')
+    prune_parser.add_argument('--policy', choices=sorted(EVICTION_POLICIES))
+    prune_parser.add_argument('--type', action='append', dest='entity_types',
+                              choices=CACHED_ENTITY_TYPES)
+    prune_parser.add_argument('--dry-run', action='store_true')
+    subparsers.add_parser('rebuild', help='Rebuild the index of the cache.')
+    subparsers.add_parser('gc', help='Remove dataset files which are no '
+                                     'longer used.')
+    args = parser.parse_args(argv)
+
+    if args.cachedir is not None:
+        config.set_cache_directory(os.path.expanduser(args.cachedir))
+    if args.server is not None:
+        config.server = args.server
+
+    if args.command == 'prune':
+        removed = prune_cache(config._parse_size(args.max_size),
+                              policy=args.policy,
+                              entity_types=args.entity_types,
+                              dry_run=args.dry_run)
+        for entity_type, entity_id in removed:
+            print('%s %s %d' % ('Would remove' if args.dry_run else 'Removed',
+                                entity_type, entity_id))
+    elif args.command == 'rebuild':
+        rebuild_cache_index()
+    elif args.command == 'gc':
+        for blob_file in remove_unused_blobs():
+            print('Removed %s' % blob_file)
+
+    stats = cache_stats()
+    print('Cache directory %s' % config.get_cache_directory())
+    for entity_type in sorted(stats['entity_types']):
+        type_stats = stats['entity_types'][entity_type]
+        print('  %-10s %6d entities %10s' % (
+            entity_type, type_stats['count'],
+            _format_size(type_stats['size'])))
+    print('  %-10s %15s %10s' % ('blobs', '',
+                                 _format_size(stats['blob_size'])))
+    print('  %-10s %6d entities %10s' % (
+        'total', stats['count'], _format_size(stats['size'])))
+
+
+__all__ = ['cache_stats', 'prune_cache', 'rebuild_cache_index',
+           'clear_memory_cache', 'memory_cache_stats', 'remove_unused_blobs']
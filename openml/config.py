@@ -4,6 +4,7 @@ Stores module level information like the API key, cache directory and the server
 import logging
 import os
 
+import six
 from six import StringIO
 from six.moves import configparser
 from six.moves.urllib_parse import urlparse
@@ -21,6 +22,19 @@ _defaults = {
     'verbosity': 0,
     'cachedir': os.path.expanduser('~/.openml/cache'),
     'avoid_duplicate_runs': 'True',
+    'cache_compression': 'none',
+    'cache_keep_arff': 'True',
+    'cache_size_limit': 'None',
+    'cache_eviction_policy': 'lru',
+    'memory_cache_size': '100',
+    'cache_ttl_description': '1d',
+    'cache_ttl_qualities': '1d',
+    'cache_ttl_run_lookups': '10m',
+    'upload_compression': 'none',
+    'listing_concurrency': '1',
+    'listing_min_batch_size': '100',
+    'listing_max_batch_size': '10000',
+    'listing_timeout': '60',
 }
 
 config_file = os.path.expanduser('~/.openml/config')
@@ -31,6 +45,39 @@ server = ""
 apikey = ""
 # The current cache directory (without the server name)
 cache_directory = ""
+# Compression used for newly cached dataset files, one of
+# {'none', 'gzip', 'lz4', 'zstd'}
+cache_compression = 'none'
+# Whether to keep the dataset ARFF file once the binary cache was created
+cache_keep_arff = True
+# Maximal size of the cache directory in bytes (None for no limit) and which
+# entities to evict first once it is exceeded, one of {'lru', 'lfu'}
+cache_size_limit = None
+cache_eviction_policy = 'lru'
+# Maximal number of parsed datasets, tasks, runs and setups kept in memory
+# (0 disables the in-memory cache)
+memory_cache_size = 100
+# Time in seconds after which cached dataset descriptions and qualities are
+# revalidated with the server (None to never revalidate them)
+cache_ttl_description = 86400
+cache_ttl_qualities = 86400
+# Time in seconds for which the ids of the runs of a task and setup are
+# remembered when checking for duplicate runs (None to never check again)
+cache_ttl_run_lookups = 600
+# Compression of uploaded ARFF files (datasets, predictions and traces), one
+# of {'none', 'gzip'}. Whether the server accepts gzip compressed files is not
+# verified, compression is therefore disabled by default
+upload_compression = 'none'
+# Maximal number of pages of a listing which are requested in parallel
+listing_concurrency = 1
+# Bounds of the number of results requested per page of a listing, which is
+# adapted to the response time and size of the server
+listing_min_batch_size = 100
+listing_max_batch_size = 10000
+# Time in seconds to wait for the server to accept a connection or to send
+# data before requesting a page of a listing fails (None to wait forever).
+# Other requests wait for the server forever.
+listing_timeout = 60
 
 
 def _setup():
@@ -46,6 +93,19 @@ def _setup():
     global server
     global cache_directory
     global avoid_duplicate_runs
+    global cache_compression
+    global cache_keep_arff
+    global cache_size_limit
+    global cache_eviction_policy
+    global memory_cache_size
+    global cache_ttl_description
+    global cache_ttl_qualities
+    global cache_ttl_run_lookups
+    global upload_compression
+    global listing_concurrency
+    global listing_min_batch_size
+    global listing_max_batch_size
+    global listing_timeout
     # read config file, create cache directory
     try:
         os.mkdir(os.path.expanduser('~/.openml'))
@@ -57,6 +117,25 @@ def _setup():
     server = config.get('FAKE_SECTION', 'server')
     cache_directory = os.path.expanduser(config.get('FAKE_SECTION', 'cachedir'))
     avoid_duplicate_runs = config.getboolean('FAKE_SECTION', 'avoid_duplicate_runs')
+    cache_compression = config.get('FAKE_SECTION', 'cache_compression')
+    cache_keep_arff = config.getboolean('FAKE_SECTION', 'cache_keep_arff')
+    cache_size_limit = _parse_size(config.get('FAKE_SECTION', 'cache_size_limit'))
+    cache_eviction_policy = config.get('FAKE_SECTION', 'cache_eviction_policy')
+    memory_cache_size = config.getint('FAKE_SECTION', 'memory_cache_size')
+    cache_ttl_description = _parse_duration(
+        config.get('FAKE_SECTION', 'cache_ttl_description'))
+    cache_ttl_qualities = _parse_duration(
+        config.get('FAKE_SECTION', 'cache_ttl_qualities'))
+    cache_ttl_run_lookups = _parse_duration(
+        config.get('FAKE_SECTION', 'cache_ttl_run_lookups'))
+    upload_compression = config.get('FAKE_SECTION', 'upload_compression')
+    listing_concurrency = config.getint('FAKE_SECTION', 'listing_concurrency')
+    listing_min_batch_size = config.getint('FAKE_SECTION',
+                                           'listing_min_batch_size')
+    listing_max_batch_size = config.getint('FAKE_SECTION',
+                                           'listing_max_batch_size')
+    listing_timeout = _parse_duration(
+        config.get('FAKE_SECTION', 'listing_timeout'))
 
 
 def _parse_config():
@@ -86,6 +165,54 @@ def _parse_config():
     return config
 
 
+def _parse_size(size):
+    """Parse a size in bytes with an optional unit (K, M, G or T).
+
+    Parameters
+    ----------
+    size : str or int
+        For example ``1024``, ``'500M'`` or ``'20G'``. ``None`` and ``'None'``
+        mean no size.
+
+    Returns
+    -------
+    int or None
+    """
+    if size is None or isinstance(size, six.integer_types):
+        return size
+    size = size.strip().upper().rstrip('B')
+    if size in ('NONE', ''):
+        return None
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+    if size[-1] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+    return int(size)
+
+
+def _parse_duration(duration):
+    """Parse a duration in seconds with an optional unit (s, m, h or d).
+
+    Parameters
+    ----------
+    duration : str or int
+        For example ``3600``, ``'30m'`` or ``'7d'``. ``None`` and ``'None'``
+        mean no duration.
+
+    Returns
+    -------
+    int or None
+    """
+    if duration is None or isinstance(duration, six.integer_types):
+        return duration
+    duration = duration.strip().lower()
+    if duration in ('none', ''):
+        return None
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    if duration[-1] in units:
+        return int(float(duration[:-1]) * units[duration[-1]])
+    return int(duration)
+
+
 def get_cache_directory():
     """Get the current cache directory.
 
@@ -1,7 +1,8 @@
-from .functions import (list_datasets, check_datasets_active,
+from .functions import (list_datasets, iter_datasets, check_datasets_active,
                         get_datasets, get_dataset)
 from .dataset import OpenMLDataset
 from .data_feature import OpenMLDataFeature
 
 __all__ = ['check_datasets_active', 'get_dataset', 'get_datasets',
-           'OpenMLDataset', 'OpenMLDataFeature', 'list_datasets']
+           'OpenMLDataset', 'OpenMLDataFeature', 'list_datasets',
+           'iter_datasets']
@@ -1,4 +1,3 @@
-import gzip
 import io
 import logging
 import os
@@ -14,6 +13,7 @@ import xmltodict
 from .data_feature import OpenMLDataFeature
 from ..exceptions import PyOpenMLError
 import openml._api_calls
+import openml.utils
 
 logger = logging.getLogger(__name__)
 
@@ -91,12 +91,9 @@ class OpenMLDataset(object):
 
         if data_file is not None:
             if self._data_features_supported():
-                if six.PY2:
-                    self.data_pickle_file = data_file.replace('.arff', '.pkl.py2')
-                else:
-                    self.data_pickle_file = data_file.replace('.arff', '.pkl.py3')
+                self.data_pickle_file = _get_pickle_file(data_file)
 
-                if os.path.exists(self.data_pickle_file):
+                if openml.utils._verify_cache_file(self.data_pickle_file):
                     logger.debug("Data pickle file already exists.")
                 else:
                     try:
@@ -121,7 +118,9 @@ class OpenMLDataset(object):
                     else:
                         raise Exception()
 
-                    with open(self.data_pickle_file, "wb") as fh:
+                    with openml.utils._atomic_write(
+                        self.data_pickle_file, "wb",
+                    ) as fh:
                         pickle.dump((X, categorical, attribute_names), fh, -1)
                     logger.debug("Saved dataset %d: %s to file %s" %
                                  (int(self.dataset_id or -1), self.name, self.data_pickle_file))
@@ -198,12 +197,8 @@ class OpenMLDataset(object):
             return decoder.decode(fh, encode_nominal=True,
                                   return_type=return_type)
 
-        if filename[-3:] == ".gz":
-            with gzip.open(filename) as fh:
-                return decode_arff(fh)
-        else:
-            with io.open(filename, encoding='utf8') as fh:
-                return decode_arff(fh)
+        with openml.utils._open_compressed(filename, 'rt') as fh:
+            return decode_arff(fh)
 
     def get_data(self, target=None,
                  include_row_id=False,
@@ -234,7 +229,7 @@ class OpenMLDataset(object):
             raise ValueError("Cannot find a pickle file for dataset %s at "
                              "location %s " % (self.name, path))
         else:
-            with open(path, "rb") as fh:
+            with openml.utils._open_compressed(path, "rb") as fh:
                 data, categorical, attribute_names = pickle.load(fh)
 
         to_exclude = []
@@ -338,19 +333,17 @@ class OpenMLDataset(object):
         list
         """
 
-        # TODO improve performance, currently reads the whole file
-        # Should make a method that only reads the attributes
-        arffFileName = self.data_file
-
-        if self.format.lower() == 'arff':
-            return_type = arff.DENSE
-        elif self.format.lower() == 'sparse_arff':
-            return_type = arff.COO
-        else:
+        # Only the header is needed, so reading stops at the data section.
+        # If the ARFF file was removed from the cache after creating the
+        # binary cache, only the header of the file is left.
+        if self.format.lower() not in ('arff', 'sparse_arff'):
             raise ValueError('Unknown data format %s' % self.format)
+        arffFileName = self.data_file
+        if not os.path.exists(arffFileName):
+            arffFileName = _get_arff_header_file(arffFileName)
 
-        with io.open(arffFileName, encoding='utf8') as fh:
-            arffData = arff.ArffDecoder().decode(fh, return_type=return_type)
+        with openml.utils._open_compressed(arffFileName, 'rt') as fh:
+            arffData = _decode_arff_header(fh)
 
         dataAttributes = dict(arffData['attributes'])
         if target_name in dataAttributes:
@@ -416,11 +409,18 @@ class OpenMLDataset(object):
                     result.append(idx-offset)
         return result
 
-    def publish(self):
+    def publish(self, full_validation=False):
         """Publish the dataset on the OpenML server.
 
         Upload the dataset description and dataset content to openml.
 
+        Parameters
+        ----------
+        full_validation : bool
+            Whether to decode the complete data file to check that it is a
+            valid ARFF file. By default, only the header and a sample of the
+            rows are checked.
+
         Returns
         -------
         self
@@ -436,6 +436,7 @@ class OpenMLDataset(object):
             "/data/",
             file_dictionary=file_dictionary,
             file_elements=file_elements,
+            full_validation=full_validation,
         )
 
         self.dataset_id = int(xmltodict.parse(return_value)['oml:upload_data_set']['oml:id'])
@@ -477,6 +478,43 @@ class OpenMLDataset(object):
         return True
 
 
+def _get_pickle_file(data_file):
+    """Path of the binary cache (pickle) for ``data_file``.
+
+    Keeps the compression suffix of ``data_file``.
+    """
+    if six.PY2:
+        return data_file.replace('.arff', '.pkl.py2')
+    else:
+        return data_file.replace('.arff', '.pkl.py3')
+
+
+def _get_arff_header_file(data_file):
+    """Path of the file holding only the header of ``data_file``."""
+    return os.path.join(os.path.dirname(data_file), 'dataset_header.arff')
+
+
+def _read_arff_header(fh):
+    """Read the lines of an ARFF file up to and including ``@DATA``."""
+    lines = []
+    for line in fh:
+        lines.append(line)
+        if line.strip().lower().startswith('@data'):
+            break
+    return ''.join(lines)
+
+
+def _decode_arff_header(fh):
+    """Decode only the header of an ARFF file.
+
+    Returns
+    -------
+    dict
+        Decoded arff without any data.
+    """
+    return arff.ArffDecoder().decode(_read_arff_header(fh))
+
+
 def _check_qualities(qualities):
     if qualities is not None:
         qualities_ = {}
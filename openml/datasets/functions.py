@@ -1,29 +1,38 @@
-from collections import OrderedDict
+from collections import namedtuple, OrderedDict
 import hashlib
-import io
+import logging
 import os
-import re
 import shutil
 import six
 
-from oslo_concurrency import lockutils
+import requests
 import xmltodict
 
+import openml.cache
 import openml.utils
 import openml._api_calls
-from .dataset import OpenMLDataset
-from ..exceptions import OpenMLCacheException, OpenMLServerException, \
-    OpenMLHashException, PrivateDatasetError
+from .. import config
+from .dataset import (OpenMLDataset, _get_arff_header_file, _get_pickle_file,
+                      _read_arff_header)
+from ..exceptions import OpenMLCacheException, OpenMLServerError, \
+    OpenMLServerException, OpenMLHashException, PrivateDatasetError
 from ..utils import (
-    _create_cache_directory,
-    _remove_cache_dir_for_id,
     _create_cache_directory_for_id,
-    _create_lockfiles_dir,
 )
 
 
 DATASETS_CACHE_DIR_NAME = 'datasets'
 
+# Error codes of the server for a dataset which does not exist (anymore) or
+# which is not accessible, its cached description must not be used then
+DATASET_UNAVAILABLE_CODES = (110, 111, 112)
+
+# Compact description of a dataset returned by
+# list_datasets(output_format='record'), qualities maps names to values
+DatasetRecord = namedtuple('DatasetRecord', ['did', 'name', 'format',
+                                             'status', 'qualities'])
+
+logger = logging.getLogger(__name__)
 
 
 ############################################################################
@@ -38,32 +47,13 @@ def _list_cached_datasets():
     list
         List with IDs of all cached datasets.
     """
-    datasets = []
-
-    dataset_cache_dir = _create_cache_directory(DATASETS_CACHE_DIR_NAME)
-    directory_content = os.listdir(dataset_cache_dir)
-    directory_content.sort()
-
-    # Find all dataset ids for which we have downloaded the dataset
-    # description
-    for directory_name in directory_content:
-        # First check if the directory name could be an OpenML dataset id
-        if not re.match(r"[0-9]*", directory_name):
-            continue
-
-        dataset_id = int(directory_name)
-
-        directory_name = os.path.join(dataset_cache_dir,
-                                      directory_name)
-        dataset_directory_content = os.listdir(directory_name)
-
-        if ("dataset.arff" in dataset_directory_content and
-                "description.xml" in dataset_directory_content):
-            if dataset_id not in datasets:
-                datasets.append(dataset_id)
-
-    datasets.sort()
-    return datasets
+    # The index of the cache knows which files each dataset directory
+    # contains, use it instead of listing all directories. Only datasets for
+    # which the description and the data are downloaded are complete.
+    cached = openml.cache._get_cached_entities(DATASETS_CACHE_DIR_NAME)
+    return [dataset_id for dataset_id, entry in cached.items()
+            if "description.xml" in entry['files'] and
+            _has_cached_arff(entry['files'])]
 
 
 def _get_cached_datasets():
@@ -101,8 +91,7 @@ def _get_cached_dataset_description(dataset_id):
     )
     description_file = os.path.join(did_cache_dir, "description.xml")
     try:
-        with io.open(description_file, encoding='utf8') as fh:
-            dataset_xml = fh.read()
+        dataset_xml = openml.utils._read_cache_file(description_file)
         return xmltodict.parse(dataset_xml)["oml:data_set_description"]
     except (IOError, OSError):
         raise OpenMLCacheException(
@@ -116,9 +105,8 @@ def _get_cached_dataset_features(dataset_id):
     )
     features_file = os.path.join(did_cache_dir, "features.xml")
     try:
-        with io.open(features_file, encoding='utf8') as fh:
-            features_xml = fh.read()
-            return xmltodict.parse(features_xml)["oml:data_features"]
+        features_xml = openml.utils._read_cache_file(features_file)
+        return xmltodict.parse(features_xml)["oml:data_features"]
     except (IOError, OSError):
         raise OpenMLCacheException("Dataset features for dataset id %d not "
                                    "cached" % dataset_id)
@@ -130,9 +118,8 @@ def _get_cached_dataset_qualities(dataset_id):
     )
     qualities_file = os.path.join(did_cache_dir, "qualities.xml")
     try:
-        with io.open(qualities_file, encoding='utf8') as fh:
-            qualities_xml = fh.read()
-            return xmltodict.parse(qualities_xml)["oml:data_qualities"]['oml:quality']
+        qualities_xml = openml.utils._read_cache_file(qualities_file)
+        return xmltodict.parse(qualities_xml)["oml:data_qualities"]['oml:quality']
     except (IOError, OSError):
         raise OpenMLCacheException("Dataset qualities for dataset id %d not "
                                    "cached" % dataset_id)
@@ -142,18 +129,53 @@ def _get_cached_dataset_arff(dataset_id):
     did_cache_dir = _create_cache_directory_for_id(
         DATASETS_CACHE_DIR_NAME, dataset_id,
     )
-    output_file = os.path.join(did_cache_dir, "dataset.arff")
+    output_file = _find_cached_arff(did_cache_dir)
 
-    try:
-        with io.open(output_file, encoding='utf8'):
-            pass
-        return output_file
-    except (OSError, IOError):
+    if output_file is None:
         raise OpenMLCacheException("ARFF file for dataset id %d not "
                                    "cached" % dataset_id)
+    return output_file
+
+
+def _has_cached_arff(files):
+    """Check whether a list of cached files contains the dataset arff (in any
+    compression) or its binary cache, see ``_find_cached_arff``."""
+    for suffix in openml.utils.COMPRESSION_SUFFIXES.values():
+        arff_file = "dataset.arff" + suffix
+        if arff_file in files or _get_pickle_file(arff_file) in files:
+            return True
+    return False
+
+
+def _find_cached_arff(did_cache_dir):
+    """Find the path of the dataset arff in a dataset cache directory.
+
+    The arff can be stored with any of the supported compressions. If the arff
+    was removed after creating the binary cache (see
+    ``config.cache_keep_arff``), the path it had is returned as long as the
+    binary cache exists.
+
+    Parameters
+    ----------
+    did_cache_dir : str
+        Cache subdirectory for this dataset.
+
+    Returns
+    -------
+    str or None
+        Location of the arff file, ``None`` if the dataset is not cached.
+    """
+    for suffix in sorted(openml.utils.COMPRESSION_SUFFIXES.values()):
+        arff_file = os.path.join(did_cache_dir, "dataset.arff" + suffix)
+        if openml.utils._verify_cache_file(arff_file):
+            return arff_file
+        if openml.utils._verify_cache_file(_get_pickle_file(arff_file)):
+            return arff_file
+    return None
 
 
-def list_datasets(offset=None, size=None, status=None, tag=None, **kwargs):
+def list_datasets(offset=None, size=None, status=None, tag=None,
+                  output_format='dict', **kwargs):
 
     """
     Return a list of all dataset which are on OpenML. (Supports large amount of results)
@@ -169,6 +191,11 @@ def list_datasets(offset=None, size=None, status=None, tag=None, **kwargs):
         default active datasets are returned, but also datasets
         from another status can be requested.
     tag : str, optional
+    output_format : str, optional (default='dict')
+        ``dict`` describes every dataset by a dict, ``record`` by a
+        ``DatasetRecord`` namedtuple. ``array`` returns an ``OrderedDict``
+        of columns (numpy arrays) instead, ``dataframe`` a pandas
+        DataFrame. Qualities become columns of their own.
     kwargs : dict, optional
         Legal filter operators (keys in the dict):
         data_name, data_version, number_instances,
@@ -177,7 +204,8 @@ def list_datasets(offset=None, size=None, status=None, tag=None, **kwargs):
     Returns
     -------
     datasets : dict of dicts
-        A mapping from dataset ID to dict.
+        A mapping from dataset ID to dict (or the format given by
+        ``output_format``).
 
         Every dataset is represented by a dictionary containing
         the following information:
@@ -190,16 +218,40 @@ def list_datasets(offset=None, size=None, status=None, tag=None, **kwargs):
         these are also returned.
     """
 
-    return openml.utils.list_all(_list_datasets, offset=offset, size=size, status=status, tag=tag, **kwargs)
+    openml.utils._check_output_format(output_format)
+    datasets = openml.utils.list_all(_list_datasets, offset=offset, size=size, status=status, tag=tag,
+                                     output_format=openml.utils._get_parse_format(output_format), **kwargs)
+    return openml.utils._format_listing(datasets, output_format)
+
+
+def iter_datasets(offset=None, size=None, status=None, tag=None,
+                  output_format='dict', **kwargs):
+    """
+    Iterate over all datasets which are on OpenML.
+
+    Takes the same arguments as ``list_datasets``, but requests the datasets
+    page by page and yields them as they arrive. ``output_format`` is either
+    ``dict`` or ``record``.
+
+    Yields
+    ------
+    dict or DatasetRecord
+        Description of a dataset.
+    """
+    openml.utils._check_output_format(output_format, ('dict', 'record'))
+    return openml.utils.iter_all(_list_datasets, offset=offset, size=size, status=status, tag=tag,
+                                 output_format=output_format, **kwargs)
 
 
-def _list_datasets(**kwargs):
+def _list_datasets(output_format='dict', **kwargs):
 
     """
     Perform api call to return a list of all datasets.
 
     Parameters
     ----------
+    output_format : str, optional (default='dict')
+        Either ``dict`` or ``record``.
     kwargs : dict, optional
         Legal filter operators (keys in the dict):
         {tag, status, limit, offset, data_name, data_version, number_instances,
@@ -215,34 +267,35 @@ def _list_datasets(**kwargs):
     if kwargs is not None:
         for operator, value in kwargs.items():
             api_call += "/%s/%s" % (operator, value)
-    return __list_datasets(api_call)
+    return __list_datasets(api_call, output_format)
 
 
-def __list_datasets(api_call):
+def __list_datasets(api_call, output_format='dict'):
 
     xml_string = openml._api_calls._perform_api_call(api_call)
-    datasets_dict = xmltodict.parse(xml_string, force_list=('oml:dataset',))
-
-    # Minimalistic check if the XML is useful
-    assert type(datasets_dict['oml:data']['oml:dataset']) == list, \
-        type(datasets_dict['oml:data'])
-    assert datasets_dict['oml:data']['@xmlns:oml'] == \
-        'http://openml.org/openml', datasets_dict['oml:data']['@xmlns:oml']
 
     datasets = dict()
-    for dataset_ in datasets_dict['oml:data']['oml:dataset']:
-        did = int(dataset_['oml:did'])
-        dataset = {'did': did,
-                   'name': dataset_['oml:name'],
-                   'format': dataset_['oml:format'],
-                   'status': dataset_['oml:status']}
+    for dataset_ in openml.utils._iter_listing(xml_string, 'data', 'dataset'):
+        fields = openml.utils._get_child_texts(dataset_)
+        did = int(fields['did'])
 
         # The number of qualities can range from 0 to infinity
-        for quality in dataset_.get('oml:quality', list()):
-            quality['#text'] = float(quality['#text'])
-            if abs(int(quality['#text']) - quality['#text']) < 0.0000001:
-                quality['#text'] = int(quality['#text'])
-            dataset[quality['@name']] = quality['#text']
+        qualities = {}
+        for quality in openml.utils._get_children(dataset_, 'quality'):
+            value = float(quality.text)
+            if abs(int(value) - value) < 0.0000001:
+                value = int(value)
+            qualities[quality.get('name')] = value
+
+        if output_format == 'dict':
+            dataset = {'did': did,
+                       'name': fields['name'],
+                       'format': fields['format'],
+                       'status': fields['status']}
+            dataset.update(qualities)
+        else:
+            dataset = DatasetRecord(did, fields['name'], fields['format'],
+                                    fields['status'], qualities)
         datasets[did] = dataset
 
     return datasets
@@ -321,38 +374,180 @@ def get_dataset(dataset_id):
         raise ValueError("Dataset ID is neither an Integer nor can be "
                          "cast to an Integer.")
 
-    with lockutils.external_lock(
-        name='datasets.functions.get_dataset:%d' % dataset_id,
-        lock_path=_create_lockfiles_dir(),
-    ):
-        did_cache_dir = _create_cache_directory_for_id(
-            DATASETS_CACHE_DIR_NAME, dataset_id,
-        )
+    # Threads requesting the same dataset share the download
+    return openml.cache._single_flight(DATASETS_CACHE_DIR_NAME, dataset_id,
+                                       _get_dataset, dataset_id)
 
-        try:
-            remove_dataset_cache = True
-            description = _get_dataset_description(did_cache_dir, dataset_id)
-            arff_file = _get_dataset_arff(did_cache_dir, description)
-            features = _get_dataset_features(did_cache_dir, dataset_id)
-            qualities = _get_dataset_qualities(did_cache_dir, dataset_id)
-            remove_dataset_cache = False
-        except OpenMLServerException as e:
-            # if there was an exception, check if the user had access to the dataset
-            if e.code == 112:
-                six.raise_from(PrivateDatasetError(e.message), None)
-            else:
-                raise e
-        finally:
-            if remove_dataset_cache:
-                _remove_cache_dir_for_id(DATASETS_CACHE_DIR_NAME, did_cache_dir)
-
-        dataset = _create_dataset_from_description(
-            description, features, qualities, arff_file
-        )
+
+def _get_dataset(dataset_id):
+    dataset = openml.cache._get_memoized(DATASETS_CACHE_DIR_NAME, dataset_id)
+    if dataset is not None:
+        return dataset
+
+    did_cache_dir = _create_cache_directory_for_id(
+        DATASETS_CACHE_DIR_NAME, dataset_id,
+    )
+
+    # Completely cached datasets are read while holding a shared lock only,
+    # so that many processes can read them at the same time
+    with openml.cache._lock_entity(DATASETS_CACHE_DIR_NAME, dataset_id,
+                                   shared=True):
+        dataset = _get_completely_cached_dataset(did_cache_dir, dataset_id)
+
+    if dataset is not None:
+        openml.cache._touch(DATASETS_CACHE_DIR_NAME, dataset_id)
+    else:
+        with openml.cache._lock_entity(DATASETS_CACHE_DIR_NAME, dataset_id):
+            dataset = _download_dataset(did_cache_dir, dataset_id)
+
+    openml.cache._memoize(
+        DATASETS_CACHE_DIR_NAME, dataset_id, dataset,
+        expires=_get_metadata_expiry_time(did_cache_dir),
+    )
     return dataset
 
 
-def _get_dataset_description(did_cache_dir, dataset_id):
+def _get_completely_cached_dataset(did_cache_dir, dataset_id):
+    """Create a dataset from the cache without downloading anything.
+
+    This is only possible if all files of the dataset are cached and match
+    the manifest, and the description and qualities are not expired.
+
+    Returns
+    -------
+    OpenMLDataset or None
+        ``None`` if the dataset has to be downloaded (partially).
+    """
+    for filename, ttl in (("description.xml", config.cache_ttl_description),
+                          ("features.xml", None),
+                          ("qualities.xml", config.cache_ttl_qualities)):
+        filename = os.path.join(did_cache_dir, filename)
+        if not openml.utils._verify_cache_file(filename) or \
+                openml.cache._is_expired(filename, ttl):
+            return None
+    if _find_cached_arff(did_cache_dir) is None:
+        return None
+
+    # Files which expired since the check above are not fetched again, this
+    # requires the exclusive lock
+    description = _get_dataset_description(did_cache_dir, dataset_id,
+                                           revalidate=False)
+    arff_file = _get_dataset_arff(did_cache_dir, description)
+    features = _get_dataset_features(did_cache_dir, dataset_id)
+    qualities = _get_dataset_qualities(did_cache_dir, dataset_id,
+                                       revalidate=False)
+    dataset = _create_dataset_from_description(
+        description, features, qualities, arff_file
+    )
+
+    # The arff still has to be removed, which requires the exclusive lock
+    if not config.cache_keep_arff and os.path.exists(arff_file) and \
+            dataset._data_features_supported():
+        return None
+    return dataset
+
+
+def _download_dataset(did_cache_dir, dataset_id):
+    """Download all missing or expired files of a dataset.
+
+    This function is NOT thread/multiprocessing safe.
+    """
+    # All files are written atomically, so files which were downloaded
+    # before an exception occurred are complete and can be kept
+    try:
+        description = _get_dataset_description(did_cache_dir, dataset_id)
+        arff_file = _get_dataset_arff(did_cache_dir, description)
+        features = _get_dataset_features(did_cache_dir, dataset_id)
+        qualities = _get_dataset_qualities(did_cache_dir, dataset_id)
+    except OpenMLServerException as e:
+        # if there was an exception, check if the user had access to the dataset
+        if e.code == 112:
+            six.raise_from(PrivateDatasetError(e.message), None)
+        else:
+            raise e
+
+    dataset = _create_dataset_from_description(
+        description, features, qualities, arff_file
+    )
+
+    if not config.cache_keep_arff:
+        _remove_dataset_arff(dataset)
+
+    openml.cache._record_access(
+        DATASETS_CACHE_DIR_NAME, dataset_id,
+        fields={'name': dataset.name,
+                'version': dataset.version,
+                'format': dataset.format,
+                'status': description.get('oml:status'),
+                'default_target_attribute':
+                    dataset.default_target_attribute},
+        checksum=dataset.md5_cheksum,
+    )
+    return dataset
+
+
+def _get_metadata_expiry_time(did_cache_dir):
+    """Get the time at which the cached description or qualities of a dataset
+    must be revalidated (``None`` if never)."""
+    expiry_times = [
+        openml.cache._get_expiry_time(
+            os.path.join(did_cache_dir, "description.xml"),
+            config.cache_ttl_description),
+        openml.cache._get_expiry_time(
+            os.path.join(did_cache_dir, "qualities.xml"),
+            config.cache_ttl_qualities),
+    ]
+    expiry_times = [t for t in expiry_times if t is not None]
+    return min(expiry_times) if expiry_times else None
+
+
+def _remove_dataset_arff(dataset):
+    """Remove the arff of a cached dataset once the binary cache is verified.
+
+    Only the header of the arff is kept, it is required to retrieve the class
+    labels. Datasets which cannot be stored in the binary cache (i.e. which
+    have string features) keep their arff.
+
+    This function is NOT thread/multiprocessing safe.
+
+    Parameters
+    ----------
+    dataset : OpenMLDataset
+        Dataset created from the cache directory.
+    """
+    arff_file = dataset.data_file
+    if not os.path.exists(arff_file) or \
+            not dataset._data_features_supported():
+        return
+
+    # Check that the binary cache can be loaded and contains all features
+    try:
+        data, categorical, attribute_names = dataset.get_data(
+            include_row_id=True,
+            include_ignore_attributes=True,
+            return_categorical_indicator=True,
+            return_attribute_names=True,
+        )
+    except Exception as e:
+        logger.warning("Keeping %s, could not verify the binary cache: %s",
+                       arff_file, e)
+        return
+    if dataset.features is not None and \
+            len(attribute_names) != len(dataset.features):
+        logger.warning("Keeping %s, binary cache has %d instead of %d "
+                       "features.", arff_file, len(attribute_names),
+                       len(dataset.features))
+        return
+    del data
+
+    with openml.utils._open_compressed(arff_file, 'rt') as fh:
+        header = _read_arff_header(fh)
+    with openml.utils._atomic_write(_get_arff_header_file(arff_file)) as fh:
+        fh.write(header)
+    os.remove(arff_file)
+
+
+def _get_dataset_description(did_cache_dir, dataset_id, revalidate=True):
     """Get the dataset description as xml dictionary.
 
     This function is NOT thread/multiprocessing safe.
@@ -365,6 +560,11 @@ def _get_dataset_description(did_cache_dir, dataset_id):
     dataset_id : int
         Dataset ID
 
+    revalidate : bool
+        Whether to fetch the description again if the cached one is expired.
+        Must be ``False`` unless the exclusive lock of the dataset is held, as
+        fetching the description may remove the cached data files.
+
     Returns
     -------
     dict
@@ -372,25 +572,59 @@ def _get_dataset_description(did_cache_dir, dataset_id):
 
     """
 
-    # TODO implement a cache for this that invalidates itself after some
-    # time
-    # This can be saved on disk, but cannot be cached properly, because
-    # it contains the information on whether a dataset is active.
+    # The description is cached, but it contains the information on whether a
+    # dataset is active. It is therefore fetched again once it is older than
+    # config.cache_ttl_description.
     description_file = os.path.join(did_cache_dir, "description.xml")
 
     try:
-        return _get_cached_dataset_description(dataset_id)
+        cached_description = _get_cached_dataset_description(dataset_id)
     except OpenMLCacheException:
+        cached_description = None
+    else:
+        if not revalidate or not openml.cache._is_expired(
+                description_file, config.cache_ttl_description):
+            return cached_description
+
+    try:
         dataset_xml = openml._api_calls._perform_api_call("data/%d" % dataset_id)
-        with io.open(description_file, "w", encoding='utf8') as fh:
-            fh.write(dataset_xml)
+    except (requests.exceptions.RequestException, OpenMLServerError) as e:
+        if cached_description is None or \
+                getattr(e, 'code', None) in DATASET_UNAVAILABLE_CODES:
+            raise
+        logger.warning("Could not revalidate the description of dataset "
+                       "%d, using the cached one: %s", dataset_id, e)
+        return cached_description
+    with openml.utils._atomic_write(description_file) as fh:
+        fh.write(dataset_xml)
 
     description = xmltodict.parse(dataset_xml)[
         "oml:data_set_description"]
 
+    # Only download the data again if it changed
+    if cached_description is not None and any(
+            cached_description.get(key) != description.get(key)
+            for key in ('oml:file_id', 'oml:md5_checksum')):
+        _remove_cached_data_files(did_cache_dir)
+
     return description
 
 
+def _remove_cached_data_files(did_cache_dir):
+    """Remove the arff, its header and its binary cache from a dataset cache
+    directory, keeping the (small) metadata files.
+
+    This function is NOT thread/multiprocessing safe.
+    """
+    arff_file = _find_cached_arff(did_cache_dir)
+    if arff_file is None:
+        return
+    for filename in (arff_file, _get_pickle_file(arff_file),
+                     _get_arff_header_file(arff_file)):
+        if os.path.exists(filename):
+            os.remove(filename)
+
+
 def _get_dataset_arff(did_cache_dir, description):
     """Get the filepath to the dataset arff
 
@@ -412,18 +646,29 @@ def _get_dataset_arff(did_cache_dir, description):
     output_filename : string
         Location of arff file.
     """
-    output_file_path = os.path.join(did_cache_dir, "dataset.arff")
     md5_checksum_fixture = description.get("oml:md5_checksum")
     did = description.get("oml:id")
 
     # This means the file is still there; whether it is useful is up to
     # the user and not checked by the program.
-    try:
-        with io.open(output_file_path, encoding='utf8'):
-            pass
+    output_file_path = _find_cached_arff(did_cache_dir)
+    if output_file_path is not None:
         return output_file_path
-    except (OSError, IOError):
-        pass
+
+    # The same file might have been downloaded for another dataset version or
+    # server already
+    if md5_checksum_fixture is not None:
+        blob = openml.cache._find_blob(md5_checksum_fixture)
+        if blob is not None:
+            blob_file, suffix = blob
+            output_file_path = os.path.join(did_cache_dir,
+                                            "dataset.arff" + suffix)
+            if openml.cache._link_blob(blob_file, output_file_path):
+                openml.utils._add_to_manifest(output_file_path)
+                return output_file_path
+
+    suffix = openml.utils._get_compression_suffix()
+    output_file_path = os.path.join(did_cache_dir, "dataset.arff" + suffix)
 
     url = description['oml:url']
     arff_string = openml._api_calls._read_url(url)
@@ -438,9 +683,10 @@ def _get_dataset_arff(did_cache_dir, description):
             )
         )
 
-    with io.open(output_file_path, "w", encoding='utf8') as fh:
+    with openml.utils._atomic_write(output_file_path) as fh:
         fh.write(arff_string)
     del arff_string
+    openml.cache._store_blob(output_file_path, md5_checksum, suffix)
 
     return output_file_path
 
@@ -470,12 +716,11 @@ def _get_dataset_features(did_cache_dir, dataset_id):
 
     # Dataset features aren't subject to change...
     try:
-        with io.open(features_file, encoding='utf8') as fh:
-            features_xml = fh.read()
+        features_xml = openml.utils._read_cache_file(features_file)
     except (OSError, IOError):
         features_xml = openml._api_calls._perform_api_call("data/features/%d" % dataset_id)
 
-        with io.open(features_file, "w", encoding='utf8') as fh:
+        with openml.utils._atomic_write(features_file) as fh:
             fh.write(features_xml)
 
     features = xmltodict.parse(features_xml, force_list=('oml:feature',))["oml:data_features"]
@@ -483,7 +728,7 @@ def _get_dataset_features(did_cache_dir, dataset_id):
     return features
 
 
-def _get_dataset_qualities(did_cache_dir, dataset_id):
+def _get_dataset_qualities(did_cache_dir, dataset_id, revalidate=True):
     """API call to get dataset qualities (cached)
 
     Features are metafeatures (number of features, number of classes, ...)
@@ -498,21 +743,37 @@ def _get_dataset_qualities(did_cache_dir, dataset_id):
     dataset_id : int
         Dataset ID
 
+    revalidate : bool
+        Whether to fetch the qualities again if the cached ones are expired.
+        Must be ``False`` unless the exclusive lock of the dataset is held.
+
     Returns
     -------
     qualities : dict
         Dictionary containing dataset qualities, parsed from XML.
     """
-    # Dataset qualities are subject to change and must be fetched every time
+    # Dataset qualities are subject to change, they are fetched again once
+    # they are older than config.cache_ttl_qualities
     qualities_file = os.path.join(did_cache_dir, "qualities.xml")
     try:
-        with io.open(qualities_file, encoding='utf8') as fh:
-            qualities_xml = fh.read()
+        qualities_xml = openml.utils._read_cache_file(qualities_file)
     except (OSError, IOError):
-        qualities_xml = openml._api_calls._perform_api_call("data/qualities/%d" % dataset_id)
+        qualities_xml = None
 
-        with io.open(qualities_file, "w", encoding='utf8') as fh:
-            fh.write(qualities_xml)
+    if qualities_xml is None or revalidate and openml.cache._is_expired(
+            qualities_file, config.cache_ttl_qualities):
+        try:
+            qualities_xml = openml._api_calls._perform_api_call(
+                "data/qualities/%d" % dataset_id)
+        except (requests.exceptions.RequestException,
+                OpenMLServerError) as e:
+            if qualities_xml is None:
+                raise
+            logger.warning("Could not revalidate the qualities of dataset "
+                           "%d, using the cached ones: %s", dataset_id, e)
+        else:
+            with openml.utils._atomic_write(qualities_file) as fh:
+                fh.write(qualities_xml)
 
     qualities = xmltodict.parse(qualities_xml, force_list=('oml:quality',))['oml:data_qualities']['oml:quality']
 
@@ -1,2 +1,3 @@
 from .evaluation import OpenMLEvaluation
-from .functions import list_evaluations
+from .functions import list_evaluations, iter_evaluations, pivot_evaluations
+from .warehouse import sync, list_local_evaluations
@@ -29,6 +29,11 @@ class OpenMLEvaluation(object):
     array_data : str
         list of information per class (e.g., in case of precision, auroc, recall)
     '''
+    # Listings hold many evaluations, slots avoid a dict per instance
+    __slots__ = ('run_id', 'task_id', 'setup_id', 'flow_id', 'flow_name',
+                 'data_id', 'data_name', 'function', 'upload_time', 'value',
+                 'array_data')
+
     def __init__(self, run_id, task_id, setup_id, flow_id, flow_name,
                  data_id, data_name, function, upload_time, value,
                  array_data=None):
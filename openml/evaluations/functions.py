@@ -1,4 +1,8 @@
-import xmltodict
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import six
 
 from openml.exceptions import OpenMLServerNoResult
 import openml.utils
@@ -6,20 +10,44 @@ import openml._api_calls
 from ..evaluations import OpenMLEvaluation
 
 
+# Columns of list_evaluations(output_format='array'|'dataframe')
+EVALUATION_COLUMNS = [
+    ('run_id', 'int'),
+    ('task_id', 'int'),
+    ('setup_id', 'int'),
+    ('flow_id', 'int'),
+    ('flow_name', 'category'),
+    ('data_id', 'int'),
+    ('data_name', 'category'),
+    ('function', 'category'),
+    ('upload_time', 'datetime'),
+    ('value', 'float'),
+    ('array_data', 'object'),
+]
+# Columns describing the run of an evaluation, which are shared by the
+# evaluations of several functions
+RUN_COLUMNS = ['run_id', 'task_id', 'setup_id', 'flow_id', 'flow_name',
+               'data_id', 'data_name']
+
+
 def list_evaluations(function, offset=None, size=None, id=None, task=None,
-                     setup=None, flow=None, uploader=None, tag=None):
+                     setup=None, flow=None, uploader=None, tag=None,
+                     output_format='dict'):
     """
     List all run-evaluation pairs matching all of the given filters.
     (Supports large amount of results)
 
     Parameters
     ----------
-    function : str
-        the evaluation function. e.g., predictive_accuracy
+    function : str or list of str
+        the evaluation function. e.g., predictive_accuracy. The evaluations
+        of a list of functions are listed concurrently and merged by run,
+        see below.
     offset : int, optional
-        the number of runs to skip, starting from the first
+        the number of runs to skip, starting from the first (of every
+        function)
     size : int, optional
-        the maximum number of runs to show
+        the maximum number of runs to show (of every function)
 
     id : list, optional
 
@@ -33,17 +61,177 @@ def list_evaluations(function, offset=None, size=None, id=None, task=None,
 
     tag : str, optional
 
+    output_format : str, optional (default='dict')
+        ``dict`` and ``record`` return a dict of ``OpenMLEvaluation``.
+        ``array`` returns an ``OrderedDict`` of columns (numpy arrays)
+        instead, ``dataframe`` a pandas DataFrame indexed by the run ids.
+        Their columns are built while the response is parsed: ids are 32
+        bit integers, values floats and the upload times ``datetime64``.
+        Flow names, dataset names and functions are categorical (object
+        arrays sharing one string per name, or ``pandas.Categorical``).
+
+    Returns
+    -------
+    dict, OrderedDict or pandas.DataFrame
+        For a list of functions, ``dict`` and ``record`` map every run id to
+        a dict of {function: OpenMLEvaluation}. The columnar formats have
+        one row per run: the columns ``run_id``, ``task_id``, ``setup_id``,
+        ``flow_id``, ``flow_name``, ``data_id`` and ``data_name``, followed
+        by a column of values per function, which is ``nan`` for runs
+        without an evaluation of this function.
+    """
+
+    openml.utils._check_output_format(output_format)
+    if not isinstance(function, six.string_types):
+        return _list_evaluations_of_functions(
+            function, output_format, offset=offset, size=size, id=id,
+            task=task, setup=setup, flow=flow, uploader=uploader, tag=tag)
+    parse_format = 'array' if output_format == 'dataframe' else output_format
+    evaluations = openml.utils.list_all(_list_evaluations, function, offset=offset, size=size,
+                                        id=id, task=task, setup=setup, flow=flow, uploader=uploader, tag=tag,
+                                        output_format=parse_format)
+    if output_format in ('dict', 'record'):
+        return evaluations
+    if len(evaluations) == 0:
+        evaluations = openml.utils._ListingColumns(EVALUATION_COLUMNS)
+    if output_format == 'array':
+        return evaluations.to_arrays()
+    return evaluations.to_dataframe(index='run_id')
+
+
+def _list_evaluations_of_functions(functions, output_format, **filters):
+    """List the evaluations of several functions concurrently and merge
+    them by run."""
+    functions = list(OrderedDict.fromkeys(functions))
+    if len(functions) == 0:
+        raise ValueError('At least one evaluation function is required.')
+    parse_format = 'array' if output_format == 'dataframe' else output_format
+    with ThreadPoolExecutor(max_workers=len(functions)) as executor:
+        futures = [executor.submit(list_evaluations, function,
+                                   output_format=parse_format, **filters)
+                   for function in functions]
+        results = [future.result() for future in futures]
+
+    if output_format in ('dict', 'record'):
+        merged = {}
+        for function, evaluations in zip(functions, results):
+            for run_id, evaluation in evaluations.items():
+                merged.setdefault(run_id, {})[function] = evaluation
+        return merged
+
+    run_ids = np.unique(np.concatenate([columns['run_id']
+                                        for columns in results]))
+    # Row of every evaluation in the merged table
+    positions = [np.searchsorted(run_ids, columns['run_id'])
+                 for columns in results]
+    merged = OrderedDict([('run_id', run_ids)])
+    for name in RUN_COLUMNS[1:]:
+        # Every run has an evaluation of at least one function
+        merged[name] = np.empty(len(run_ids), dtype=results[0][name].dtype)
+        for columns, rows in zip(results, positions):
+            merged[name][rows] = columns[name]
+    for function, columns, rows in zip(functions, results, positions):
+        merged[function] = np.full(len(run_ids), np.nan)
+        merged[function][rows] = columns['value']
+    if output_format == 'array':
+        return merged
+
+    if openml.utils.pandas is None:
+        raise ImportError('output_format "dataframe" requires pandas.')
+    for name, kind in EVALUATION_COLUMNS:
+        if kind == 'category' and name in merged:
+            merged[name] = openml.utils.pandas.Categorical(merged[name])
+    return openml.utils.pandas.DataFrame(merged, index=run_ids,
+                                         columns=list(merged.keys()))
+
+
+def pivot_evaluations(evaluations, index='task_id', columns='setup_id',
+                      values='value', aggregate='mean'):
+    """
+    Pivot evaluations into a dense matrix, e.g. of tasks x setups.
+
+    Works on the columns returned by ``list_evaluations`` with
+    ``output_format='array'`` or ``'dataframe'``, without creating an object
+    per evaluation.
+
+    Parameters
+    ----------
+    evaluations : OrderedDict or pandas.DataFrame
+        Columnar evaluations.
+
+    index : str
+        Column which determines the rows of the matrix.
+
+    columns : str
+        Column which determines the columns of the matrix.
+
+    values : str
+        Column holding the values of the matrix.
+
+    aggregate : str
+        How several values for the same cell (e.g. of repeated runs) are
+        combined, one of ``mean``, ``min`` and ``max``.
+
     Returns
     -------
-    dict
+    matrix : numpy.ndarray
+        Array of shape (number of rows, number of columns), cells without
+        values are ``nan``.
+
+    row_labels : numpy.ndarray
+        Sorted unique values of ``index``.
+
+    column_labels : numpy.ndarray
+        Sorted unique values of ``columns``.
     """
+    if aggregate not in ('mean', 'min', 'max'):
+        raise ValueError('Unknown aggregate: %s' % aggregate)
+    values = np.asarray(evaluations[values], dtype=np.float64)
+    row_labels, rows = np.unique(np.asarray(evaluations[index]),
+                                 return_inverse=True)
+    column_labels, cols = np.unique(np.asarray(evaluations[columns]),
+                                    return_inverse=True)
+    shape = (len(row_labels), len(column_labels))
+    n_cells = shape[0] * shape[1]
+    if n_cells == 0:
+        return np.zeros(shape), row_labels, column_labels
 
-    return openml.utils.list_all(_list_evaluations, function, offset=offset, size=size,
+    valid = ~np.isnan(values)
+    cells = rows[valid] * shape[1] + cols[valid]
+    values = values[valid]
+    counts = np.bincount(cells, minlength=n_cells)
+    if aggregate == 'mean':
+        matrix = np.bincount(cells, weights=values, minlength=n_cells)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            matrix /= counts
+    else:
+        ufunc = np.fmin if aggregate == 'min' else np.fmax
+        matrix = np.full(n_cells, np.nan)
+        ufunc.at(matrix, cells, values)
+    matrix[counts == 0] = np.nan
+    return matrix.reshape(shape), row_labels, column_labels
+
+
+def iter_evaluations(function, offset=None, size=None, id=None, task=None,
+                     setup=None, flow=None, uploader=None, tag=None):
+    """
+    Iterate over all run-evaluation pairs matching all of the given filters.
+
+    Takes the same arguments as ``list_evaluations``, but requests the
+    evaluations page by page and yields them as they arrive.
+
+    Yields
+    ------
+    OpenMLEvaluation
+    """
+
+    return openml.utils.iter_all(_list_evaluations, function, offset=offset, size=size,
                                  id=id, task=task, setup=setup, flow=flow, uploader=uploader, tag=tag)
 
 
 def _list_evaluations(function, id=None, task=None,
-                      setup=None, flow=None, uploader=None, **kwargs):
+                      setup=None, flow=None, uploader=None,
+                      output_format='dict', **kwargs):
     """
     Perform API call ``/evaluation/function{function}/{filters}``
 
@@ -65,12 +253,16 @@ def _list_evaluations(function, id=None, task=None,
 
     uploader : list, optional
 
+    output_format : str, optional (default='dict')
+        ``dict`` (or ``record``) returns a dict of ``OpenMLEvaluation``,
+        ``array`` the evaluations stored column by column.
+
     kwargs: dict, optional
         Legal filter operators: tag, limit, offset.
 
     Returns
     -------
-    dict
+    dict or openml.utils._ListingColumns
     """
 
     api_call = "evaluation/list/function/%s" % function
@@ -88,33 +280,38 @@ def _list_evaluations(function, id=None, task=None,
     if uploader is not None:
         api_call += "/uploader/%s" % ','.join([str(int(i)) for i in uploader])
 
-    return __list_evaluations(api_call)
+    return __list_evaluations(api_call, output_format)
 
 
-def __list_evaluations(api_call):
+def __list_evaluations(api_call, output_format='dict'):
     """Helper function to parse API calls which are lists of runs"""
     xml_string = openml._api_calls._perform_api_call(api_call)
-    evals_dict = xmltodict.parse(xml_string, force_list=('oml:evaluation',))
-    # Minimalistic check if the XML is useful
-    if 'oml:evaluations' not in evals_dict:
-        raise ValueError('Error in return XML, does not contain "oml:evaluations": %s'
-                         % str(evals_dict))
-
-    assert type(evals_dict['oml:evaluations']['oml:evaluation']) == list, \
-        type(evals_dict['oml:evaluations'])
-
-    evals = dict()
-    for eval_ in evals_dict['oml:evaluations']['oml:evaluation']:
-        run_id = int(eval_['oml:run_id'])
-        array_data = None
-        if 'oml:array_data' in eval_:
-            eval_['oml:array_data']
-
-        evaluation = OpenMLEvaluation(int(eval_['oml:run_id']), int(eval_['oml:task_id']),
-                                      int(eval_['oml:setup_id']), int(eval_['oml:flow_id']),
-                                      eval_['oml:flow_name'], eval_['oml:data_id'],
-                                      eval_['oml:data_name'], eval_['oml:function'],
-                                      eval_['oml:upload_time'], float(eval_['oml:value']),
-                                      array_data)
+
+    if output_format == 'array':
+        evals = openml.utils._ListingColumns(EVALUATION_COLUMNS)
+    else:
+        evals = dict()
+    for eval_ in openml.utils._iter_listing(xml_string, 'evaluations',
+                                            'evaluation'):
+        fields = openml.utils._get_child_texts(eval_)
+        if output_format == 'array':
+            value = fields.get('value')
+            evals.append((
+                int(fields['run_id']), int(fields['task_id']),
+                int(fields['setup_id']), int(fields['flow_id']),
+                fields['flow_name'], int(fields['data_id']),
+                fields['data_name'], fields['function'],
+                fields['upload_time'],
+                None if value is None else float(value),
+                fields.get('array_data'),
+            ))
+            continue
+        run_id = int(fields['run_id'])
+        evaluation = OpenMLEvaluation(run_id, int(fields['task_id']),
+                                      int(fields['setup_id']), int(fields['flow_id']),
+                                      fields['flow_name'], fields['data_id'],
+                                      fields['data_name'], fields['function'],
+                                      fields['upload_time'], float(fields['value']),
+                                      fields.get('array_data'))
         evals[run_id] = evaluation
     return evals
@@ -0,0 +1,263 @@
+"""
+Local warehouse of evaluations.
+
+Meta-analyses need the evaluations of many runs, and listing them from the
+server takes long. ``sync`` copies the evaluations of a function (optionally
+restricted by filters) into an SQLite database in the cache directory of the
+current server. Later calls of ``sync`` with the same function and filters
+only request the evaluations which were added to the server since, and
+``list_local_evaluations`` answers queries from the database.
+
+The server lists evaluations ordered by run id, new runs are therefore added
+at the end of a listing. For every function and set of filters, the
+warehouse stores how many evaluations of the listing were already synced and
+the highest run id seen so far (its high-water mark). A sync continues the
+listing at this position, starting ``SYNC_OVERLAP`` evaluations earlier so
+that evaluations are not missed if the listing shifted.
+"""
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import time
+
+import openml.utils
+from .evaluation import OpenMLEvaluation
+from .functions import EVALUATION_COLUMNS, _list_evaluations
+
+
+logger = logging.getLogger(__name__)
+
+EVALUATIONS_CACHE_DIR_NAME = 'evaluations'
+WAREHOUSE_FILE_NAME = 'warehouse.sqlite'
+# Number of already synced evaluations which are listed again by a sync
+SYNC_OVERLAP = 100
+
+_COLUMN_NAMES = [name for name, _ in EVALUATION_COLUMNS]
+
+
+def sync(function, task=None, setup=None, flow=None, uploader=None,
+         tag=None, directory=None, full=False):
+    """Copy the evaluations of a function from the server into the local
+    warehouse.
+
+    Only the evaluations added to the server since the last sync with the
+    same function and filters are requested. The progress is stored after
+    every page, an interrupted sync continues where it stopped.
+
+    Parameters
+    ----------
+    function : str
+        the evaluation function. e.g., predictive_accuracy
+
+    task : list, optional
+
+    setup: list, optional
+
+    flow : list, optional
+
+    uploader : list, optional
+
+    tag : str, optional
+
+    directory : str, optional
+        Directory of the warehouse. Defaults to the directory
+        ``evaluations`` in the cache directory of the current server.
+
+    full : bool
+        Whether to list all evaluations again instead of continuing after
+        the last sync.
+
+    Returns
+    -------
+    int
+        Number of evaluations which were added to the warehouse.
+    """
+    directory = _get_warehouse_directory(directory)
+    filters = {'task': task, 'setup': setup, 'flow': flow,
+               'uploader': uploader, 'tag': tag}
+    scope = _get_scope(filters)
+
+    shifted = False
+    with _connect_warehouse(directory) as connection:
+        state = connection.execute(
+            'SELECT position, high_water_mark FROM sync_state '
+            'WHERE function = ? AND scope = ?', (function, scope),
+        ).fetchone()
+        position, high_water_mark = (0, None) if state is None or full \
+            else state
+        position = max(0, position - SYNC_OVERLAP)
+
+        filters['offset'] = position
+        n_added = 0
+        first_page = True
+        for page in openml.utils._iter_pages(_list_evaluations, (function, ),
+                                             filters, prefetch=True):
+            rows = [_evaluation_to_row(evaluation)
+                    for evaluation in page.values()]
+            if first_page and high_water_mark is not None and \
+                    min(row[0] for row in rows) > high_water_mark:
+                # Evaluations before the high-water mark were removed from
+                # the listing, it shifted further than the overlap
+                shifted = True
+                break
+            first_page = False
+            cursor = connection.executemany(
+                'INSERT OR IGNORE INTO evaluations (%s) VALUES (%s)'
+                % (', '.join(_COLUMN_NAMES),
+                   ', '.join('?' * len(_COLUMN_NAMES))),
+                rows,
+            )
+            n_added += cursor.rowcount
+            position += len(rows)
+            high_water_mark = max([row[0] for row in rows]
+                                  + [high_water_mark or 0])
+            connection.execute(
+                'INSERT OR REPLACE INTO sync_state (function, scope, '
+                'position, high_water_mark, synced) VALUES (?, ?, ?, ?, ?)',
+                (function, scope, position, high_water_mark, time.time()),
+            )
+            connection.commit()
+        if first_page and position > 0:
+            # Not even the overlap was listed, the listing became shorter
+            shifted = True
+
+    if shifted:
+        logger.warning('The listing of %s changed since the last sync, '
+                       'listing all evaluations again.', function)
+        return sync(function, task=task, setup=setup, flow=flow,
+                    uploader=uploader, tag=tag, directory=directory,
+                    full=True)
+    return n_added
+
+
+def list_local_evaluations(function, task=None, setup=None, flow=None,
+                           directory=None, output_format='dict'):
+    """List the evaluations of a function stored in the local warehouse.
+
+    Parameters
+    ----------
+    function : str
+        the evaluation function. e.g., predictive_accuracy
+
+    task : list, optional
+
+    setup: list, optional
+
+    flow : list, optional
+
+    directory : str, optional
+        Directory of the warehouse, see ``sync``.
+
+    output_format : str, optional (default='dict')
+        See ``list_evaluations``.
+
+    Returns
+    -------
+    dict, OrderedDict or pandas.DataFrame
+    """
+    openml.utils._check_output_format(output_format)
+    directory = _get_warehouse_directory(directory)
+    conditions = ['function = ?']
+    arguments = [function]
+    for column, values in (('task_id', task), ('setup_id', setup),
+                           ('flow_id', flow)):
+        if values is None:
+            continue
+        values = [int(value) for value in values]
+        conditions.append('%s IN (%s)' % (column,
+                                          ', '.join('?' * len(values))))
+        arguments.extend(values)
+    query = 'SELECT %s FROM evaluations WHERE %s ORDER BY run_id' % (
+        ', '.join(_COLUMN_NAMES), ' AND '.join(conditions))
+
+    if output_format in ('dict', 'record'):
+        evaluations = {}
+    else:
+        evaluations = openml.utils._ListingColumns(EVALUATION_COLUMNS)
+    with _connect_warehouse(directory) as connection:
+        for row in connection.execute(query, arguments):
+            if output_format in ('dict', 'record'):
+                evaluations[row[0]] = OpenMLEvaluation(*row)
+            else:
+                evaluations.append(row)
+    if output_format in ('dict', 'record'):
+        return evaluations
+    if output_format == 'array':
+        return evaluations.to_arrays()
+    return evaluations.to_dataframe(index='run_id')
+
+
+def _evaluation_to_row(evaluation):
+    return (evaluation.run_id, evaluation.task_id, evaluation.setup_id,
+            evaluation.flow_id, evaluation.flow_name,
+            # The listing holds the dataset id as a string
+            int(evaluation.data_id), evaluation.data_name,
+            evaluation.function, evaluation.upload_time, evaluation.value,
+            evaluation.array_data)
+
+
+def _get_scope(filters):
+    """Identify a set of filters, independent of the order of the ids."""
+    scope = {}
+    for name, value in filters.items():
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            value = sorted(int(i) for i in value)
+        scope[name] = value
+    return json.dumps(scope, sort_keys=True)
+
+
+@contextlib.contextmanager
+def _connect_warehouse(directory):
+    """Open the warehouse stored in ``directory``."""
+    connection = sqlite3.connect(os.path.join(directory, WAREHOUSE_FILE_NAME),
+                                 timeout=60)
+    try:
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS evaluations ('
+            ' run_id INTEGER NOT NULL,'
+            ' task_id INTEGER NOT NULL,'
+            ' setup_id INTEGER NOT NULL,'
+            ' flow_id INTEGER NOT NULL,'
+            ' flow_name TEXT,'
+            ' data_id INTEGER,'
+            ' data_name TEXT,'
+            ' function TEXT NOT NULL,'
+            ' upload_time TEXT,'
+            ' value REAL,'
+            ' array_data TEXT,'
+            ' PRIMARY KEY (function, run_id))'
+        )
+        for column in ('task_id', 'setup_id', 'flow_id'):
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS evaluations_%s '
+                'ON evaluations (function, %s)' % (column, column)
+            )
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS sync_state ('
+            ' function TEXT NOT NULL,'
+            ' scope TEXT NOT NULL,'
+            ' position INTEGER NOT NULL,'
+            ' high_water_mark INTEGER,'
+            ' synced REAL NOT NULL,'
+            ' PRIMARY KEY (function, scope))'
+        )
+        yield connection
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def _get_warehouse_directory(directory=None):
+    if directory is None:
+        return openml.utils._create_cache_directory(
+            EVALUATIONS_CACHE_DIR_NAME)
+    try:
+        os.makedirs(directory)
+    except (IOError, OSError):
+        if not os.path.isdir(directory):
+            raise
+    return directory
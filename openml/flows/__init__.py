@@ -1,7 +1,8 @@
 from .flow import OpenMLFlow, _copy_server_fields
 
 from .sklearn_converter import sklearn_to_flow, flow_to_sklearn, _check_n_jobs
-from .functions import get_flow, list_flows, flow_exists, assert_flows_equal
+from .functions import (get_flow, list_flows, iter_flows, flow_exists,
+                        assert_flows_equal)
 
 __all__ = ['OpenMLFlow', 'create_flow_from_model', 'get_flow', 'list_flows',
-           'sklearn_to_flow', 'flow_to_sklearn', 'flow_exists']
+           'iter_flows', 'sklearn_to_flow', 'flow_to_sklearn', 'flow_exists']
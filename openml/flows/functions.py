@@ -1,11 +1,22 @@
+from collections import namedtuple
 import dateutil.parser
+import os
 
 import xmltodict
 import six
 
 import openml._api_calls
 from . import OpenMLFlow
+import openml.cache
 import openml.utils
+from ..exceptions import OpenMLCacheException
+
+
+FLOWS_CACHE_DIR_NAME = 'flows'
+
+# Compact description of a flow returned by list_flows(output_format='record')
+FlowRecord = namedtuple('FlowRecord', ['id', 'full_name', 'name', 'version',
+                                       'external_version', 'uploader'])
 
 
 def get_flow(flow_id):
@@ -16,21 +27,101 @@ def get_flow(flow_id):
     flow_id : int
         The OpenML flow id.
     """
-    # TODO add caching here!
     try:
         flow_id = int(flow_id)
     except:
         raise ValueError("Flow ID must be an int, got %s." % str(flow_id))
 
-    flow_xml = openml._api_calls._perform_api_call("flow/%d" % flow_id)
+    # Threads requesting the same flow share the download
+    return openml.cache._single_flight(FLOWS_CACHE_DIR_NAME, flow_id,
+                                       _get_flow, flow_id)
 
-    flow_dict = xmltodict.parse(flow_xml)
-    flow = OpenMLFlow._from_dict(flow_dict)
+
+def _get_flow(flow_id):
+    flow = openml.cache._get_memoized(FLOWS_CACHE_DIR_NAME, flow_id)
+    if flow is not None:
+        return flow
+
+    fid_cache_dir = openml.utils._create_cache_directory_for_id(
+        FLOWS_CACHE_DIR_NAME, flow_id,
+    )
+    flow_file = os.path.join(fid_cache_dir, "flow.xml")
+
+    flow = None
+    with openml.cache._lock_entity(FLOWS_CACHE_DIR_NAME, flow_id,
+                                   shared=True):
+        if openml.utils._verify_cache_file(flow_file):
+            flow = _get_cached_flow(flow_id)
+
+    if flow is not None:
+        openml.cache._touch(FLOWS_CACHE_DIR_NAME, flow_id)
+    else:
+        with openml.cache._lock_entity(FLOWS_CACHE_DIR_NAME, flow_id):
+            try:
+                flow = _get_cached_flow(flow_id)
+            except OpenMLCacheException:
+                flow_xml = openml._api_calls._perform_api_call(
+                    "flow/%d" % flow_id)
+                with openml.utils._atomic_write(flow_file) as fh:
+                    fh.write(flow_xml)
+                flow = _create_flow_from_xml(flow_xml)
+                openml.cache._set_flow_ids(_get_flow_ids(flow))
+            openml.cache._record_access(
+                FLOWS_CACHE_DIR_NAME, flow_id,
+                fields={'name': flow.name,
+                        'external_version': flow.external_version},
+            )
+
+    openml.cache._memoize(FLOWS_CACHE_DIR_NAME, flow_id, flow)
 
     return flow
 
 
-def list_flows(offset=None, size=None, tag=None, **kwargs):
+def _get_cached_flow(fid):
+    """Get the cached flow with the given id.
+
+    Parameters
+    ----------
+    fid : int
+        Flow id.
+
+    Returns
+    -------
+    OpenMLFlow.
+    """
+    fid_cache_dir = openml.utils._create_cache_directory_for_id(
+        FLOWS_CACHE_DIR_NAME, fid,
+    )
+    flow_file = os.path.join(fid_cache_dir, "flow.xml")
+
+    try:
+        return _create_flow_from_xml(
+            openml.utils._read_cache_file(flow_file))
+    except (OSError, IOError):
+        raise OpenMLCacheException("Flow file for fid %d not "
+                                   "cached" % fid)
+
+
+def _get_flow_ids(flow):
+    """Map ``(name, external_version)`` of a flow and all its subflows to
+    their flow ids."""
+    flow_ids = {}
+    # Some flows on the server have no external version and cannot be looked
+    # up with flow_exists
+    if flow.external_version:
+        flow_ids[(flow.name, flow.external_version)] = flow.flow_id
+    for component in flow.components.values():
+        flow_ids.update(_get_flow_ids(component))
+    return flow_ids
+
+
+def _create_flow_from_xml(flow_xml):
+    flow_dict = xmltodict.parse(flow_xml)
+    return OpenMLFlow._from_dict(flow_dict)
+
+
+def list_flows(offset=None, size=None, tag=None, output_format='dict',
+               **kwargs):
 
     """
     Return a list of all flows which are on OpenML.
@@ -44,6 +135,10 @@ def list_flows(offset=None, size=None, tag=None, **kwargs):
         the maximum number of flows to return
     tag : str, optional
         the tag to include
+    output_format : str, optional (default='dict')
+        ``dict`` describes every flow by a dict, ``record`` by a
+        ``FlowRecord`` namedtuple. ``array`` returns an ``OrderedDict`` of
+        columns (numpy arrays) instead, ``dataframe`` a pandas DataFrame.
     kwargs: dict, optional
         Legal filter operators: uploader.
 
@@ -62,15 +157,39 @@ def list_flows(offset=None, size=None, tag=None, **kwargs):
         - external version
         - uploader
     """
-    return openml.utils.list_all(_list_flows, offset=offset, size=size, tag=tag, **kwargs)
+    openml.utils._check_output_format(output_format)
+    flows = openml.utils.list_all(_list_flows, offset=offset, size=size, tag=tag,
+                                  output_format=openml.utils._get_parse_format(output_format), **kwargs)
+    return openml.utils._format_listing(flows, output_format)
+
+
+def iter_flows(offset=None, size=None, tag=None, output_format='dict',
+               **kwargs):
+    """
+    Iterate over all flows which are on OpenML.
+
+    Takes the same arguments as ``list_flows``, but requests the flows page
+    by page and yields them as they arrive. ``output_format`` is either
+    ``dict`` or ``record``.
+
+    Yields
+    ------
+    dict or FlowRecord
+        Description of a flow.
+    """
+    openml.utils._check_output_format(output_format, ('dict', 'record'))
+    return openml.utils.iter_all(_list_flows, offset=offset, size=size, tag=tag,
+                                 output_format=output_format, **kwargs)
 
 
-def _list_flows(**kwargs):
+def _list_flows(output_format='dict', **kwargs):
     """
     Perform the api call that return a list of all flows.
 
     Parameters
     ----------
+    output_format : str, optional (default='dict')
+        Either ``dict`` or ``record``.
     kwargs: dict, optional
         Legal filter operators: uploader, tag, limit, offset.
 
@@ -84,7 +203,7 @@ def _list_flows(**kwargs):
         for operator, value in kwargs.items():
             api_call += "/%s/%s" % (operator, value)
 
-    return __list_flows(api_call)
+    return __list_flows(api_call, output_format)
 
 
 def flow_exists(name, external_version):
@@ -113,6 +232,12 @@ def flow_exists(name, external_version):
     if not (isinstance(name, six.string_types) and len(external_version) > 0):
         raise ValueError('Argument \'version\' should be a non-empty string')
 
+    # Flows cannot be removed from the server, therefore a known flow id
+    # stays valid
+    flow_id = openml.cache._get_flow_id(name, external_version)
+    if flow_id is not None:
+        return flow_id
+
     xml_response = openml._api_calls._perform_api_call(
         "flow/exists",
         data={'name': name, 'external_version': external_version},
@@ -121,31 +246,28 @@ def flow_exists(name, external_version):
     result_dict = xmltodict.parse(xml_response)
     flow_id = int(result_dict['oml:flow_exists']['oml:id'])
     if flow_id > 0:
+        openml.cache._set_flow_ids({(name, external_version): flow_id})
         return flow_id
     else:
         return False
 
 
-def __list_flows(api_call):
+def __list_flows(api_call, output_format='dict'):
 
     xml_string = openml._api_calls._perform_api_call(api_call)
-    flows_dict = xmltodict.parse(xml_string, force_list=('oml:flow',))
-
-    # Minimalistic check if the XML is useful
-    assert type(flows_dict['oml:flows']['oml:flow']) == list, \
-        type(flows_dict['oml:flows'])
-    assert flows_dict['oml:flows']['@xmlns:oml'] == \
-        'http://openml.org/openml', flows_dict['oml:flows']['@xmlns:oml']
 
     flows = dict()
-    for flow_ in flows_dict['oml:flows']['oml:flow']:
-        fid = int(flow_['oml:id'])
-        flow = {'id': fid,
-                'full_name': flow_['oml:full_name'],
-                'name': flow_['oml:name'],
-                'version': flow_['oml:version'],
-                'external_version': flow_['oml:external_version'],
-                'uploader': flow_['oml:uploader']}
+    for flow_ in openml.utils._iter_listing(xml_string, 'flows', 'flow'):
+        fields = openml.utils._get_child_texts(flow_)
+        fid = int(fields['id'])
+        flow = FlowRecord(id=fid,
+                          full_name=fields['full_name'],
+                          name=fields['name'],
+                          version=fields['version'],
+                          external_version=fields['external_version'],
+                          uploader=fields['uploader'])
+        if output_format == 'dict':
+            flow = dict(zip(flow._fields, flow))
         flows[fid] = flow
 
     return flows
@@ -9,6 +9,7 @@ import json
 import json.decoder
 import re
 import six
+import threading
 import warnings
 import sys
 
@@ -33,6 +34,14 @@ else:
 DEPENDENCIES_PATTERN = re.compile(
     '^(?P<name>[\w\-]+)((?P<operation>==|>=|>)(?P<version>(\d+\.)?(\d+\.)?(\d+)?(dev)?[0-9]*))?$')
 
+# Maximum number of deserialized models which are kept as templates. Flows
+# with the same structure and parameters are only deserialized once, later
+# calls of ``flow_to_sklearn`` return a clone of the template.
+MODEL_TEMPLATE_CACHE_SIZE = 128
+
+_model_templates = OrderedDict()
+_model_templates_lock = threading.Lock()
+
 
 def sklearn_to_flow(o, parent_model=None):
     # TODO: assert that only on first recursion lvl `parent_model` can be None
@@ -145,7 +154,10 @@ def flow_to_sklearn(o, **kwargs):
     elif isinstance(o, (bool, int, float, six.string_types)) or o is None:
         rval = o
     elif isinstance(o, OpenMLFlow):
-        rval = _deserialize_model(o, **kwargs)
+        if kwargs:
+            rval = _deserialize_model(o, **kwargs)
+        else:
+            rval = _get_model_from_template(o)
     else:
         raise TypeError(o)
 
@@ -404,6 +416,56 @@ def _deserialize_model(flow, **kwargs):
     return model_class(**parameter_dict)
 
 
+def _get_flow_fingerprint(flow):
+    """Return a hashable representation of everything which is used by
+    ``_deserialize_model`` to construct the model of a flow."""
+    return (
+        flow.class_name,
+        flow.dependencies,
+        tuple(flow.parameters.items()),
+        tuple((name, _get_flow_fingerprint(component))
+              for name, component in sorted(flow.components.items())),
+    )
+
+
+def _get_model_from_template(flow):
+    try:
+        fingerprint = _get_flow_fingerprint(flow)
+        hash(fingerprint)
+    except (AttributeError, TypeError):
+        # Flows which were not created from XML can contain unhashable
+        # parameter values
+        return _deserialize_model(flow)
+
+    with _model_templates_lock:
+        template = _model_templates.get(fingerprint)
+        if template is not None:
+            _model_templates[fingerprint] = _model_templates.pop(fingerprint)
+
+    if template is None:
+        template = _deserialize_model(flow)
+        if template is None or MODEL_TEMPLATE_CACHE_SIZE <= 0:
+            return template
+        with _model_templates_lock:
+            _model_templates[fingerprint] = template
+            while len(_model_templates) > MODEL_TEMPLATE_CACHE_SIZE:
+                _model_templates.popitem(last=False)
+
+    # The template must not be changed by the caller, therefore always
+    # return a copy
+    try:
+        return sklearn.base.clone(template, safe=False)
+    except RuntimeError:
+        # Estimators which modify their parameters in the constructor cannot
+        # be cloned
+        return _deserialize_model(flow)
+
+
+def _clear_model_templates():
+    with _model_templates_lock:
+        _model_templates.clear()
+
+
 def _check_dependencies(dependencies):
     if not dependencies:
         return
@@ -1,8 +1,15 @@
 from .run import OpenMLRun
 from .trace import OpenMLRunTrace, OpenMLTraceIteration
-from .functions import (run_model_on_task, run_flow_on_task, get_run, list_runs,
+from .upload import UploadQueue
+from .functions import (run_model_on_task, run_flow_on_task,
+                        run_models_on_tasks, get_run, list_runs, iter_runs,
                         get_runs, get_run_trace, initialize_model_from_run,
-                        initialize_model_from_trace)
+                        initialize_model_from_trace, prefetch_run_lookups,
+                        from_filesystem, store_run, list_local_runs,
+                        load_local_run, remove_local_run)
 
-__all__ = ['OpenMLRun', 'run_model_on_task', 'run_flow_on_task', 'get_run',
-           'list_runs', 'get_runs']
+__all__ = ['OpenMLRun', 'run_model_on_task', 'run_flow_on_task',
+           'run_models_on_tasks', 'get_run',
+           'list_runs', 'iter_runs', 'get_runs', 'prefetch_run_lookups', 'from_filesystem',
+           'store_run', 'list_local_runs', 'load_local_run',
+           'remove_local_run', 'UploadQueue']
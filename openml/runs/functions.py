@@ -1,28 +1,35 @@
-from collections import defaultdict
-import io
+from collections import defaultdict, namedtuple, OrderedDict
+import contextlib
+import hashlib
 import json
+import multiprocessing
 import os
+import pickle
 import shutil
+import sqlite3
 import sys
 import time
 import warnings
 
 import numpy as np
+import sklearn.base
 import sklearn.pipeline
 import six
 import xmltodict
 import sklearn.metrics
 
 import openml
+import openml.cache
 import openml.utils
 import openml._api_calls
 from ..exceptions import PyOpenMLError, OpenMLServerNoResult
 from .. import config
-from ..flows import sklearn_to_flow, get_flow, flow_exists, _check_n_jobs, \
-    _copy_server_fields
+from ..flows import OpenMLFlow, sklearn_to_flow, get_flow, flow_exists, \
+    _check_n_jobs, _copy_server_fields
+from ..flows.sklearn_converter import _get_flow_fingerprint
 from ..setups import setup_exists, initialize_model
 from ..exceptions import OpenMLCacheException, OpenMLServerException
-from .run import OpenMLRun, _get_version_information
+from .run import OpenMLRun, _get_version_information, _columns_to_rows
 from .trace import OpenMLRunTrace, OpenMLTraceIteration
 
 
@@ -30,21 +37,33 @@ from .trace import OpenMLRunTrace, OpenMLTraceIteration
 # circular imports
 
 RUNS_CACHE_DIR_NAME = 'runs'
+# Directory of the results of completed folds of runs with resume=True
+RUN_CHECKPOINTS_DIR_NAME = 'run_checkpoints'
+# Directory of the default local run catalog and the name of its index
+LOCAL_RUNS_DIR_NAME = 'local_runs'
+LOCAL_RUNS_INDEX = 'catalog.sqlite'
+# Maximal number of tasks and setups passed to a single run listing by
+# prefetch_run_lookups
+PREFETCH_CHUNK_SIZE = 100
+
+# Compact description of a run returned by list_runs(output_format='record')
+RunRecord = namedtuple('RunRecord', ['run_id', 'task_id', 'setup_id',
+                                     'flow_id', 'uploader'])
 
 
 def run_model_on_task(task, model, avoid_duplicate_runs=True, flow_tags=None,
-                      seed=None):
+                      seed=None, resume=False):
     """See ``run_flow_on_task for a documentation``."""
 
     flow = sklearn_to_flow(model)
 
     return run_flow_on_task(task=task, flow=flow,
                             avoid_duplicate_runs=avoid_duplicate_runs,
-                            flow_tags=flow_tags, seed=seed)
+                            flow_tags=flow_tags, seed=seed, resume=resume)
 
 
 def run_flow_on_task(task, flow, avoid_duplicate_runs=True, flow_tags=None,
-                     seed=None):
+                     seed=None, resume=False):
     """Run the model provided by the flow on the dataset defined by task.
 
     Takes the flow and repeat information into account. In case a flow is not
@@ -68,6 +87,12 @@ def run_flow_on_task(task, flow, avoid_duplicate_runs=True, flow_tags=None,
         A list of tags that the flow should have at creation.
     seed: int
         Models that are not seeded will get this seed.
+    resume : bool
+        If True, the results of the folds are stored in the cache directory
+        as soon as they are completed. When the same model is run on the same
+        task with the same seed again (e.g. after the process was killed),
+        completed folds are not executed again. The stored results are
+        removed once the run is complete.
 
     Returns
     -------
@@ -77,7 +102,18 @@ def run_flow_on_task(task, flow, avoid_duplicate_runs=True, flow_tags=None,
     if flow_tags is not None and not isinstance(flow_tags, list):
         raise ValueError("flow_tags should be list")
 
-    flow.model = _get_seeded_model(flow.model, seed=seed)
+    checkpoint_dir = None
+    seeded_model = None
+    if resume:
+        checkpoint_dir = _get_checkpoint_directory(task, flow.model, seed)
+        # Use the random states which were drawn when the run was started
+        seeded_model = _load_checkpoint(checkpoint_dir, 'model')
+    if seeded_model is None:
+        flow.model = _get_seeded_model(flow.model, seed=seed)
+        if resume:
+            _save_checkpoint(checkpoint_dir, 'model', flow.model)
+    else:
+        flow.model = seeded_model
 
     # skips the run if it already exists and the user opts for this in the config file.
     # also, if the flow is not present on the server, the check is not needed.
@@ -96,18 +132,58 @@ def run_flow_on_task(task, flow, avoid_duplicate_runs=True, flow_tags=None,
         raise ValueError('The task has no class labels. This method currently '
                          'only works for tasks with class labels.')
 
+    # execute the run
+    res = _run_task_get_arffcontent(flow.model, task,
+                                    checkpoint_dir=checkpoint_dir)
+
+    run = _create_run_from_arffcontent(task, flow, flow_id, res)
+    if checkpoint_dir is not None:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    return run
+
+
+def _get_checkpoint_directory(task, model, seed):
+    """Return the directory which stores the completed folds of running the
+    (not yet seeded) model on the task with the given seed."""
+    flow = sklearn_to_flow(model)
+    key = repr((task.task_id, seed, _get_flow_fingerprint(flow)))
+    name = '%d_%s' % (task.task_id,
+                      hashlib.md5(key.encode('utf-8')).hexdigest())
+    return openml.utils._create_cache_directory(
+        os.path.join(RUN_CHECKPOINTS_DIR_NAME, name))
+
+
+def _save_checkpoint(checkpoint_dir, name, obj):
+    filename = os.path.join(checkpoint_dir, name + '.pkl')
+    with openml.utils._atomic_write(filename, 'wb') as fh:
+        pickle.dump(obj, fh, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _load_checkpoint(checkpoint_dir, name):
+    """Return a stored object, or ``None`` if it was not (completely) stored
+    yet."""
+    filename = os.path.join(checkpoint_dir, name + '.pkl')
+    if not openml.utils._verify_cache_file(filename):
+        return None
+    try:
+        with open(filename, 'rb') as fh:
+            return pickle.load(fh)
+    except (EOFError, IOError, OSError, pickle.UnpicklingError):
+        return None
+
+
+def _create_run_from_arffcontent(task, flow, flow_id, res):
+    """Create the run of a flow on a task from the result of
+    ``_run_task_get_arffcontent``, publishing the flow if necessary."""
     run_environment = _get_version_information()
     tags = ['openml-python', run_environment[1]]
 
-    # execute the run
-    res = _run_task_get_arffcontent(flow.model, task)
-
     # in case the flow not exists, we will get a "False" back (which can be
     if not isinstance(flow.flow_id, int) or flow_id == False:
         _publish_flow_if_necessary(flow)
 
     run = OpenMLRun(task_id=task.task_id, flow_id=flow.flow_id,
-                    dataset_id=dataset.dataset_id, model=flow.model, tags=tags)
+                    dataset_id=task.dataset_id, model=flow.model, tags=tags)
     run.parameter_settings = OpenMLRun._parse_parameters(flow)
 
     run.data_content, run.trace_content, run.trace_attributes, fold_evaluations, sample_evaluations = res
@@ -122,6 +198,196 @@ def run_flow_on_task(task, flow, avoid_duplicate_runs=True, flow_tags=None,
     return run
 
 
+def run_models_on_tasks(models, tasks, avoid_duplicate_runs=True, seed=None,
+                        n_jobs=None, directory=None):
+    """Run every model on every task.
+
+    The runs are grouped by task, so that the data and the splits of a task
+    are loaded only once. The folds of all runs of a task are executed by a
+    pool of ``n_jobs`` processes and each run is yielded as soon as all its
+    folds are done. Runs are not published.
+
+    Parameters
+    ----------
+    models : list(BaseEstimator)
+        The models to run. They are not changed, every run gets a seeded copy.
+    tasks : list(OpenMLTask or int)
+        The tasks to run the models on.
+    avoid_duplicate_runs : bool
+        If this flag is set to True, a model is not run on a task if the
+        setup/task combination is already present on the server or in the
+        local run catalog, and models which are given more than once are only
+        run once. The server is queried in bulk (see
+        ``prefetch_run_lookups``).
+    seed : int, optional
+        Models that are not seeded will get this seed.
+    n_jobs : int, optional
+        Number of processes to execute folds in. ``None`` or ``1`` executes
+        all folds in this process, ``-1`` uses one process per CPU.
+    directory : str, optional
+        Directory of the local run catalog which is checked for existing
+        runs, see ``store_run``.
+
+    Yields
+    ------
+    run : OpenMLRun
+        Result of a run, in the order of the tasks.
+    """
+    tasks = [task if isinstance(task, openml.tasks.OpenMLTask)
+             else openml.tasks.get_task(task) for task in tasks]
+    for task in tasks:
+        if task.class_labels is None:
+            raise ValueError('The task has no class labels. This method '
+                             'currently only works for tasks with class '
+                             'labels.')
+
+    flows = []
+    fingerprints = set()
+    for model in models:
+        model = _get_seeded_model(sklearn.base.clone(model), seed=seed)
+        flow = sklearn_to_flow(model)
+        if avoid_duplicate_runs:
+            try:
+                fingerprint = _get_flow_fingerprint(flow)
+                hash(fingerprint)
+            except TypeError:
+                fingerprint = None
+            if fingerprint in fingerprints:
+                config.logger.info('Skipping duplicate model %s' % flow.name)
+                continue
+            if fingerprint is not None:
+                fingerprints.add(fingerprint)
+        flows.append(flow)
+
+    if avoid_duplicate_runs:
+        setup_ids = prefetch_run_lookups(tasks, flows, seed=seed)
+    else:
+        setup_ids = [False] * len(flows)
+
+    flow_ids = []
+    parameters_hashes = []
+    for flow in flows:
+        flow_id = flow_exists(flow.name, flow.external_version)
+        parameters_hash = None
+        if flow_id:
+            _copy_server_fields(get_flow(flow_id), flow)
+            if avoid_duplicate_runs:
+                parameters_hash = \
+                    openml.setups.functions._get_parameter_settings_hash(
+                        OpenMLRun._parse_parameters(flow))
+        flow_ids.append(flow_id)
+        parameters_hashes.append(parameters_hash)
+
+    for task in tasks:
+        run_indices = []
+        for i, setup_id in enumerate(setup_ids):
+            if parameters_hashes[i] is not None:
+                local_ids = _local_run_exists(task.task_id, flow_ids[i],
+                                              parameters_hashes[i], directory)
+                if local_ids:
+                    config.logger.info('Skipping flow %s on task %d, run '
+                                       'already exists in the local run '
+                                       'catalog. Local id(s): %s'
+                                       % (flows[i].name, task.task_id,
+                                          local_ids))
+                    continue
+            if setup_id:
+                ids = _run_exists(task.task_id, setup_id)
+                if ids:
+                    config.logger.info('Skipping flow %s on task %d, run '
+                                       'already exists in server. Run '
+                                       'id(s): %s' % (flows[i].name,
+                                                      task.task_id, ids))
+                    continue
+            run_indices.append(i)
+        if not run_indices:
+            continue
+
+        task_flows = [flows[i] for i in run_indices]
+        task_flow_ids = [flow_ids[i] for i in run_indices]
+        for run in _run_flows_on_task(task, task_flows, task_flow_ids,
+                                      n_jobs):
+            yield run
+
+
+def _run_flows_on_task(task, flows, flow_ids, n_jobs=None):
+    """Run several flows on a task, loading the data only once and executing
+    the folds of all runs in a process pool. Yields runs as they are
+    completed."""
+    X, Y = task.get_X_and_y()
+    num_reps, num_folds, num_samples = task.get_split_dimensions()
+    folds = [(rep_no, fold_no, sample_no)
+             for rep_no in range(num_reps)
+             for fold_no in range(num_folds)
+             for sample_no in range(num_samples)]
+
+    jobs = []
+    for run_index, flow in enumerate(flows):
+        can_measure_runtime = sys.version_info[:2] >= (3, 3) and \
+            _check_n_jobs(flow.model)
+        for fold in folds:
+            # The trained model is only needed from the last fold
+            jobs.append((run_index, flow.model, fold, can_measure_runtime,
+                         fold == folds[-1]))
+
+    if n_jobs == -1:
+        n_jobs = multiprocessing.cpu_count()
+    pool = None
+    if n_jobs is None or n_jobs == 1:
+        completed = (_run_fold_job(task, X, Y, job) for job in jobs)
+    else:
+        pool = multiprocessing.Pool(n_jobs, initializer=_init_fold_worker,
+                                    initargs=(task, X, Y))
+        completed = pool.imap_unordered(_run_fold_job_in_worker, jobs)
+
+    fold_results = defaultdict(list)
+    models = {}
+    try:
+        for run_index, fold, res, model_fold in completed:
+            fold_results[run_index].append((fold, res))
+            if model_fold is not None:
+                models[run_index] = model_fold
+            if len(fold_results[run_index]) < len(folds):
+                continue
+            res = _merge_fold_results(
+                sorted(fold_results.pop(run_index), key=lambda r: r[0]),
+                models.pop(run_index),
+            )
+            yield _create_run_from_arffcontent(task, flows[run_index],
+                                               flow_ids[run_index], res)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+
+# Task and data of the worker processes of _run_flows_on_task
+_fold_worker_data = None
+
+
+def _init_fold_worker(task, X, Y):
+    global _fold_worker_data
+    _fold_worker_data = (task, X, Y)
+
+
+def _run_fold_job_in_worker(job):
+    task, X, Y = _fold_worker_data
+    return _run_fold_job(task, X, Y, job)
+
+
+def _run_fold_job(task, X, Y, job):
+    run_index, model, fold, can_measure_runtime, keep_model = job
+    rep_no, fold_no, sample_no = fold
+    model_fold = sklearn.base.clone(model, safe=True)
+    res = _run_model_on_fold(model_fold, task, rep_no, fold_no, sample_no,
+                             can_measure_runtime, X=X, Y=Y)
+    arff_datacontent, arff_tracecontent, user_defined_measures, model_fold = res
+    if not keep_model:
+        model_fold = None
+    return run_index, fold, (arff_datacontent, arff_tracecontent,
+                             user_defined_measures), model_fold
+
+
 def _publish_flow_if_necessary(flow):
     # try publishing the flow if one has to assume it doesn't exist yet. It
     # might fail because it already exists, then the flow is currently not
@@ -243,16 +509,111 @@ def _run_exists(task_id, setup_id):
         # openml setups are in range 1-inf
         return set()
 
+    run_ids = openml.cache._get_run_ids(task_id, setup_id)
+    if run_ids is not None:
+        return run_ids
+
     try:
         result = list_runs(task=[task_id], setup=[setup_id])
-        if len(result) > 0:
-            return set(result.keys())
-        else:
-            return set()
+        run_ids = set(result.keys())
     except OpenMLServerException as exception:
         # error code 512 implies no results. This means the run does not exist yet
         assert(exception.code == 512)
-        return set()
+        run_ids = set()
+    openml.cache._set_run_ids({(task_id, setup_id): run_ids})
+    return run_ids
+
+
+def prefetch_run_lookups(tasks, models, seed=None):
+    """Look up in bulk whether planned runs already exist on the server.
+
+    ``run_model_on_task`` and ``run_flow_on_task`` need the flow id, the setup
+    id and the existing runs of every task and model they are given. This
+    function retrieves them for a whole batch of planned runs with few
+    server calls (one ``flow_exists`` per distinct flow, one setup listing
+    per flow and one run listing per chunk of tasks and setups) and stores
+    them in the cache, so that the duplicate checks of the runs do not
+    contact the server again.
+
+    Parameters
+    ----------
+    tasks : list(OpenMLTask or int)
+        Tasks which will be run.
+
+    models : list(BaseEstimator or OpenMLFlow)
+        Models which will be run on every task.
+
+    seed : int, optional
+        The seed which will be passed to ``run_model_on_task``. Parameter
+        settings depend on the seed of a model.
+
+    Returns
+    -------
+    setup_ids : list
+        The setup id of every model, ``False`` if a setup does not exist on
+        the server yet.
+    """
+    task_ids = sorted(set(
+        task.task_id if isinstance(task, openml.tasks.OpenMLTask)
+        else int(task) for task in tasks
+    ))
+
+    # Flows which share name and external version also share setups
+    flows = []
+    for model in models:
+        if isinstance(model, OpenMLFlow):
+            flow = model
+            model = flow.model
+        else:
+            flow = sklearn_to_flow(model)
+        model = _get_seeded_model(sklearn.base.clone(model), seed=seed)
+        flows.append((flow, model))
+
+    server_flows = {}
+    for flow, _ in flows:
+        key = (flow.name, flow.external_version)
+        if key in server_flows:
+            continue
+        flow_id = flow_exists(flow.name, flow.external_version)
+        if not flow_id:
+            server_flows[key] = None
+            continue
+        server_flows[key] = get_flow(flow_id)
+        try:
+            setups = openml.setups.list_setups(flow=flow_id)
+        except OpenMLServerNoResult:
+            setups = {}
+        openml.cache._set_setup_ids(flow_id, dict(
+            (openml.setups.functions._get_setup_parameters_hash(setup),
+             setup_id) for setup_id, setup in setups.items()
+        ))
+
+    setup_ids = []
+    for flow, model in flows:
+        server_flow = server_flows[(flow.name, flow.external_version)]
+        if server_flow is None:
+            setup_ids.append(False)
+        else:
+            setup_ids.append(setup_exists(server_flow, model))
+
+    known_setup_ids = sorted(set(setup_id for setup_id in setup_ids
+                                 if setup_id))
+    for i in range(0, len(task_ids), PREFETCH_CHUNK_SIZE):
+        task_chunk = task_ids[i:i + PREFETCH_CHUNK_SIZE]
+        for j in range(0, len(known_setup_ids), PREFETCH_CHUNK_SIZE):
+            setup_chunk = known_setup_ids[j:j + PREFETCH_CHUNK_SIZE]
+            run_ids = dict(((task_id, setup_id), set())
+                           for task_id in task_chunk
+                           for setup_id in setup_chunk)
+            try:
+                runs = list_runs(task=task_chunk, setup=setup_chunk)
+            except OpenMLServerNoResult:
+                runs = {}
+            for run_id, run in runs.items():
+                run_ids[(run['task_id'], run['setup_id'])].add(run_id)
+            openml.cache._set_run_ids(run_ids)
+
+    return setup_ids
 
 
 def _get_seeded_model(model, seed=None):
@@ -368,7 +729,7 @@ def _prediction_to_row(rep_no, fold_no, sample_no, row_id, correct_label,
     return arff_line
 
 
-def _run_task_get_arffcontent(model, task):
+def _run_task_get_arffcontent(model, task, checkpoint_dir=None):
 
     def _prediction_to_probabilities(y, model_classes):
         # y: list or numpy array of predictions
@@ -381,6 +742,52 @@ def _run_task_get_arffcontent(model, task):
             result[obs][array_idx] = 1.0
         return result
 
+    # sys.version_info returns a tuple, the following line compares the entry of tuples
+    # https://docs.python.org/3.6/reference/expressions.html#value-comparisons
+    can_measure_runtime = sys.version_info[:2] >= (3, 3) and _check_n_jobs(model)
+    # TODO use different iterator to only provide a single iterator (less
+    # methods, less maintenance, less confusion)
+    num_reps, num_folds, num_samples = task.get_split_dimensions()
+
+    fold_results = []
+    for rep_no in range(num_reps):
+        for fold_no in range(num_folds):
+            for sample_no in range(num_samples):
+                checkpoint = 'fold_%d_%d_%d' % (rep_no, fold_no, sample_no)
+                res = None
+                if checkpoint_dir is not None:
+                    res = _load_checkpoint(checkpoint_dir, checkpoint)
+                if res is None:
+                    model_fold = sklearn.base.clone(model, safe=True)
+                    res =_run_model_on_fold(model_fold, task, rep_no, fold_no, sample_no, can_measure_runtime)
+                    if checkpoint_dir is not None:
+                        # The trained model is only needed from the last fold
+                        last = (rep_no, fold_no, sample_no) == \
+                            (num_reps - 1, num_folds - 1, num_samples - 1)
+                        _save_checkpoint(checkpoint_dir, checkpoint,
+                                         res[:3] + (res[3] if last else None,))
+                arff_datacontent_fold, arff_tracecontent_fold, user_defined_measures_fold, model_fold = res
+                fold_results.append(((rep_no, fold_no, sample_no),
+                                     (arff_datacontent_fold,
+                                      arff_tracecontent_fold,
+                                      user_defined_measures_fold)))
+
+    return _merge_fold_results(fold_results, model_fold)
+
+
+def _merge_fold_results(fold_results, model_fold):
+    """Combine the results of ``_run_model_on_fold`` into the result of
+    ``_run_task_get_arffcontent``.
+
+    Parameters
+    ----------
+    fold_results : list
+        Tuples ``((rep_no, fold_no, sample_no), (arff_datacontent,
+        arff_tracecontent, user_defined_measures))``, ordered by repeat, fold
+        and sample.
+    model_fold : sklearn model
+        The model trained on the last fold.
+    """
     arff_datacontent = []
     arff_tracecontent = []
     # stores fold-based evaluation measures. In case of a sample based task,
@@ -393,26 +800,15 @@ def _run_task_get_arffcontent(model, task):
     # is the same as the fold-based measures, and disregarded in that case
     user_defined_measures_per_sample = defaultdict(lambda: defaultdict(lambda: defaultdict(dict)))
 
-    # sys.version_info returns a tuple, the following line compares the entry of tuples
-    # https://docs.python.org/3.6/reference/expressions.html#value-comparisons
-    can_measure_runtime = sys.version_info[:2] >= (3, 3) and _check_n_jobs(model)
-    # TODO use different iterator to only provide a single iterator (less
-    # methods, less maintenance, less confusion)
-    num_reps, num_folds, num_samples = task.get_split_dimensions()
-
-    for rep_no in range(num_reps):
-        for fold_no in range(num_folds):
-            for sample_no in range(num_samples):
-                model_fold = sklearn.base.clone(model, safe=True)
-                res =_run_model_on_fold(model_fold, task, rep_no, fold_no, sample_no, can_measure_runtime)
-                arff_datacontent_fold, arff_tracecontent_fold, user_defined_measures_fold, model_fold = res
+    for (rep_no, fold_no, sample_no), res in fold_results:
+        arff_datacontent_fold, arff_tracecontent_fold, user_defined_measures_fold = res
 
-                arff_datacontent.extend(arff_datacontent_fold)
-                arff_tracecontent.extend(arff_tracecontent_fold)
+        arff_datacontent.extend(arff_datacontent_fold)
+        arff_tracecontent.extend(arff_tracecontent_fold)
 
-                for measure in user_defined_measures_fold:
-                    user_defined_measures_per_fold[measure][rep_no][fold_no] = user_defined_measures_fold[measure]
-                    user_defined_measures_per_sample[measure][rep_no][fold_no][sample_no] = user_defined_measures_fold[measure]
+        for measure in user_defined_measures_fold:
+            user_defined_measures_per_fold[measure][rep_no][fold_no] = user_defined_measures_fold[measure]
+            user_defined_measures_per_sample[measure][rep_no][fold_no][sample_no] = user_defined_measures_fold[measure]
 
     # Note that we need to use a fitted model (i.e., model_fold, and not model) here,
     # to ensure it contains the hyperparameter data (in cv_results_)
@@ -430,7 +826,8 @@ def _run_task_get_arffcontent(model, task):
            user_defined_measures_per_sample
 
 
-def _run_model_on_fold(model, task, rep_no, fold_no, sample_no, can_measure_runtime):
+def _run_model_on_fold(model, task, rep_no, fold_no, sample_no,
+                       can_measure_runtime, X=None, Y=None):
     """Internal function that executes a model on a fold (and possibly
        subsample) of the dataset. It returns the data that is necessary
        to construct the OpenML Run object (potentially over more than
@@ -455,6 +852,10 @@ def _run_model_on_fold(model, task, rep_no, fold_no, sample_no, can_measure_runt
         can_measure_runtime : bool
             Wether we are allowed to measure runtime (requires: Single node
             computation and Python >= 3.3)
+        X : np.ndarray, optional
+            The data of the task. Loaded from the task if not given.
+        Y : np.ndarray, optional
+            The targets of the task. Loaded from the task if not given.
 
         Returns
         -------
@@ -487,7 +888,8 @@ def _run_model_on_fold(model, task, rep_no, fold_no, sample_no, can_measure_runt
                                                                     fold=fold_no,
                                                                     sample=sample_no)
 
-    X, Y = task.get_X_and_y()
+    if X is None or Y is None:
+        X, Y = task.get_X_and_y()
     trainX = X[train_indices]
     trainY = Y[train_indices]
     testX = X[test_indices]
@@ -648,6 +1050,16 @@ def get_run(run_id):
     run : OpenMLRun
         Run corresponding to ID, fetched from the server.
     """
+    # Threads requesting the same run share the download
+    return openml.cache._single_flight(RUNS_CACHE_DIR_NAME, run_id,
+                                       _get_run, run_id)
+
+
+def _get_run(run_id):
+    run = openml.cache._get_memoized(RUNS_CACHE_DIR_NAME, run_id)
+    if run is not None:
+        return run
+
     run_dir = openml.utils._create_cache_directory_for_id(RUNS_CACHE_DIR_NAME, run_id)
     run_file = os.path.join(run_dir, "description.xml")
 
@@ -655,15 +1067,22 @@ def get_run(run_id):
         os.makedirs(run_dir)
 
     try:
-        return _get_cached_run(run_id)
+        run = _get_cached_run(run_id)
+        openml.cache._touch(RUNS_CACHE_DIR_NAME, run_id)
 
     except (OpenMLCacheException):
         run_xml = openml._api_calls._perform_api_call("run/%d" % run_id)
-        with io.open(run_file, "w", encoding='utf8') as fh:
+        with openml.utils._atomic_write(run_file) as fh:
             fh.write(run_xml)
 
-    run = _create_run_from_xml(run_xml)
+        run = _create_run_from_xml(run_xml)
+        openml.cache._record_access(
+            RUNS_CACHE_DIR_NAME, run_id,
+            fields={'task_id': run.task_id, 'flow_id': run.flow_id,
+                    'setup_id': run.setup_id, 'dataset_id': run.dataset_id},
+        )
 
+    openml.cache._memoize(RUNS_CACHE_DIR_NAME, run_id, run)
     return run
 
 
@@ -888,8 +1307,8 @@ def _get_cached_run(run_id):
     )
     try:
         run_file = os.path.join(run_cache_dir, "description.xml")
-        with io.open(run_file, encoding='utf8') as fh:
-            run = _create_run_from_xml(xml=fh.read())
+        run = _create_run_from_xml(
+            xml=openml.utils._read_cache_file(run_file))
         return run
 
     except (OSError, IOError):
@@ -897,8 +1316,264 @@ def _get_cached_run(run_id):
                                    "cached" % run_id)
 
 
+def from_filesystem(directory):
+    """Load a run which was stored with ``OpenMLRun.to_filesystem``.
+
+    Parameters
+    ----------
+    directory : str
+
+    Returns
+    -------
+    run : OpenMLRun
+    """
+    description_xml = openml.utils._read_cache_file(
+        os.path.join(directory, 'description.xml'))
+    run = _create_run_from_xml(description_xml, from_server=False)
+    # Keep the parameter settings in the format in which they are uploaded
+    description = xmltodict.parse(
+        description_xml, force_list=('oml:parameter_setting',))['oml:run']
+    run.parameter_settings = description.get('oml:parameter_setting', [])
+    run.error_message = description.get('oml:error_message')
+
+    properties = json.loads(openml.utils._read_cache_file(
+        os.path.join(directory, 'run.json')))
+    run.run_id = properties['run_id']
+    run.dataset_id = properties['dataset_id']
+    run.setup_id = properties['setup_id']
+    run.flow_name = properties['flow_name']
+    if properties['trace_attributes'] is not None:
+        run.trace_attributes = [tuple(attribute) for attribute
+                                in properties['trace_attributes']]
+
+    run.data_content = _load_columns(os.path.join(directory,
+                                                  'predictions.npz'))
+    trace_file = os.path.join(directory, 'trace.npz')
+    if os.path.exists(trace_file):
+        run.trace_content = _load_columns(trace_file)
+
+    model_file = os.path.join(directory, 'model.pkl')
+    if openml.utils._verify_cache_file(model_file):
+        with open(model_file, 'rb') as fh:
+            run.model = pickle.load(fh)
+
+    return run
+
+
+def _load_columns(filename):
+    if not openml.utils._verify_cache_file(filename):
+        raise IOError('%s is not stored or incomplete' % filename)
+    with np.load(filename, allow_pickle=False) as columns:
+        return _columns_to_rows(dict((name, columns[name])
+                                     for name in columns.files))
+
+
+@contextlib.contextmanager
+def _connect_local_runs(directory):
+    """Open the catalog of the local runs stored in ``directory``."""
+    connection = sqlite3.connect(os.path.join(directory, LOCAL_RUNS_INDEX),
+                                 timeout=60)
+    try:
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS runs ('
+            ' local_id INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' task_id INTEGER NOT NULL,'
+            ' flow_id INTEGER,'
+            ' setup_id INTEGER,'
+            ' run_id INTEGER,'
+            ' dataset_id INTEGER,'
+            ' flow_name TEXT,'
+            ' created REAL NOT NULL,'
+            ' evaluations TEXT NOT NULL,'
+            ' parameters_hash TEXT)'
+        )
+        columns = [row[1] for row in
+                   connection.execute('PRAGMA table_info(runs)')]
+        if 'parameters_hash' not in columns:
+            # Catalog created by an older version
+            connection.execute('ALTER TABLE runs ADD COLUMN parameters_hash '
+                               'TEXT')
+        yield connection
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def _get_local_runs_directory(directory=None):
+    if directory is None:
+        return openml.utils._create_cache_directory(LOCAL_RUNS_DIR_NAME)
+    try:
+        os.makedirs(directory)
+    except (IOError, OSError):
+        if not os.path.isdir(directory):
+            raise
+    return directory
+
+
+def store_run(run, directory=None, store_model=True):
+    """Add an executed run to a local run catalog.
+
+    The run is stored with ``OpenMLRun.to_filesystem`` and can later be
+    found with ``list_local_runs`` and loaded with ``load_local_run``.
+
+    Parameters
+    ----------
+    run : OpenMLRun
+
+    directory : str, optional
+        Directory of the catalog. Defaults to the directory ``local_runs`` in
+        the cache directory of the current server.
+
+    store_model : bool
+        Whether to store the model of the run.
+
+    Returns
+    -------
+    local_id : int
+        Id of the run in the catalog.
+    """
+    directory = _get_local_runs_directory(directory)
+
+    setup_id = run.setup_id
+    parameters_hash = None
+    if run.parameter_settings:
+        parameters_hash = openml.setups.functions._get_parameter_settings_hash(
+            run.parameter_settings)
+    if setup_id is None and run.flow_id is not None and \
+            parameters_hash is not None:
+        # The setup is known locally if it was looked up before
+        setup_id = openml.cache._get_setup_id(run.flow_id, parameters_hash)
+
+    # Mean of every measure over all folds
+    evaluations = {}
+    for measure, repeats in (run.fold_evaluations or {}).items():
+        values = [value for folds in repeats.values()
+                  for value in folds.values()]
+        evaluations[measure] = float(np.mean(values))
+
+    with _connect_local_runs(directory) as connection:
+        cursor = connection.execute(
+            'INSERT INTO runs (task_id, flow_id, setup_id, run_id, '
+            'dataset_id, flow_name, created, evaluations, parameters_hash) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (run.task_id, run.flow_id, setup_id, run.run_id, run.dataset_id,
+             run.flow_name, time.time(), json.dumps(evaluations),
+             parameters_hash),
+        )
+        local_id = cursor.lastrowid
+
+    try:
+        run.to_filesystem(os.path.join(directory, str(local_id)),
+                          store_model=store_model)
+    except BaseException:
+        remove_local_run(local_id, directory)
+        raise
+    return local_id
+
+
+def list_local_runs(task=None, flow=None, setup=None, directory=None):
+    """List the runs of a local run catalog.
+
+    Parameters
+    ----------
+    task : list, optional
+
+    flow : list, optional
+
+    setup : list, optional
+
+    directory : str, optional
+        Directory of the catalog, see ``store_run``.
+
+    Returns
+    -------
+    dict
+        Maps the local id of every run to a dictionary with the keys
+        ``local_id``, ``task_id``, ``flow_id``, ``setup_id``, ``run_id``
+        (if the run was published), ``dataset_id``, ``flow_name``,
+        ``created`` and ``evaluations`` (mean of every measure over all
+        folds).
+    """
+    directory = _get_local_runs_directory(directory)
+    conditions = []
+    arguments = []
+    for column, values in (('task_id', task), ('flow_id', flow),
+                           ('setup_id', setup)):
+        if values is None:
+            continue
+        values = [int(value) for value in values]
+        conditions.append('%s IN (%s)' % (column,
+                                          ', '.join('?' * len(values))))
+        arguments.extend(values)
+    query = ('SELECT local_id, task_id, flow_id, setup_id, run_id, '
+             'dataset_id, flow_name, created, evaluations FROM runs')
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += ' ORDER BY local_id'
+
+    runs = OrderedDict()
+    with _connect_local_runs(directory) as connection:
+        for row in connection.execute(query, arguments):
+            run = dict(zip(('local_id', 'task_id', 'flow_id', 'setup_id',
+                            'run_id', 'dataset_id', 'flow_name', 'created'),
+                           row[:8]))
+            run['evaluations'] = json.loads(row[8])
+            runs[run['local_id']] = run
+    return runs
+
+
+def _local_run_exists(task_id, flow_id, parameters_hash, directory=None):
+    """Get the local ids of the runs of a local run catalog with the given
+    task, flow and parameter settings (see
+    ``openml.setups.functions._get_parameter_settings_hash``)."""
+    directory = _get_local_runs_directory(directory)
+    with _connect_local_runs(directory) as connection:
+        rows = connection.execute(
+            'SELECT local_id FROM runs WHERE task_id = ? AND flow_id = ? '
+            'AND parameters_hash = ?', (task_id, flow_id, parameters_hash),
+        ).fetchall()
+    return set(row[0] for row in rows)
+
+
+def load_local_run(local_id, directory=None):
+    """Load a run from a local run catalog.
+
+    Parameters
+    ----------
+    local_id : int
+
+    directory : str, optional
+        Directory of the catalog, see ``store_run``.
+
+    Returns
+    -------
+    run : OpenMLRun
+    """
+    directory = _get_local_runs_directory(directory)
+    return from_filesystem(os.path.join(directory, str(int(local_id))))
+
+
+def remove_local_run(local_id, directory=None):
+    """Remove a run from a local run catalog.
+
+    Parameters
+    ----------
+    local_id : int
+
+    directory : str, optional
+        Directory of the catalog, see ``store_run``.
+    """
+    directory = _get_local_runs_directory(directory)
+    with _connect_local_runs(directory) as connection:
+        connection.execute('DELETE FROM runs WHERE local_id = ?',
+                           (int(local_id),))
+    shutil.rmtree(os.path.join(directory, str(int(local_id))),
+                  ignore_errors=True)
+
+
 def list_runs(offset=None, size=None, id=None, task=None, setup=None,
-              flow=None, uploader=None, tag=None, display_errors=False, **kwargs):
+              flow=None, uploader=None, tag=None, display_errors=False,
+              output_format='dict', **kwargs):
 
     """
     List all runs matching all of the given filters.
@@ -927,21 +1602,52 @@ def list_runs(offset=None, size=None, id=None, task=None, setup=None,
         Whether to list runs which have an error (for example a missing
         prediction file).
 
+    output_format : str, optional (default='dict')
+        ``dict`` describes every run by a dict, ``record`` by a
+        ``RunRecord`` namedtuple. ``array`` returns an ``OrderedDict`` of
+        columns (numpy arrays) instead, ``dataframe`` a pandas DataFrame.
+
     kwargs: dict, optional
         Legal filter operators: task_type.
 
     Returns
     -------
-    dict
+    dict, OrderedDict or pandas.DataFrame
         List of found runs.
     """
 
-    return openml.utils.list_all(_list_runs, offset=offset, size=size, id=id, task=task, setup=setup,
-                                 flow=flow, uploader=uploader, tag=tag, display_errors=display_errors, **kwargs)
+    openml.utils._check_output_format(output_format)
+    runs = openml.utils.list_all(_list_runs, offset=offset, size=size, id=id, task=task, setup=setup,
+                                 flow=flow, uploader=uploader, tag=tag, display_errors=display_errors,
+                                 output_format=openml.utils._get_parse_format(output_format), **kwargs)
+    return openml.utils._format_listing(runs, output_format)
+
+
+def iter_runs(offset=None, size=None, id=None, task=None, setup=None,
+              flow=None, uploader=None, tag=None, display_errors=False,
+              output_format='dict', **kwargs):
+    """
+    Iterate over all runs matching all of the given filters.
+
+    Takes the same arguments as ``list_runs``, but requests the runs page by
+    page and yields them as they arrive. ``output_format`` is either
+    ``dict`` or ``record``.
+
+    Yields
+    ------
+    dict or RunRecord
+        Description of a run.
+    """
+
+    openml.utils._check_output_format(output_format, ('dict', 'record'))
+    return openml.utils.iter_all(_list_runs, offset=offset, size=size, id=id, task=task, setup=setup,
+                                 flow=flow, uploader=uploader, tag=tag, display_errors=display_errors,
+                                 output_format=output_format, **kwargs)
 
 
 def _list_runs(id=None, task=None, setup=None,
-               flow=None, uploader=None, display_errors=False, **kwargs):
+               flow=None, uploader=None, display_errors=False,
+               output_format='dict', **kwargs):
 
     """
     Perform API call `/run/list/{filters}'
@@ -968,6 +1674,9 @@ def _list_runs(id=None, task=None, setup=None,
         Whether to list runs which have an error (for example a missing
         prediction file).
 
+    output_format : str, optional (default='dict')
+        Either ``dict`` or ``record``.
+
     kwargs: dict, optional
         Legal filter operators: task_type.
 
@@ -993,38 +1702,24 @@ def _list_runs(id=None, task=None, setup=None,
         api_call += "/uploader/%s" % ','.join([str(int(i)) for i in uploader])
     if display_errors:
         api_call += "/show_errors/true"
-    return __list_runs(api_call)
+    return __list_runs(api_call, output_format)
 
 
-def __list_runs(api_call):
+def __list_runs(api_call, output_format='dict'):
     """Helper function to parse API calls which are lists of runs"""
     xml_string = openml._api_calls._perform_api_call(api_call)
-    runs_dict = xmltodict.parse(xml_string, force_list=('oml:run',))
-    # Minimalistic check if the XML is useful
-    if 'oml:runs' not in runs_dict:
-        raise ValueError('Error in return XML, does not contain "oml:runs": %s'
-                         % str(runs_dict))
-    elif '@xmlns:oml' not in runs_dict['oml:runs']:
-        raise ValueError('Error in return XML, does not contain '
-                         '"oml:runs"/@xmlns:oml: %s'
-                         % str(runs_dict))
-    elif runs_dict['oml:runs']['@xmlns:oml'] != 'http://openml.org/openml':
-        raise ValueError('Error in return XML, value of  '
-                         '"oml:runs"/@xmlns:oml is not '
-                         '"http://openml.org/openml": %s'
-                         % str(runs_dict))
-
-    assert type(runs_dict['oml:runs']['oml:run']) == list, \
-        type(runs_dict['oml:runs'])
 
     runs = dict()
-    for run_ in runs_dict['oml:runs']['oml:run']:
-        run_id = int(run_['oml:run_id'])
-        run = {'run_id': run_id,
-               'task_id': int(run_['oml:task_id']),
-               'setup_id': int(run_['oml:setup_id']),
-               'flow_id': int(run_['oml:flow_id']),
-               'uploader': int(run_['oml:uploader'])}
+    for run_ in openml.utils._iter_listing(xml_string, 'runs', 'run'):
+        fields = openml.utils._get_child_texts(run_)
+        run_id = int(fields['run_id'])
+        run = RunRecord(run_id=run_id,
+                        task_id=int(fields['task_id']),
+                        setup_id=int(fields['setup_id']),
+                        flow_id=int(fields['flow_id']),
+                        uploader=int(fields['uploader']))
+        if output_format == 'dict':
+            run = dict(zip(run._fields, run))
 
         runs[run_id] = run
 
@@ -1,10 +1,14 @@
 from collections import OrderedDict
+import io
 import json
+import os
+import pickle
 import sys
 import time
 import numpy as np
 
 import arff
+import six
 import xmltodict
 
 import openml
@@ -220,27 +224,136 @@ class OpenMLRun(object):
         -------
         self : OpenMLRun
         """
-        if self.model is None:
-            raise PyOpenMLError("OpenMLRun obj does not contain a model. (This should never happen.) ");
-        if self.flow_id is None:
-            raise PyOpenMLError("OpenMLRun obj does not contain a flow id. (Should have been added while executing the task.) ");
+        self._check_publishable()
 
         description_xml = self._create_description_xml()
         file_elements = {'description': ("description.xml", description_xml)}
 
+        # The ARFF files are streamed to the server instead of being built
+        # in memory
         if self.error_message is None:
-            predictions = arff.dumps(self._generate_arff_dict())
+            predictions = _iter_arff_lines(self._generate_arff_dict())
             file_elements['predictions'] = ("predictions.arff", predictions)
 
         if self.trace_content is not None:
-            trace_arff = arff.dumps(self._generate_trace_arff_dict())
+            trace_arff = _iter_arff_lines(self._generate_trace_arff_dict())
             file_elements['trace'] = ("trace.arff", trace_arff)
 
         return_value = openml._api_calls._perform_api_call("/run/", file_elements=file_elements)
         run_id = int(xmltodict.parse(return_value)['oml:upload_run']['oml:run_id'])
         self.run_id = run_id
+        # The runs of the task which are known locally are outdated now
+        openml.cache._forget_run_ids(self.task_id)
         return self
 
+    def publish_async(self, queue=None):
+        """Publish a run to the OpenML server in the background.
+
+        The files of the run are written to disk and uploaded by a pool of
+        threads, see ``openml.runs.UploadQueue``.
+
+        Parameters
+        ----------
+        queue : UploadQueue, optional
+            Defaults to a queue in the cache directory of the current server.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Resolves to the id of the uploaded run. Sets the run_id on self
+            once the upload finished.
+        """
+        if queue is None:
+            queue = openml.runs.upload._get_default_upload_queue()
+        return queue.submit(self)
+
+    def _check_publishable(self):
+        if self.model is None:
+            raise PyOpenMLError("OpenMLRun obj does not contain a model. (This should never happen.) ");
+        if self.flow_id is None:
+            raise PyOpenMLError("OpenMLRun obj does not contain a flow id. (Should have been added while executing the task.) ");
+
+    def _write_upload_files(self, directory):
+        """Write the files uploaded by ``publish`` to a directory.
+
+        The ARFF files are written row by row instead of being built in
+        memory first.
+        """
+        with io.open(os.path.join(directory, 'description.xml'), 'w',
+                     encoding='utf8') as fh:
+            fh.write(self._create_description_xml())
+
+        if self.error_message is None:
+            with io.open(os.path.join(directory, 'predictions.arff'), 'w',
+                         encoding='utf8') as fh:
+                arff.dump(self._generate_arff_dict(), fh)
+
+        if self.trace_content is not None:
+            with io.open(os.path.join(directory, 'trace.arff'), 'w',
+                         encoding='utf8') as fh:
+                arff.dump(self._generate_trace_arff_dict(), fh)
+
+    def to_filesystem(self, directory, store_model=True):
+        """Store an executed run in a directory.
+
+        The description is stored as it would be uploaded by ``publish``
+        (``description.xml``), the predictions and the optimization trace
+        column-wise in compressed binary files. Use
+        ``openml.runs.from_filesystem`` to load the run again, e.g. to
+        publish it later.
+
+        Parameters
+        ----------
+        directory : str
+            Created if it does not exist yet. A run which was stored in this
+            directory before is overwritten.
+
+        store_model : bool
+            Whether to pickle the model as well. Without the model, the
+            loaded run cannot be published.
+        """
+        if self.data_content is None:
+            raise ValueError('Run has not been executed.')
+        try:
+            os.makedirs(directory)
+        except (IOError, OSError):
+            if not os.path.isdir(directory):
+                raise
+
+        with openml.utils._atomic_write(
+                os.path.join(directory, 'description.xml')) as fh:
+            fh.write(self._create_description_xml())
+        with openml.utils._atomic_write(
+                os.path.join(directory, 'predictions.npz'), 'wb') as fh:
+            np.savez_compressed(fh, **_rows_to_columns(self.data_content))
+
+        trace_file = os.path.join(directory, 'trace.npz')
+        if self.trace_content is not None:
+            with openml.utils._atomic_write(trace_file, 'wb') as fh:
+                np.savez_compressed(fh,
+                                    **_rows_to_columns(self.trace_content))
+        elif os.path.exists(trace_file):
+            os.remove(trace_file)
+
+        model_file = os.path.join(directory, 'model.pkl')
+        if store_model and self.model is not None:
+            with openml.utils._atomic_write(model_file, 'wb') as fh:
+                pickle.dump(self.model, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        elif os.path.exists(model_file):
+            os.remove(model_file)
+
+        # Fields which are not part of the description
+        properties = {
+            'run_id': self.run_id,
+            'dataset_id': self.dataset_id,
+            'setup_id': self.setup_id,
+            'flow_name': self.flow_name,
+            'trace_attributes': self.trace_attributes,
+        }
+        with openml.utils._atomic_write(
+                os.path.join(directory, 'run.json')) as fh:
+            fh.write(six.text_type(json.dumps(properties)))
+
     def _create_description_xml(self):
         """Create xml representation of run for upload.
 
@@ -469,6 +582,89 @@ def _to_dict(taskid, flow_id, setup_string, error_message, parameter_settings,
     return description
 
 
+def _iter_arff_lines(arff_dict):
+    """Encode an ARFF dictionary line by line."""
+    for line in arff.ArffEncoder().iter_encode(arff_dict):
+        yield line + u'\n'
+
+
+def _rows_to_columns(rows):
+    """Convert predictions or trace rows into a dictionary of numpy arrays
+    which can be stored with ``np.savez`` without pickling any object.
+
+    A column whose values are all of the same type is stored as an array of
+    this type. Other columns are stored as strings ``column_<i>`` together
+    with the type of every value in ``column_<i>_types``, so that e.g. an
+    integer in a column of floats is loaded as an integer again.
+    """
+    columns = OrderedDict()
+    for i, values in enumerate(zip(*rows)):
+        types = [_get_value_type(value) for value in values]
+        if len(set(types)) == 1 and types[0] != 'n':
+            column = np.array(values)
+            if column.dtype.kind in 'biufSU':
+                columns['column_%d' % i] = column
+                continue
+        columns['column_%d' % i] = np.array(
+            [_format_value(value, type_) for value, type_
+             in zip(values, types)], dtype=six.text_type)
+        columns['column_%d_types' % i] = np.array(types, dtype=six.text_type)
+    return columns
+
+
+def _columns_to_rows(columns):
+    """Inverse of ``_rows_to_columns``."""
+    n_columns = len([name for name in columns if not name.endswith('_types')])
+    values = []
+    for i in range(n_columns):
+        column = columns['column_%d' % i].tolist()
+        types = columns.get('column_%d_types' % i)
+        if types is not None:
+            column = [_parse_value(value, type_)
+                      for value, type_ in zip(column, types.tolist())]
+        values.append(column)
+    return [list(row) for row in zip(*values)]
+
+
+def _get_value_type(value):
+    if value is None:
+        return 'n'
+    if isinstance(value, (bool, np.bool_)):
+        return 'b'
+    if isinstance(value, six.integer_types + (np.integer, )):
+        return 'i'
+    if isinstance(value, (float, np.floating)):
+        return 'f'
+    if isinstance(value, six.string_types):
+        return 's'
+    raise TypeError('Cannot store value %r of type %s.'
+                    % (value, type(value).__name__))
+
+
+def _format_value(value, type_):
+    if type_ == 'n':
+        return u''
+    if type_ == 'f':
+        # repr keeps all digits of the float
+        return six.text_type(repr(float(value)))
+    if type_ == 's':
+        return value if isinstance(value, six.text_type) \
+            else value.decode('utf-8')
+    return six.text_type(value)
+
+
+def _parse_value(value, type_):
+    if type_ == 'n':
+        return None
+    if type_ == 'b':
+        return value == 'True'
+    if type_ == 'i':
+        return int(value)
+    if type_ == 'f':
+        return float(value)
+    return value
+
+
 def _create_setup_string(model):
     """Create a string representing the model"""
     run_environment = " ".join(_get_version_information())
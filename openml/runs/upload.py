@@ -0,0 +1,370 @@
+"""
+Background upload of runs.
+
+``OpenMLRun.publish`` waits while the predictions are serialized and sent to
+the server. An ``UploadQueue`` instead writes the files of a run to a queue
+directory and uploads them from a pool of threads, so that the next run can
+be executed in the meantime. The queue directory lives in the cache directory
+of the current server; uploads which did not finish (because the process was
+stopped or the server could not be reached) are picked up again by the next
+``UploadQueue`` created for this directory.
+
+Uploading a run is not idempotent. Before a run is sent for the first time,
+the id of the latest run with the same task and setup on the server is stored
+with the queued run. If a request may have reached the server before it
+failed, a run with the same task and setup and a larger id is taken to be the
+uploaded run, otherwise the run is uploaded again.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import io
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import fasteners
+import requests
+import six
+from requests.packages.urllib3.exceptions import NewConnectionError
+import xmltodict
+
+import openml
+import openml._api_calls
+from .. import config
+from ..exceptions import OpenMLServerError, OpenMLServerException, \
+    OpenMLServerNoResult
+
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_QUEUE_DIR_NAME = 'upload_queue'
+UPLOAD_FILE_NAMES = (
+    ('description', 'description.xml'),
+    ('predictions', 'predictions.arff'),
+    ('trace', 'trace.arff'),
+)
+# Created in an entry before it is sent to the server
+SENT_FILE_NAME = 'sent'
+
+# Entries which are uploaded by a queue of this process. File locks do not
+# protect against other threads of the same process.
+_claimed_entries = set()
+_claimed_entries_lock = threading.Lock()
+
+_default_queues = {}
+_default_queues_lock = threading.Lock()
+
+
+class UploadQueue(object):
+    """Upload runs to the OpenML server in the background.
+
+    Parameters
+    ----------
+    directory : str, optional
+        Directory in which pending uploads are stored. Defaults to the
+        directory ``upload_queue`` in the cache directory of the current
+        server.
+
+    n_threads : int
+        Number of runs which are uploaded at the same time. Only the runs
+        which are currently uploaded are held in memory, all other pending
+        runs wait on disk.
+
+    max_retries : int
+        How often an upload is retried after the connection failed or the
+        server returned an unexpected error. Errors reported by the server
+        (e.g. an invalid run) are not retried. If the failed request may have
+        reached the server, the run is only uploaded again if the server has
+        no run with the same task and setup which was uploaded since.
+
+    retry_delay : float
+        Seconds to wait before the first retry, doubled for every further
+        retry.
+
+    Attributes
+    ----------
+    recovered : list of concurrent.futures.Future
+        Futures of the uploads which were found in the queue directory when
+        the queue was created.
+    """
+
+    def __init__(self, directory=None, n_threads=2, max_retries=3,
+                 retry_delay=1):
+        if directory is None:
+            directory = os.path.join(config.get_cache_directory(),
+                                     UPLOAD_QUEUE_DIR_NAME)
+        try:
+            os.makedirs(directory)
+        except (IOError, OSError):
+            if not os.path.isdir(directory):
+                raise
+        self.directory = directory
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._executor = ThreadPoolExecutor(max_workers=n_threads)
+        self.recovered = [self._submit_entry(entry)
+                          for entry in self.pending()]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown(wait=True)
+
+    def submit(self, run):
+        """Queue a run for upload.
+
+        The files of the run are written to the queue directory before this
+        method returns, the run object can be discarded afterwards.
+
+        Parameters
+        ----------
+        run : OpenMLRun
+            An executed run.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Resolves to the id of the uploaded run. The ``run_id`` of ``run``
+            is set once the upload finished.
+        """
+        run._check_publishable()
+        # Entries are named by their creation time, so that they are
+        # uploaded in order after a restart
+        entry = '%d-%s' % (time.time() * 1e6, uuid.uuid4().hex[:8])
+        tmp_directory = os.path.join(self.directory, '.tmp-' + entry)
+        os.makedirs(tmp_directory)
+        try:
+            run._write_upload_files(tmp_directory)
+            parameters_hash = None
+            if run.parameter_settings:
+                parameters_hash = \
+                    openml.setups.functions._get_parameter_settings_hash(
+                        run.parameter_settings)
+            with io.open(os.path.join(tmp_directory, 'meta.json'), 'w',
+                         encoding='utf8') as fh:
+                fh.write(json.dumps({'task_id': run.task_id,
+                                     'flow_id': run.flow_id,
+                                     'parameters_hash': parameters_hash}))
+            os.rename(tmp_directory, os.path.join(self.directory, entry))
+        except BaseException:
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+            raise
+
+        future = self._submit_entry(entry)
+
+        def _set_run_id(future):
+            if not future.cancelled() and future.exception() is None:
+                run.run_id = future.result()
+
+        future.add_done_callback(_set_run_id)
+        return future
+
+    def pending(self):
+        """Return the entries of the queue directory which wait for upload.
+
+        Returns
+        -------
+        list of str
+            Names of the entries, oldest first.
+        """
+        return sorted(name for name in os.listdir(self.directory)
+                      if not name.startswith('.')
+                      and os.path.isdir(os.path.join(self.directory, name)))
+
+    def shutdown(self, wait=True):
+        """Stop accepting runs.
+
+        Parameters
+        ----------
+        wait : bool
+            Whether to wait until all queued runs were uploaded. Runs which
+            were not uploaded stay in the queue directory.
+        """
+        self._executor.shutdown(wait=wait)
+
+    def _submit_entry(self, entry):
+        return self._executor.submit(self._upload_entry, entry)
+
+    def _upload_entry(self, entry):
+        path = os.path.join(self.directory, entry)
+        with _claimed_entries_lock:
+            if path in _claimed_entries:
+                raise ValueError('%s is already uploaded by another queue.'
+                                 % entry)
+            _claimed_entries.add(path)
+        # The lock file is never removed, otherwise another process could
+        # lock a new lock file while this one is still locked
+        lock_file = os.path.join(self.directory, '.%s.lock' % entry)
+        lock = fasteners.InterProcessLock(lock_file)
+        try:
+            if not lock.acquire(blocking=False):
+                raise ValueError('%s is already uploaded by another process.'
+                                 % entry)
+            try:
+                if not os.path.isdir(path):
+                    raise ValueError('%s was already uploaded.' % entry)
+                return self._upload_with_retries(path)
+            finally:
+                lock.release()
+        finally:
+            with _claimed_entries_lock:
+                _claimed_entries.discard(path)
+
+    def _upload_with_retries(self, path):
+        file_dictionary = dict(
+            (key, os.path.join(path, filename))
+            for key, filename in UPLOAD_FILE_NAMES
+            if os.path.exists(os.path.join(path, filename))
+        )
+        with io.open(os.path.join(path, 'meta.json'), encoding='utf8') as fh:
+            meta = json.load(fh)
+
+        sent_file = os.path.join(path, SENT_FILE_NAME)
+
+        attempt = 0
+        while True:
+            run_id = None
+            try:
+                if os.path.exists(sent_file):
+                    # An earlier request may have reached the server
+                    run_id = _find_uploaded_run(path, meta)
+                    if run_id is not None:
+                        logger.warning('Run %d with the task and setup of '
+                                       '%s was uploaded since it was sent, '
+                                       'not uploading it again.',
+                                       run_id, path)
+                        break
+                elif 'last_run_id' not in meta and _can_find_runs(meta):
+                    meta['last_run_id'] = _find_latest_run(meta)
+                    with openml.utils._atomic_write(
+                            os.path.join(path, 'meta.json')) as fh:
+                        fh.write(six.text_type(json.dumps(meta)))
+            except (OpenMLServerError, OpenMLServerException,
+                    requests.exceptions.RequestException) as e:
+                error = e
+            else:
+                with open(sent_file, 'w'):
+                    pass
+                try:
+                    return_value = openml._api_calls._perform_api_call(
+                        '/run/', file_dictionary=file_dictionary,
+                    )
+                    run_id = int(xmltodict.parse(return_value)
+                                 ['oml:upload_run']['oml:run_id'])
+                    break
+                except OpenMLServerException:
+                    # The server rejected the run, uploading it again will
+                    # not help
+                    shutil.rmtree(path)
+                    raise
+                except (OpenMLServerError,
+                        requests.exceptions.RequestException) as e:
+                    error = e
+                    if not _may_have_been_sent(e):
+                        os.remove(sent_file)
+
+            if attempt >= self.max_retries:
+                raise error
+            delay = self.retry_delay * 2 ** attempt
+            attempt += 1
+            logger.warning('Uploading %s failed (%s), retrying in %.1fs.',
+                           path, error, delay)
+            time.sleep(delay)
+
+        shutil.rmtree(path)
+        openml.cache._forget_run_ids(meta['task_id'])
+        logger.info('Uploaded run %d.', run_id)
+        return run_id
+
+
+def _may_have_been_sent(error):
+    """Check whether a request may have reached the server before it failed
+    with ``error``."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return False
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        # The connection could not be established
+        reason = getattr(error.args[0], 'reason', None)
+        return not isinstance(reason, NewConnectionError)
+    return True
+
+
+def _can_find_runs(meta):
+    return meta.get('parameters_hash') is not None and \
+        meta.get('flow_id') is not None
+
+
+def _find_uploaded_run(path, meta):
+    """Find the run on the server which was created by a request which may
+    have reached the server.
+
+    Only runs with a larger id than the latest run with the same task and
+    setup before the run was sent are considered, other runs were uploaded
+    before (e.g. by another user).
+
+    Returns
+    -------
+    int or None
+        The id of the run, ``None`` if there is no such run.
+
+    Raises
+    ------
+    ValueError
+        If the queued run lacks the information to find it on the server.
+        It is kept in the queue directory then.
+    """
+    if 'last_run_id' not in meta or not _can_find_runs(meta):
+        raise ValueError('%s may have been uploaded already, which cannot be '
+                         'verified. Remove the file %s to upload it again.'
+                         % (path, os.path.join(path, SENT_FILE_NAME)))
+    run_id = _find_latest_run(meta)
+    return run_id if run_id > meta['last_run_id'] else None
+
+
+def _find_latest_run(meta):
+    """Find the latest run on the server with the task and setup of a queued
+    run.
+
+    Returns
+    -------
+    int
+        The id of the run, ``0`` if the setup or run does not exist on the
+        server.
+    """
+    parameters_hash = meta['parameters_hash']
+    setup_id = openml.cache._get_setup_id(meta['flow_id'], parameters_hash)
+    if setup_id is None:
+        try:
+            setups = openml.setups.list_setups(flow=meta['flow_id'])
+        except OpenMLServerNoResult:
+            setups = {}
+        for candidate_id, setup in setups.items():
+            if openml.setups.functions._get_setup_parameters_hash(setup) \
+                    == parameters_hash:
+                setup_id = candidate_id
+                break
+        else:
+            # Uploading the run would have created the setup
+            return 0
+    try:
+        runs = openml.runs.list_runs(task=[meta['task_id']], setup=[setup_id])
+    except OpenMLServerNoResult:
+        return 0
+    return max(runs) if runs else 0
+
+
+def _get_default_upload_queue():
+    """Get the upload queue of the current cache directory, which is used
+    by ``OpenMLRun.publish_async``."""
+    directory = os.path.join(config.get_cache_directory(),
+                             UPLOAD_QUEUE_DIR_NAME)
+    with _default_queues_lock:
+        queue = _default_queues.get(directory)
+        if queue is None:
+            queue = UploadQueue(directory)
+            _default_queues[directory] = queue
+        return queue
@@ -1,4 +1,6 @@
 from .setup import OpenMLSetup
-from .functions import get_setup, list_setups, setup_exists, initialize_model
+from .functions import (get_setup, list_setups, iter_setups, setup_exists,
+                        initialize_model)
 
-__all__ = ['get_setup', 'list_setups', 'setup_exists', 'initialize_model']
\ No newline at end of file
+__all__ = ['get_setup', 'list_setups', 'iter_setups', 'setup_exists',
+           'initialize_model']
\ No newline at end of file
@@ -1,16 +1,20 @@
 from collections import OrderedDict
+import hashlib
+import json
 
-import io
 import openml
 import os
+import six
 import xmltodict
 
-from .. import config
 from .setup import OpenMLSetup, OpenMLParameter
 from openml.flows import flow_exists
 from openml.exceptions import OpenMLServerNoResult
+import openml.cache
 import openml.utils
 
+SETUPS_CACHE_DIR_NAME = 'setups'
+
 
 def setup_exists(flow, model=None):
     '''
@@ -44,6 +48,11 @@ def setup_exists(flow, model=None):
             raise ValueError('This should not happen!')
 
     openml_param_settings = openml.runs.OpenMLRun._parse_parameters(flow, model)
+    parameters_hash = _get_parameter_settings_hash(openml_param_settings)
+    setup_id = openml.cache._get_setup_id(flow.flow_id, parameters_hash)
+    if setup_id is not None:
+        return setup_id
+
     description = xmltodict.unparse(_to_dict(flow.flow_id,
                                              openml_param_settings),
                                     pretty=True)
@@ -54,20 +63,78 @@ def setup_exists(flow, model=None):
     result_dict = xmltodict.parse(result)
     setup_id = int(result_dict['oml:setup_exists']['oml:id'])
     if setup_id > 0:
+        openml.cache._set_setup_ids(flow.flow_id,
+                                    {parameters_hash: setup_id})
         return setup_id
     else:
         return False
 
 
+def _get_parameters_hash(parameters):
+    """Hash parameter settings independent of their order.
+
+    Parameters
+    ----------
+    parameters : iterable
+        Tuples ``(flow_id, parameter_name, value)``. The value is either
+        serialized as by ``OpenMLRun._parse_parameters`` or as returned by the
+        server, see ``_normalize_parameter_value``.
+
+    Returns
+    -------
+    str
+    """
+    parameters = sorted((int(flow_id), name, _normalize_parameter_value(value))
+                        for flow_id, name, value in parameters)
+    key = json.dumps(parameters).encode('utf-8')
+    return hashlib.md5(key).hexdigest()
+
+
+def _normalize_parameter_value(value):
+    """Serialize a parameter value in a canonical way.
+
+    Parameter values are uploaded JSON serialized, but the server returns
+    them as plain text, e.g. an empty value instead of ``null``. Values which
+    are JSON are therefore parsed and serialized again, other values are
+    serialized as they are.
+    """
+    if isinstance(value, six.string_types):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            pass
+    return json.dumps(value, sort_keys=True)
+
+
+def _get_parameter_settings_hash(parameter_settings):
+    """Hash parameter settings as returned by
+    ``OpenMLRun._parse_parameters``."""
+    return _get_parameters_hash(
+        (parameter['oml:component'], parameter['oml:name'],
+         parameter['oml:value']) for parameter in parameter_settings
+    )
+
+
+def _get_setup_parameters_hash(setup):
+    """Hash the parameter settings of an ``OpenMLSetup`` like the ones of a
+    model in ``setup_exists``."""
+    parameters = setup.parameters or {}
+    return _get_parameters_hash(
+        (parameter.flow_id, parameter.parameter_name, parameter.value)
+        for parameter in parameters.values()
+    )
+
+
 def _get_cached_setup(setup_id):
     """Load a run from the cache."""
-    cache_dir = config.get_cache_directory()
-    setup_cache_dir = os.path.join(cache_dir, "setups", str(setup_id))
+    setup_cache_dir = openml.utils._create_cache_directory_for_id(
+        SETUPS_CACHE_DIR_NAME, setup_id,
+    )
     try:
         setup_file = os.path.join(setup_cache_dir, "description.xml")
-        with io.open(setup_file, encoding='utf8') as fh:
-            setup_xml = xmltodict.parse(fh.read())
-            setup = _create_setup_from_xml(setup_xml)
+        setup_xml = xmltodict.parse(
+            openml.utils._read_cache_file(setup_file))
+        setup = _create_setup_from_xml(setup_xml)
         return setup
 
     except (OSError, IOError):
@@ -89,25 +156,43 @@ def get_setup(setup_id):
         OpenMLSetup
             an initialized openml setup object
     """
-    setup_dir = os.path.join(config.get_cache_directory(), "setups", str(setup_id))
-    setup_file = os.path.join(setup_dir, "description.xml")
+    # Threads requesting the same setup share the download
+    return openml.cache._single_flight(SETUPS_CACHE_DIR_NAME, setup_id,
+                                       _get_setup, setup_id)
+
+
+def _get_setup(setup_id):
+    setup = openml.cache._get_memoized(SETUPS_CACHE_DIR_NAME, setup_id)
+    if setup is not None:
+        return setup
 
-    if not os.path.exists(setup_dir):
-        os.makedirs(setup_dir)
+    setup_dir = openml.utils._create_cache_directory_for_id(
+        SETUPS_CACHE_DIR_NAME, setup_id,
+    )
+    setup_file = os.path.join(setup_dir, "description.xml")
 
     try:
-        return _get_cached_setup(setup_id)
+        setup = _get_cached_setup(setup_id)
+        openml.cache._touch(SETUPS_CACHE_DIR_NAME, setup_id)
 
     except (openml.exceptions.OpenMLCacheException):
         setup_xml = openml._api_calls._perform_api_call('/setup/%d' % setup_id)
-        with io.open(setup_file, "w", encoding='utf8') as fh:
+        with openml.utils._atomic_write(setup_file) as fh:
             fh.write(setup_xml)
 
-    result_dict = xmltodict.parse(setup_xml)
-    return _create_setup_from_xml(result_dict)
+        result_dict = xmltodict.parse(setup_xml)
+        setup = _create_setup_from_xml(result_dict)
+        openml.cache._set_setup_ids(
+            setup.flow_id, {_get_setup_parameters_hash(setup): setup_id})
+        openml.cache._record_access(SETUPS_CACHE_DIR_NAME, setup_id,
+                                    fields={'flow_id': setup.flow_id})
+
+    openml.cache._memoize(SETUPS_CACHE_DIR_NAME, setup_id, setup)
+    return setup
 
 
-def list_setups(offset=None, size=None, flow=None, tag=None, setup=None):
+def list_setups(offset=None, size=None, flow=None, tag=None, setup=None,
+                output_format='dict'):
     """
     List all setups matching all of the given filters.
 
@@ -118,13 +203,51 @@ def list_setups(offset=None, size=None, flow=None, tag=None, setup=None):
     flow : int, optional
     tag : str, optional
     setup : list(int), optional
+    output_format : str, optional (default='dict')
+        ``dict`` and ``record`` return a dict of ``OpenMLSetup``. ``array``
+        returns an ``OrderedDict`` of columns (numpy arrays) instead,
+        ``dataframe`` a pandas DataFrame. Besides ``setup_id`` and
+        ``flow_id``, they have a column per parameter (named by its full
+        name) holding its value.
 
     Returns
     -------
-    dict
+    dict, OrderedDict or pandas.DataFrame
         """
 
-    return openml.utils.list_all(_list_setups, offset=offset, size=size,
+    openml.utils._check_output_format(output_format)
+    setups = openml.utils.list_all(_list_setups, offset=offset, size=size,
+                                   flow=flow, tag=tag, setup=setup)
+    if output_format in ('array', 'dataframe'):
+        setups = OrderedDict(
+            (setup_id, _get_setup_row(setup_))
+            for setup_id, setup_ in setups.items()
+        )
+    return openml.utils._format_listing(setups, output_format)
+
+
+def _get_setup_row(setup):
+    """Describe a setup by a flat dict of its ids and parameter values."""
+    row = OrderedDict([('setup_id', setup.setup_id),
+                       ('flow_id', setup.flow_id)])
+    for parameter in (setup.parameters or {}).values():
+        row[parameter.full_name] = parameter.value
+    return row
+
+
+def iter_setups(offset=None, size=None, flow=None, tag=None, setup=None):
+    """
+    Iterate over all setups matching all of the given filters.
+
+    Takes the same arguments as ``list_setups``, but requests the setups
+    page by page and yields them as they arrive.
+
+    Yields
+    ------
+    OpenMLSetup
+    """
+
+    return openml.utils.iter_all(_list_setups, offset=offset, size=size,
                                  flow=flow, tag=tag, setup=setup)
 
 
@@ -160,28 +283,22 @@ def _list_setups(setup=None, **kwargs):
 def __list_setups(api_call):
     """Helper function to parse API calls which are lists of setups"""
     xml_string = openml._api_calls._perform_api_call(api_call)
-    setups_dict = xmltodict.parse(xml_string, force_list=('oml:setup',))
-    # Minimalistic check if the XML is useful
-    if 'oml:setups' not in setups_dict:
-        raise ValueError('Error in return XML, does not contain "oml:setups": %s'
-                         % str(setups_dict))
-    elif '@xmlns:oml' not in setups_dict['oml:setups']:
-        raise ValueError('Error in return XML, does not contain '
-                         '"oml:setups"/@xmlns:oml: %s'
-                         % str(setups_dict))
-    elif setups_dict['oml:setups']['@xmlns:oml'] != 'http://openml.org/openml':
-        raise ValueError('Error in return XML, value of  '
-                         '"oml:seyups"/@xmlns:oml is not '
-                         '"http://openml.org/openml": %s'
-                         % str(setups_dict))
-
-    assert type(setups_dict['oml:setups']['oml:setup']) == list, \
-        type(setups_dict['oml:setups'])
 
     setups = dict()
-    for setup_ in setups_dict['oml:setups']['oml:setup']:
-        # making it a dict to give it the right format
-        current = _create_setup_from_xml({'oml:setup_parameters': setup_})
+    for setup_ in openml.utils._iter_listing(xml_string, 'setups', 'setup'):
+        fields = openml.utils._get_child_texts(setup_)
+        xml_parameters = openml.utils._get_children(setup_, 'parameter')
+        parameters = None
+        if len(xml_parameters) > 0:
+            parameters = {}
+            for xml_parameter in xml_parameters:
+                parameter = _create_setup_parameter_from_xml(dict(
+                    ('oml:' + key, value) for key, value in
+                    openml.utils._get_child_texts(xml_parameter).items()
+                ))
+                parameters[parameter.id] = parameter
+        current = OpenMLSetup(int(fields['setup_id']), int(fields['flow_id']),
+                              parameters)
         setups[current.setup_id] = current
 
     return setups
@@ -11,6 +11,7 @@ class OpenMLSetup(object):
         parameters : dict
             The setting of the parameters
            """
+    __slots__ = ('setup_id', 'flow_id', 'parameters')
 
     def __init__(self, setup_id, flow_id, parameters):
         if not isinstance(setup_id, int):
@@ -47,6 +48,9 @@ class OpenMLParameter(object):
         value : str
             If the parameter was set, the value that it was set to. 
     """
+    __slots__ = ('id', 'flow_id', 'full_name', 'parameter_name', 'data_type',
+                 'default_value', 'value')
+
     def __init__(self, id, flow_id, full_name, parameter_name, data_type, default_value, value):
         self.id = id
         self.flow_id = flow_id
@@ -1,5 +1,6 @@
 from .task import OpenMLTask
 from .split import OpenMLSplit
-from .functions import (get_task, get_tasks, list_tasks)
+from .functions import (get_task, get_tasks, list_tasks, iter_tasks)
 
-__all__ = ['OpenMLTask', 'get_task', 'get_tasks', 'list_tasks', 'OpenMLSplit']
+__all__ = ['OpenMLTask', 'get_task', 'get_tasks', 'list_tasks', 'iter_tasks',
+           'OpenMLSplit']
@@ -1,35 +1,37 @@
-from collections import OrderedDict
-import io
-import re
+from collections import namedtuple, OrderedDict
 import os
 
-from oslo_concurrency import lockutils
 import xmltodict
 
 from ..exceptions import OpenMLCacheException
 from ..datasets import get_dataset
 from .task import OpenMLTask
+import openml.cache
 import openml.utils
 import openml._api_calls
 
 TASKS_CACHE_DIR_NAME = 'tasks'
 
+# Compact description of a task returned by list_tasks(output_format='record'),
+# inputs and qualities map names to values
+TaskRecord = namedtuple('TaskRecord', ['tid', 'ttid', 'did', 'name',
+                                       'task_type', 'status', 'inputs',
+                                       'qualities'])
+
 
 def _get_cached_tasks():
     tasks = OrderedDict()
 
-    task_cache_dir = openml.utils._create_cache_directory(TASKS_CACHE_DIR_NAME)
-    directory_content = os.listdir(task_cache_dir)
-    directory_content.sort()
-    # Find all dataset ids for which we have downloaded the dataset
-    # description
-
-    for filename in directory_content:
-        if not re.match(r"[0-9]*", filename):
-            continue
-
-        tid = int(filename)
-        tasks[tid] = _get_cached_task(tid)
+    # Tasks which were parsed before are created from the fields stored in
+    # the index of the cache, only the remaining ones are read from disk.
+    cached_tasks = openml.cache._get_cached_entities(TASKS_CACHE_DIR_NAME)
+    for tid, entry in cached_tasks.items():
+        if entry['fields'] is not None:
+            tasks[tid] = _create_task_from_fields(entry['fields'])
+        else:
+            tasks[tid] = _get_cached_task(tid)
+            openml.cache._set_fields(TASKS_CACHE_DIR_NAME, tid,
+                                     _get_task_fields(tasks[tid]))
 
     return tasks
 
@@ -43,8 +45,8 @@ def _get_cached_task(tid):
     task_file = os.path.join(tid_cache_dir, "task.xml")
 
     try:
-        with io.open(task_file, encoding='utf8') as fh:
-            task = _create_task_from_xml(xml=fh.read())
+        task = _create_task_from_xml(
+            xml=openml.utils._read_cache_file(task_file))
         return task
     except (OSError, IOError):
         openml.utils._remove_cache_dir_for_id(TASKS_CACHE_DIR_NAME, tid_cache_dir)
@@ -91,7 +93,8 @@ def _get_estimation_procedure_list():
     return procs
 
 
-def list_tasks(task_type_id=None, offset=None, size=None, tag=None, **kwargs):
+def list_tasks(task_type_id=None, offset=None, size=None, tag=None,
+               output_format='dict', **kwargs):
     """
     Return a number of tasks having the given tag and task_type_id
 
@@ -119,6 +122,11 @@ def list_tasks(task_type_id=None, offset=None, size=None, tag=None, **kwargs):
         the maximum number of tasks to show
     tag : str, optional
         the tag to include
+    output_format : str, optional (default='dict')
+        ``dict`` describes every task by a dict, ``record`` by a
+        ``TaskRecord`` namedtuple. ``array`` returns an ``OrderedDict`` of
+        columns (numpy arrays) instead, ``dataframe`` a pandas DataFrame.
+        Inputs and qualities become columns of their own.
 
     kwargs: dict, optional
         Legal filter operators: data_tag, status, data_id, data_name, number_instances, number_features,
@@ -132,10 +140,32 @@ def list_tasks(task_type_id=None, offset=None, size=None, tag=None, **kwargs):
         task id, dataset id, task_type and status. If qualities are calculated
         for the associated dataset, some of these are also returned.
     """
-    return openml.utils.list_all(_list_tasks, task_type_id=task_type_id, offset=offset, size=size, tag=tag, **kwargs)
+    openml.utils._check_output_format(output_format)
+    tasks = openml.utils.list_all(_list_tasks, task_type_id=task_type_id, offset=offset, size=size, tag=tag,
+                                  output_format=openml.utils._get_parse_format(output_format), **kwargs)
+    return openml.utils._format_listing(tasks, output_format)
+
+
+def iter_tasks(task_type_id=None, offset=None, size=None, tag=None,
+               output_format='dict', **kwargs):
+    """
+    Iterate over the tasks having the given tag and task_type_id.
 
+    Takes the same arguments as ``list_tasks``, but requests the tasks page
+    by page and yields them as they arrive. ``output_format`` is either
+    ``dict`` or ``record``.
 
-def _list_tasks(task_type_id=None, **kwargs):
+    Yields
+    ------
+    dict or TaskRecord
+        Description of a task.
+    """
+    openml.utils._check_output_format(output_format, ('dict', 'record'))
+    return openml.utils.iter_all(_list_tasks, task_type_id=task_type_id, offset=offset, size=size, tag=tag,
+                                 output_format=output_format, **kwargs)
+
+
+def _list_tasks(task_type_id=None, output_format='dict', **kwargs):
     """
     Perform the api call to return a number of tasks having the given filters.
 
@@ -158,6 +188,9 @@ def _list_tasks(task_type_id=None, **kwargs):
         - Survival Analysis: 7
         - Subgroup Discovery: 8
 
+    output_format : str, optional (default='dict')
+        Either ``dict`` or ``record``.
+
     kwargs: dict, optional
         Legal filter operators: tag, data_tag, status, limit,
         offset, data_id, data_name, number_instances, number_features,
@@ -173,73 +206,63 @@ def _list_tasks(task_type_id=None, **kwargs):
     if kwargs is not None:
         for operator, value in kwargs.items():
             api_call += "/%s/%s" % (operator, value)
-    return __list_tasks(api_call)
+    return __list_tasks(api_call, output_format)
 
 
-def __list_tasks(api_call):
+def __list_tasks(api_call, output_format='dict'):
 
     xml_string = openml._api_calls._perform_api_call(api_call)
-    tasks_dict = xmltodict.parse(xml_string, force_list=('oml:task', 'oml:input'))
-    # Minimalistic check if the XML is useful
-    if 'oml:tasks' not in tasks_dict:
-        raise ValueError('Error in return XML, does not contain "oml:runs": %s'
-                         % str(tasks_dict))
-    elif '@xmlns:oml' not in tasks_dict['oml:tasks']:
-        raise ValueError('Error in return XML, does not contain '
-                         '"oml:runs"/@xmlns:oml: %s'
-                         % str(tasks_dict))
-    elif tasks_dict['oml:tasks']['@xmlns:oml'] != 'http://openml.org/openml':
-        raise ValueError('Error in return XML, value of  '
-                         '"oml:runs"/@xmlns:oml is not '
-                         '"http://openml.org/openml": %s'
-                         % str(tasks_dict))
-
-    assert type(tasks_dict['oml:tasks']['oml:task']) == list, \
-        type(tasks_dict['oml:tasks'])
 
     tasks = dict()
     procs = _get_estimation_procedure_list()
     proc_dict = dict((x['id'], x) for x in procs)
 
-    for task_ in tasks_dict['oml:tasks']['oml:task']:
+    for task_ in openml.utils._iter_listing(xml_string, 'tasks', 'task'):
         tid = None
+        fields = openml.utils._get_child_texts(task_)
         try:
-            tid = int(task_['oml:task_id'])
-            task = {'tid': tid,
-                    'ttid': int(task_['oml:task_type_id']),
-                    'did': int(task_['oml:did']),
-                    'name': task_['oml:name'],
-                    'task_type': task_['oml:task_type'],
-                    'status': task_['oml:status']}
+            tid = int(fields['task_id'])
+            task = TaskRecord(tid=tid,
+                              ttid=int(fields['task_type_id']),
+                              did=int(fields['did']),
+                              name=fields['name'],
+                              task_type=fields['task_type'],
+                              status=fields['status'],
+                              inputs={},
+                              qualities={})
 
             # Other task inputs
-            for input in task_.get('oml:input', list()):
-                if input['@name'] == 'estimation_procedure':
-                    task[input['@name']] = proc_dict[int(input['#text'])]['name']
+            for input in openml.utils._get_children(task_, 'input'):
+                if input.get('name') == 'estimation_procedure':
+                    task.inputs[input.get('name')] = proc_dict[int(input.text)]['name']
                 else:
-                    value = input.get('#text')
-                    task[input['@name']] = value
+                    task.inputs[input.get('name')] = input.text
 
             # The number of qualities can range from 0 to infinity
-            for quality in task_.get('oml:quality', list()):
-                if '#text' not in quality:
+            for quality in openml.utils._get_children(task_, 'quality'):
+                if quality.text is None:
                     quality_value = 0.0
                 else:
-                    quality['#text'] = float(quality['#text'])
-                    if abs(int(quality['#text']) - quality['#text']) < 0.0000001:
-                        quality['#text'] = int(quality['#text'])
-                    quality_value = quality['#text']
-                task[quality['@name']] = quality_value
+                    quality_value = float(quality.text)
+                    if abs(int(quality_value) - quality_value) < 0.0000001:
+                        quality_value = int(quality_value)
+                task.qualities[quality.get('name')] = quality_value
+
+            if output_format == 'dict':
+                record = task
+                task = dict(zip(record._fields[:6], record[:6]))
+                task.update(record.inputs)
+                task.update(record.qualities)
             tasks[tid] = task
         except KeyError as e:
             if tid is not None:
                 raise KeyError(
                     "Invalid xml for task %d: %s\nFrom %s" % (
-                        tid, e, task_
+                        tid, e, fields
                     )
                 )
             else:
-                raise KeyError('Could not find key %s in %s!' % (e, task_))
+                raise KeyError('Could not find key %s in %s!' % (e, fields))
 
     return tasks
 
@@ -278,23 +301,42 @@ def get_task(task_id):
         raise ValueError("Task ID is neither an Integer nor can be "
                          "cast to an Integer.")
 
+    # Threads requesting the same task share the download
+    return openml.cache._single_flight(TASKS_CACHE_DIR_NAME, task_id,
+                                       _get_task, task_id)
+
+
+def _get_task(task_id):
+    task = openml.cache._get_memoized(TASKS_CACHE_DIR_NAME, task_id)
+    if task is not None:
+        return task
+
     tid_cache_dir = openml.utils._create_cache_directory_for_id(
         TASKS_CACHE_DIR_NAME, task_id,
     )
 
-    with lockutils.external_lock(
-            name='task.functions.get_task:%d' % task_id,
-            lock_path=openml.utils._create_lockfiles_dir(),
-    ):
-        try:
+    # Completely cached tasks are read while holding a shared lock only, so
+    # that many processes can read them at the same time
+    task = None
+    with openml.cache._lock_entity(TASKS_CACHE_DIR_NAME, task_id,
+                                   shared=True):
+        if all(openml.utils._verify_cache_file(os.path.join(tid_cache_dir,
+                                                            filename))
+               for filename in ("task.xml", "datasplits.arff")):
+            task = _get_cached_task(task_id)
+
+    if task is not None:
+        openml.cache._touch(TASKS_CACHE_DIR_NAME, task_id)
+    else:
+        with openml.cache._lock_entity(TASKS_CACHE_DIR_NAME, task_id):
             task = _get_task_description(task_id)
-            dataset = get_dataset(task.dataset_id)
-            class_labels = dataset.retrieve_class_labels(task.target_name)
-            task.class_labels = class_labels
             task.download_split()
-        except Exception as e:
-            openml.utils._remove_cache_dir_for_id(TASKS_CACHE_DIR_NAME, tid_cache_dir)
-            raise e
+            openml.cache._record_access(TASKS_CACHE_DIR_NAME, task_id,
+                                        fields=_get_task_fields(task))
+
+    dataset = get_dataset(task.dataset_id)
+    task.class_labels = dataset.retrieve_class_labels(task.target_name)
+    openml.cache._memoize(TASKS_CACHE_DIR_NAME, task_id, task)
 
     return task
 
@@ -310,7 +352,7 @@ def _get_task_description(task_id):
         )
         task_xml = openml._api_calls._perform_api_call("task/%d" % task_id)
 
-        with io.open(xml_file, "w", encoding='utf8') as fh:
+        with openml.utils._atomic_write(xml_file) as fh:
             fh.write(task_xml)
         task = _create_task_from_xml(task_xml)
 
@@ -351,3 +393,23 @@ def _create_task_from_xml(xml):
         inputs["estimation_procedure"]["oml:estimation_procedure"][
             "oml:data_splits_url"], estimation_parameters,
         evaluation_measures, None)
+
+
+def _get_task_fields(task):
+    """Get the arguments to recreate ``task`` with
+    ``_create_task_from_fields``, they are stored in the cache index."""
+    return {
+        'task_id': task.task_id,
+        'task_type_id': task.task_type_id,
+        'task_type': task.task_type,
+        'data_set_id': task.dataset_id,
+        'target_name': task.target_name,
+        'estimation_procedure_type': task.estimation_procedure['type'],
+        'data_splits_url': task.estimation_procedure['data_splits_url'],
+        'estimation_parameters': task.estimation_parameters,
+        'evaluation_measure': task.evaluation_measure,
+    }
+
+
+def _create_task_from_fields(fields):
+    return OpenMLTask(cost_matrix=None, **fields)
@@ -6,6 +6,8 @@ import numpy as np
 import scipy.io.arff
 from six.moves import cPickle as pickle
 
+import openml.utils
+
 
 Split = namedtuple("Split", ["train", "test"])
 
@@ -69,7 +71,7 @@ class OpenMLSplit(object):
         else:
             pkl_filename = filename.replace(".arff", ".pkl.py3")
         if cache:
-            if os.path.exists(pkl_filename):
+            if openml.utils._verify_cache_file(pkl_filename):
                 try:
                     with open(pkl_filename, "rb") as fh:
                         _ = pickle.load(fh)
@@ -126,7 +128,7 @@ class OpenMLSplit(object):
                             np.array(repetitions[repetition][fold][sample][1], dtype=np.int32))
 
             if cache:
-                with open(pkl_filename, "wb") as fh:
+                with openml.utils._atomic_write(pkl_filename, "wb") as fh:
                     pickle.dump({"name": name, "repetitions": repetitions}, fh,
                                 protocol=2)
 
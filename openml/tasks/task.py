@@ -1,4 +1,3 @@
-import io
 import os
 
 from .. import config
@@ -59,14 +58,11 @@ class OpenMLTask(object):
         return train_indices, test_indices
 
     def _download_split(self, cache_file):
-        try:
-            with io.open(cache_file, encoding='utf8'):
-                pass
-        except (OSError, IOError):
+        if not openml.utils._verify_cache_file(cache_file):
             split_url = self.estimation_procedure["data_splits_url"]
             split_arff = openml._api_calls._read_url(split_url)
 
-            with io.open(cache_file, "w", encoding='utf8') as fh:
+            with openml.utils._atomic_write(cache_file) as fh:
                 fh.write(split_arff)
             del split_arff
 
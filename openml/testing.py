@@ -46,6 +46,12 @@ class TestBase(unittest.TestCase):
         os.mkdir(self.workdir)
         os.chdir(self.workdir)
 
+        # Reading from a cache directory writes to it (e.g. its index), work
+        # on a copy to keep the checked in cache unchanged
+        static_cache_copy = os.path.join(self.workdir, 'files')
+        shutil.copytree(self.static_cache_dir, static_cache_copy)
+        self.static_cache_dir = static_cache_copy
+
         self.cached = True
         # amueller's read/write key that he will throw away later
         openml.config.apikey = "610344db6388d9ba34f6db45a3cf71de"
@@ -55,6 +61,20 @@ class TestBase(unittest.TestCase):
 
         openml.config.server = self.test_server
         openml.config.avoid_duplicate_runs = False
+        openml.config.cache_compression = 'none'
+        openml.config.cache_keep_arff = True
+        openml.config.cache_size_limit = None
+        openml.config.cache_eviction_policy = 'lru'
+        openml.config.memory_cache_size = 100
+        openml.config.cache_ttl_description = 86400
+        openml.config.cache_ttl_qualities = 86400
+        openml.config.cache_ttl_run_lookups = 600
+        openml.config.upload_compression = 'none'
+        openml.config.listing_concurrency = 1
+        openml.config.listing_min_batch_size = 100
+        openml.config.listing_max_batch_size = 10000
+        openml.config.listing_timeout = 60
+        openml.utils.clear_memory_cache()
 
         openml.config.cache_directory = self.workdir
 
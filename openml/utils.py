@@ -1,11 +1,64 @@
+import array
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import gzip
+import io
+import json
+import logging
+import numbers
 import os
+import tempfile
 import xmltodict
 import six
 import shutil
+import threading
+import time
+
+import numpy as np
+import requests
+
+try:
+    import xml.etree.cElementTree as ElementTree
+except ImportError:
+    from xml.etree import ElementTree
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
 
 import openml._api_calls
 from . import config
-from openml.exceptions import OpenMLServerException
+from .cache import (cache_stats, prune_cache, rebuild_cache_index,
+                    clear_memory_cache, memory_cache_stats,
+                    remove_unused_blobs)
+from openml.exceptions import OpenMLServerError, OpenMLServerException
+
+
+logger = logging.getLogger(__name__)
+
+OPENML_NAMESPACE = 'http://openml.org/openml'
+
+# The first page of list_all and iter_all requests
+# config.listing_min_batch_size results. The size of further pages is adapted
+# (up to config.listing_max_batch_size) so that requesting a page takes about
+# LISTING_TARGET_SECONDS and its response is at most LISTING_MAX_PAGE_BYTES.
+LISTING_TARGET_SECONDS = 5
+LISTING_MAX_PAGE_BYTES = 64 * 2 ** 20
+
+# Formats in which the listing functions return their results
+OUTPUT_FORMATS = ('dict', 'record', 'array', 'dataframe')
 
 
 def extract_xml_tags(xml_tag_name, node, allow_none=True):
@@ -46,6 +99,310 @@ def extract_xml_tags(xml_tag_name, node, allow_none=True):
             raise ValueError("Could not find tag '%s' in node '%s'" %
                              (xml_tag_name, str(node)))
 
+def _iter_listing(xml_string, root_tag, record_tag):
+    """Parse the response of a listing call incrementally.
+
+    Instead of building the complete document, the records are parsed one by
+    one and discarded once the caller moved on to the next record.
+
+    Parameters
+    ----------
+    xml_string : str
+        Response of the server.
+
+    root_tag : str
+        Name of the root element without the ``oml:`` prefix, e.g. ``runs``.
+
+    record_tag : str
+        Name of the record elements without the ``oml:`` prefix, e.g.
+        ``run``.
+
+    Yields
+    ------
+    xml.etree.ElementTree.Element
+        The complete element of every record.
+    """
+    if isinstance(xml_string, six.text_type):
+        xml_string = xml_string.encode('utf8')
+    context = ElementTree.iterparse(io.BytesIO(xml_string),
+                                    events=('start', 'end'))
+    _, root = next(context)
+    if root.tag != '{%s}%s' % (OPENML_NAMESPACE, root_tag):
+        raise ValueError('Error in return XML, does not contain "oml:%s" '
+                         'in the namespace "%s": %s'
+                         % (root_tag, OPENML_NAMESPACE, root.tag))
+    record_tag = '{%s}%s' % (OPENML_NAMESPACE, record_tag)
+    for event, element in context:
+        if event == 'end' and element.tag == record_tag:
+            yield element
+            # Free the memory of the processed record
+            element.clear()
+            root.clear()
+
+
+def _get_child_texts(element):
+    """Map the names (without ``oml:`` prefix) of the children of an element
+    to their text."""
+    texts = {}
+    for child in element:
+        text = child.text
+        if text is not None:
+            text = text.strip()
+        texts[child.tag.rpartition('}')[2]] = text
+    return texts
+
+
+def _get_children(element, tag):
+    """Get all children of an element with a name (without ``oml:``
+    prefix)."""
+    return element.findall('{%s}%s' % (OPENML_NAMESPACE, tag))
+
+
+def _check_output_format(output_format, formats=OUTPUT_FORMATS):
+    if output_format not in formats:
+        raise ValueError('Unknown output_format %s, must be one of %s.'
+                         % (output_format, ', '.join(formats)))
+
+
+def _get_parse_format(output_format):
+    """Format in which the pages of a listing are parsed: column-oriented
+    results are built from records."""
+    return 'dict' if output_format == 'dict' else 'record'
+
+
+def _format_listing(records, output_format):
+    """Convert the records of a listing to the requested output format.
+
+    Parameters
+    ----------
+    records : dict
+        Mapping of {id: record}. Records are dicts, namedtuples or objects
+        with ``__slots__``.
+
+    output_format : str
+        ``dict`` and ``record`` return ``records`` unchanged. ``array``
+        returns a column-oriented ``OrderedDict`` of {name: numpy.ndarray},
+        ``dataframe`` a ``pandas.DataFrame`` indexed by the ids.
+
+    Returns
+    -------
+    dict, OrderedDict or pandas.DataFrame
+    """
+    _check_output_format(output_format)
+    if output_format in ('dict', 'record'):
+        return records
+    if output_format == 'dataframe' and pandas is None:
+        raise ImportError('output_format "dataframe" requires pandas.')
+    columns = _records_to_columns(records.values())
+    if output_format == 'array':
+        return columns
+    return pandas.DataFrame(columns, index=list(records.keys()),
+                            columns=list(columns.keys()))
+
+
+def _records_to_columns(records):
+    """Store records column by column.
+
+    Columns are named by the fields of the records. Fields which hold a dict
+    (e.g. the qualities of a dataset) are expanded into one column per key,
+    records which lack a key are ``None`` (or ``nan``) in its column.
+    Columns of integers become integer arrays, columns of numbers float
+    arrays, all other columns object arrays.
+
+    Parameters
+    ----------
+    records : iterable
+        Dicts, namedtuples or objects with ``__slots__``.
+
+    Returns
+    -------
+    OrderedDict
+        Mapping of {name: numpy.ndarray}.
+    """
+    records = list(records)
+    columns = collections.OrderedDict()
+    if len(records) == 0:
+        return columns
+    first = records[0]
+    if isinstance(first, dict):
+        fields = collections.OrderedDict()
+        for record in records:
+            for field in record:
+                fields[field] = None
+    else:
+        fields = getattr(first, '_fields', None) or first.__slots__
+
+    for field in fields:
+        values = [_get_record_field(record, field) for record in records]
+        if any(isinstance(value, dict) for value in values):
+            keys = collections.OrderedDict()
+            for value in values:
+                for key in value or ():
+                    keys[key] = None
+            for key in keys:
+                columns[key] = [value.get(key) if value else None
+                                for value in values]
+        else:
+            columns[field] = values
+    for name, values in columns.items():
+        columns[name] = _to_array(values)
+    return columns
+
+
+def _get_record_field(record, field):
+    """Get a field of a record as accepted by ``_records_to_columns``."""
+    if isinstance(record, dict):
+        return record.get(field)
+    return getattr(record, field)
+
+
+class _ListingColumns(object):
+    """The results of a listing, stored column by column while they are
+    parsed.
+
+    Integers and floats are kept in typed buffers and strings of categorical
+    columns as codes into a list of categories, so that no object is created
+    per result. Like the dicts returned by other listing calls, the pages of
+    a listing are merged with ``update`` and their number of results is
+    given by ``len``.
+
+    Parameters
+    ----------
+    schema : list of tuple
+        ``(name, kind)`` of every column. Kinds are ``int`` (stored as 32 bit
+        integers), ``float``, ``category``, ``datetime`` (strings which are
+        converted to ``datetime64[s]``) and ``object``.
+    """
+
+    def __init__(self, schema):
+        self.schema = list(schema)
+        self._columns = []
+        # Per categorical column: the categories and a mapping to their codes
+        self._categories = {}
+        for name, kind in self.schema:
+            if kind in ('int', 'category'):
+                self._columns.append(array.array('i'))
+            elif kind == 'float':
+                self._columns.append(array.array('d'))
+            elif kind in ('datetime', 'object'):
+                self._columns.append([])
+            else:
+                raise ValueError('Unknown column kind: %s' % kind)
+            if kind == 'category':
+                self._categories[name] = ([], {})
+
+    def __len__(self):
+        return len(self._columns[0]) if self._columns else 0
+
+    def append(self, row):
+        """Append a result given by its values in the order of the schema.
+        Missing values are ``None``."""
+        for (name, kind), column, value in zip(self.schema, self._columns,
+                                               row):
+            if kind == 'float':
+                column.append(np.nan if value is None else value)
+            elif kind == 'category':
+                if value is None:
+                    column.append(-1)
+                    continue
+                categories, codes = self._categories[name]
+                code = codes.get(value)
+                if code is None:
+                    code = codes[value] = len(categories)
+                    categories.append(value)
+                column.append(code)
+            else:
+                column.append(value)
+
+    def update(self, other):
+        """Append the results of another page."""
+        if other.schema != self.schema:
+            raise ValueError('Cannot merge listings of different columns.')
+        for (name, kind), column, other_column in zip(
+                self.schema, self._columns, other._columns):
+            if kind != 'category':
+                column.extend(other_column)
+                continue
+            categories, codes = self._categories[name]
+            # Translate the codes of the other page, the appended -1 keeps
+            # missing values missing
+            mapping = []
+            for category in other._categories[name][0]:
+                code = codes.get(category)
+                if code is None:
+                    code = codes[category] = len(categories)
+                    categories.append(category)
+                mapping.append(code)
+            mapping = np.array(mapping + [-1], dtype=np.intc)
+            other_codes = self._to_int32(other_column)
+            column.extend(array.array('i', mapping[other_codes].tobytes()))
+
+    def to_arrays(self):
+        """Convert to an ``OrderedDict`` of {name: numpy.ndarray}. Categorical
+        columns become object arrays which share one string per category.
+        """
+        arrays = collections.OrderedDict()
+        for (name, kind), column in zip(self.schema, self._columns):
+            if kind == 'category':
+                categories = np.empty(len(self._categories[name][0]) + 1,
+                                      dtype=object)
+                categories[:-1] = self._categories[name][0]
+                arrays[name] = categories[self._to_int32(column)]
+            else:
+                arrays[name] = self._to_array(kind, column)
+        return arrays
+
+    def to_dataframe(self, index=None):
+        """Convert to a ``pandas.DataFrame`` with ``pandas.Categorical``
+        columns, indexed by the column ``index``."""
+        if pandas is None:
+            raise ImportError('output_format "dataframe" requires pandas.')
+        data = collections.OrderedDict()
+        for (name, kind), column in zip(self.schema, self._columns):
+            if kind == 'category':
+                data[name] = pandas.Categorical.from_codes(
+                    self._to_int32(column), self._categories[name][0])
+            else:
+                data[name] = self._to_array(kind, column)
+        frame = pandas.DataFrame(data, columns=list(data.keys()))
+        if index is not None:
+            frame.index = data[index]
+        return frame
+
+    @staticmethod
+    def _to_int32(column):
+        if len(column) == 0:
+            return np.zeros(0, dtype=np.int32)
+        return np.frombuffer(column, dtype=np.intc).astype(np.int32)
+
+    @staticmethod
+    def _to_array(kind, column):
+        if kind == 'int':
+            return _ListingColumns._to_int32(column)
+        if kind == 'float':
+            return np.array(column, dtype=np.float64)
+        if kind == 'datetime':
+            return np.array(['NaT' if value is None else value
+                             for value in column], dtype='datetime64[s]')
+        values = np.empty(len(column), dtype=object)
+        values[:] = column
+        return values
+
+
+def _to_array(values):
+    if all(isinstance(value, six.integer_types)
+           and not isinstance(value, bool) for value in values):
+        return np.array(values, dtype=np.int64)
+    if all(value is None or (isinstance(value, numbers.Real)
+                             and not isinstance(value, bool))
+           for value in values):
+        return np.array([np.nan if value is None else value
+                         for value in values], dtype=np.float64)
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
 def _tag_entity(entity_type, entity_id, tag, untag=False):
     """Function that tags or untags a given entity on OpenML. As the OpenML
        API tag functions all consist of the same format, this function covers
@@ -101,9 +458,9 @@ def list_all(listing_call, *args, **filters):
 
     ``evaluations = list_all(list_evaluations, "predictive_accuracy", task=mytask)``
 
-    Note: I wanted to make this a generator, but this is not possible since all
-    listing calls return dicts
-    
+    All pages are merged into the first one (with its ``update`` method),
+    use ``iter_all`` to process the results page by page instead.
+
     Parameters
     ----------
     listing_call : callable
@@ -117,52 +474,230 @@ def list_all(listing_call, *args, **filters):
     -------
     dict
     """
+    result = None
+    for batch in _iter_pages(listing_call, args, filters):
+        if result is None:
+            result = batch
+        else:
+            result.update(batch)
+    return {} if result is None else result
 
-    # default batch size per paging.
-    batch_size = 10000
+
+def iter_all(listing_call, *args, **filters):
+    """Helper to iterate over the results of paged listing requests.
+
+    Unlike ``list_all``, only the current page is held in memory. The next
+    page is requested in the background while the results of the current
+    page are consumed.
+
+    Example usage:
+
+    ``for evaluation in iter_all(_list_evaluations, "predictive_accuracy", task=[mytask]):``
+
+    Parameters
+    ----------
+    listing_call : callable
+        Call listing a single page, e.g. _list_evaluations.
+    *args : Variable length argument list
+        Any required arguments for the listing call.
+    **filters : Arbitrary keyword arguments
+        Any filters that can be applied to the listing function.
+
+    Yields
+    ------
+    object
+        The values of the dicts returned by ``listing_call``, in the order of
+        the pages.
+    """
+    for batch in _iter_pages(listing_call, args, filters, prefetch=True):
+        for record in batch.values():
+            yield record
+
+
+def _iter_pages(listing_call, args, filters, prefetch=False):
+    """Request the pages of a listing call.
+
+    If the first page is full, further pages are likely and up to
+    ``config.listing_concurrency`` pages are requested in parallel. The pages
+    are yielded in order, the first page without results ends the listing.
+
+    The size of the pages is adapted to the response time and size of the
+    previous pages, see ``_adapt_batch_size``. If requesting a page times out
+    (see ``config.listing_timeout``), its response is cut off or the server
+    fails with an unexpected error, it is requested again in two halves and
+    further pages are at most half as large.
+
+    Parameters
+    ----------
+    listing_call : callable
+
+    args : tuple
+        Positional arguments of the listing call.
+
+    filters : dict
+        Filters of the listing call, including ``offset`` and ``size``.
+
+    prefetch : bool
+        Whether to request the next page in a background thread while the
+        current page is processed.
+
+    Yields
+    ------
+    dict
+        The result of ``listing_call`` for each page.
+    """
+    min_batch_size = max(1, config.listing_min_batch_size)
+    max_batch_size = max(min_batch_size, config.listing_max_batch_size)
+    # batch size of the next page and its upper bound, shared with the threads
+    # requesting pages. Listings start small, so that short listings are fast,
+    # and grow with every page which is answered quickly.
+    state = {'batch_size': min_batch_size, 'max_batch_size': max_batch_size}
+    state_lock = threading.Lock()
     # eliminate filters that have a None value
     active_filters = {key: value for key, value in filters.items() if value is not None}
-    page = 0
-    result = {}
     # max number of results to be shown
-    limit = None
-    offset = 0
-    cycle = True
-    if 'size' in active_filters:
-        limit = active_filters['size']
-        del active_filters['size']
-    # check if the batch size is greater than the number of results that need to be returned.
-    if limit is not None:
-        if batch_size > limit:
-            batch_size = limit
-    if 'offset' in active_filters:
-        offset = active_filters['offset']
-        del active_filters['offset']
-    while cycle:
+    limit = active_filters.pop('size', None)
+    offset = active_filters.pop('offset', 0)
+    concurrency = max(1, config.listing_concurrency)
+
+    def _windows():
+        # offset and size of every page
+        page_offset = offset
+        remaining = limit
+        while remaining is None or remaining > 0:
+            with state_lock:
+                size = state['batch_size']
+            if remaining is not None:
+                size = min(size, remaining)
+            yield page_offset, size
+            page_offset += size
+            if remaining is not None:
+                remaining -= size
+
+    def _fetch(window):
+        page_offset, size = window
+        openml._api_calls._last_response.size = None
+        start = time.time()
+        openml._api_calls._request_timeout.seconds = config.listing_timeout
         try:
-            new_batch = listing_call(
-                *args,
-                limit=batch_size,
-                offset=offset + batch_size * page,
-                **active_filters
+            try:
+                batch = listing_call(*args, limit=size, offset=page_offset,
+                                     **active_filters)
+            finally:
+                openml._api_calls._request_timeout.seconds = None
+        except OpenMLServerException:
+            raise
+        except (OpenMLServerError, requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError) as e:
+            if size <= min_batch_size:
+                raise
+            # Retry with smaller pages, which the server can answer in time
+            half = max(min_batch_size, size // 2)
+            with state_lock:
+                # Do not grow the pages to the size which failed again
+                state['max_batch_size'] = min(state['max_batch_size'], half)
+                state['batch_size'] = min(state['batch_size'], half)
+            logger.warning('Listing %d results at offset %d failed (%s), '
+                           'retrying with pages of %d results.',
+                           size, page_offset, e, half)
+            batch = _fetch((page_offset, half))
+            try:
+                batch.update(_fetch((page_offset + half, size - half)))
+            except OpenMLServerException:
+                # The first half already reached the end of the listing
+                pass
+            return batch
+        if len(batch) >= size:
+            new_size = _adapt_batch_size(
+                size, len(batch), time.time() - start,
+                getattr(openml._api_calls._last_response, 'size', None),
             )
-        except OpenMLServerException as e:
-            if page == 0 and e.args[0] == 'No results':
-                raise e
-            else:
-                break
-        result.update(new_batch)
-        page += 1
-        if limit is not None:
-            limit -= batch_size
-            # check if the number of required results has been achieved
-            if limit == 0:
+            with state_lock:
+                state['batch_size'] = min(max(new_size, min_batch_size),
+                                          state['max_batch_size'])
+        return batch
+
+    if prefetch or concurrency > 1:
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+    else:
+        executor = None
+    windows = _windows()
+    # Requested pages in order, either futures or (if there is no executor)
+    # windows which are fetched once they are needed
+    pending = collections.deque()
+
+    def _request(n_requests):
+        while len(pending) < n_requests:
+            window = next(windows, None)
+            if window is None:
                 break
-            # check if there are enough results to fulfill a batch
-            if limit < batch_size:
-                batch_size = limit
+            if executor is None:
+                pending.append((window, window))
+            else:
+                pending.append((window, executor.submit(_fetch, window)))
+
+    # Number of pages requested in advance while a page is processed
+    n_ahead = 1 if prefetch else 0
+    page = 0
+    try:
+        while True:
+            _request(1)
+            if len(pending) == 0:
+                return
+            window, request = pending.popleft()
+            try:
+                if executor is None:
+                    batch = _fetch(request)
+                else:
+                    batch = request.result()
+            except OpenMLServerException as e:
+                if page == 0 and e.args[0] == 'No results':
+                    raise e
+                return
+            if page == 0 and concurrency > 1 and len(batch) >= window[1]:
+                n_ahead = concurrency
+            _request(n_ahead)
+            yield batch
+            page += 1
+    finally:
+        for _, request in pending:
+            if executor is not None:
+                request.cancel()
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+def _adapt_batch_size(batch_size, n_results, seconds, n_bytes=None):
+    """Compute the size of the next page of a listing.
+
+    The size is scaled by the ratio of ``LISTING_TARGET_SECONDS`` and the
+    time it took to request the last page, but changes at most by a factor of
+    two per page. It is further limited such that the response is expected to
+    be at most ``LISTING_MAX_PAGE_BYTES``.
+
+    Parameters
+    ----------
+    batch_size : int
+        Size of the last page.
+
+    n_results : int
+        Number of results of the last page.
 
-    return result
+    seconds : float
+        Time it took to request and parse the last page.
+
+    n_bytes : int, optional
+        Size of the response of the last page.
+
+    Returns
+    -------
+    int
+    """
+    factor = LISTING_TARGET_SECONDS / max(seconds, 1e-3)
+    new_size = batch_size * min(max(factor, 0.5), 2)
+    if n_bytes and n_results:
+        new_size = min(new_size, LISTING_MAX_PAGE_BYTES * n_results / n_bytes)
+    return max(1, int(new_size))
 
 
 def _create_cache_directory(key):
@@ -205,6 +740,7 @@ def _create_cache_directory_for_id(key, id_):
         raise ValueError('%s cache dir exists but is not a directory!' % key)
     else:
         os.makedirs(cache_dir)
+        openml.cache._register_directory(key, id_)
     return cache_dir
 
 
@@ -224,6 +760,10 @@ def _remove_cache_dir_for_id(key, cache_dir):
     except (OSError, IOError):
         raise ValueError('Cannot remove faulty %s cache directory %s.'
                          'Please do this manually!' % (key, cache_dir))
+    try:
+        openml.cache._forget(key, int(os.path.basename(cache_dir)))
+    except ValueError:
+        pass
 
 
 def _create_lockfiles_dir():
@@ -233,3 +773,226 @@ def _create_lockfiles_dir():
     except:
         pass
     return dir
+
+
+# Maps the compression methods which can be used for cached files to the
+# suffix appended to the file name.
+COMPRESSION_SUFFIXES = {
+    'none': '',
+    'gzip': '.gz',
+    'lz4': '.lz4',
+    'zstd': '.zst',
+}
+
+
+def _get_compression_suffix(compression=None):
+    """Get the file name suffix for a compression method.
+
+    Parameters
+    ----------
+    compression : str, optional
+        One of ``COMPRESSION_SUFFIXES``. Defaults to
+        ``config.cache_compression``.
+
+    Returns
+    -------
+    str
+    """
+    if compression is None:
+        compression = config.cache_compression
+    if compression is None:
+        compression = 'none'
+    compression = compression.lower()
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError('Unknown compression %s, must be one of %s' %
+                         (compression, sorted(COMPRESSION_SUFFIXES)))
+    if compression == 'lz4' and lz4 is None:
+        raise ValueError('Compression lz4 requires the package lz4.')
+    if compression == 'zstd' and zstandard is None:
+        raise ValueError('Compression zstd requires the package zstandard.')
+    return COMPRESSION_SUFFIXES[compression]
+
+
+def _open_compressed(filename, mode='rb'):
+    """Open a (possibly compressed) cache file.
+
+    The compression method is inferred from the suffix of ``filename``.
+    Compressed files are (de)compressed while streaming, they are never
+    loaded into memory as a whole.
+
+    Parameters
+    ----------
+    filename : str
+
+    mode : str
+        One of ``rb``, ``wb``, ``rt`` and ``wt``. Text mode always uses utf8.
+
+    Returns
+    -------
+    file object
+    """
+    if mode not in ('rb', 'wb', 'rt', 'wt'):
+        raise ValueError('Unsupported mode %s' % mode)
+    binary_mode = mode[0] + 'b'
+
+    if filename.endswith(COMPRESSION_SUFFIXES['gzip']):
+        fh = gzip.open(filename, binary_mode)
+    elif filename.endswith(COMPRESSION_SUFFIXES['lz4']):
+        if lz4 is None:
+            raise ValueError('Reading %s requires the package lz4.' % filename)
+        fh = lz4.frame.open(filename, binary_mode)
+    elif filename.endswith(COMPRESSION_SUFFIXES['zstd']):
+        if zstandard is None:
+            raise ValueError('Reading %s requires the package zstandard.' %
+                             filename)
+        fh = zstandard.open(filename, binary_mode)
+    else:
+        fh = io.open(filename, binary_mode)
+
+    if mode[1] == 't':
+        fh = io.TextIOWrapper(fh, encoding='utf8')
+    return fh
+
+
+# Name of the file in each cache directory which records the size of all files
+# written with ``_atomic_write``. The size is enough to detect files which
+# were cut off, the content of dataset files is verified with the checksum
+# sent by the server when they are downloaded.
+MANIFEST_FILE_NAME = 'manifest.json'
+
+
+def _get_umask():
+    # The umask can only be read by setting it, which affects files created
+    # by other threads in the meantime. It is therefore read once.
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+_UMASK = _get_umask()
+
+
+def _make_temporary_file(directory, basename):
+    """Create a temporary file next to the file ``basename`` in ``directory``.
+
+    ``tempfile.mkstemp`` creates files which only their owner can read. The
+    mode of the temporary file is set to the one of files created with
+    ``open``, so that a cache directory can be shared by several users.
+
+    Returns
+    -------
+    tuple
+        The file descriptor and the path of the file.
+    """
+    # Keep the name of the file as suffix to keep the compression suffix
+    fd, tmp_file = tempfile.mkstemp(dir=directory, prefix='.tmp',
+                                    suffix='.' + basename)
+    os.chmod(tmp_file, 0o666 & ~_UMASK)
+    return fd, tmp_file
+
+
+def _replace(source, destination):
+    if six.PY2:
+        os.rename(source, destination)
+    else:
+        os.replace(source, destination)
+
+
+@contextlib.contextmanager
+def _atomic_write(filename, mode='wt'):
+    """Atomically write a (possibly compressed) cache file.
+
+    The content is written to a temporary file in the same directory, which
+    is synced to disk and then renamed to ``filename``. Readers therefore see
+    either no file or the complete file, even if the writing process crashes.
+    The file is added to the manifest of its directory afterwards.
+
+    Parameters
+    ----------
+    filename : str
+
+    mode : str
+        Either ``wb`` or ``wt``, see ``_open_compressed``.
+
+    Returns
+    -------
+    file object
+    """
+    fd, tmp_file = _make_temporary_file(*os.path.split(filename))
+    os.close(fd)
+    try:
+        with _open_compressed(tmp_file, mode) as fh:
+            yield fh
+        with io.open(tmp_file, 'r+b') as fh:
+            os.fsync(fh.fileno())
+        _replace(tmp_file, filename)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+    _add_to_manifest(filename)
+
+
+def _read_manifest(directory):
+    try:
+        with io.open(os.path.join(directory, MANIFEST_FILE_NAME),
+                     encoding='utf8') as fh:
+            return json.load(fh)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def _add_to_manifest(filename):
+    """Record the size of a cache file in the manifest of its directory.
+
+    This function is NOT thread/multiprocessing safe.
+    """
+    directory, basename = os.path.split(filename)
+    manifest = _read_manifest(directory)
+    manifest[basename] = {'size': os.path.getsize(filename)}
+    manifest_file = os.path.join(directory, MANIFEST_FILE_NAME)
+    fd, tmp_file = _make_temporary_file(directory, MANIFEST_FILE_NAME)
+    with io.open(fd, 'w', encoding='utf8') as fh:
+        fh.write(six.text_type(json.dumps(manifest, sort_keys=True)))
+        fh.flush()
+        os.fsync(fh.fileno())
+    _replace(tmp_file, manifest_file)
+
+
+def _verify_cache_file(filename):
+    """Check that a cache file exists and matches its manifest entry.
+
+    Files without a manifest entry (e.g. those cached by older versions of
+    this package) are assumed to be complete.
+
+    Parameters
+    ----------
+    filename : str
+
+    Returns
+    -------
+    bool
+    """
+    try:
+        size = os.path.getsize(filename)
+    except (IOError, OSError):
+        return False
+    directory, basename = os.path.split(filename)
+    entry = _read_manifest(directory).get(basename)
+    if entry is None:
+        return True
+    return entry['size'] == size
+
+
+def _read_cache_file(filename):
+    """Read a text cache file.
+
+    Raises
+    ------
+    IOError
+        If the file does not exist or does not match its manifest entry.
+    """
+    if not _verify_cache_file(filename):
+        raise IOError('%s is not cached or incomplete' % filename)
+    with io.open(filename, encoding='utf8') as fh:
+        return fh.read()
@@ -45,6 +45,8 @@ setuptools.setup(name="openml",
                      'nbformat',
                      'python-dateutil',
                      'oslo.concurrency',
+                     'fasteners>=0.15',
+                     'futures; python_version < "3"',
                  ],
                  extras_require={
                      'test': [
@@ -53,6 +55,11 @@ setuptools.setup(name="openml",
                      ]
                  },
                  test_suite="nose.collector",
+                 entry_points={
+                     'console_scripts': [
+                         'openml-cache = openml.cache:main',
+                     ],
+                 },
                  classifiers=['Intended Audience :: Science/Research',
                               'Intended Audience :: Developers',
                               'License :: OSI Approved :: BSD License',
@@ -1,5 +1,6 @@
 import unittest
 import os
+import re
 import sys
 
 if sys.version_info[0] >= 3:
@@ -9,16 +10,20 @@ else:
 
 
 import random
+import shutil
 import six
+import time
 
 from oslo_concurrency import lockutils
+import requests
 
 import scipy.sparse
 
 import openml
 from openml import OpenMLDataset
 from openml.exceptions import OpenMLCacheException, PyOpenMLError, \
-    OpenMLHashException, PrivateDatasetError
+    OpenMLHashException, OpenMLServerError, OpenMLServerException, \
+    PrivateDatasetError
 from openml.testing import TestBase
 from openml.utils import _tag_entity, _create_cache_directory_for_id
 
@@ -179,6 +184,48 @@ class TestOpenMLDataset(TestBase):
             self.assertEqual(size, len(datasets))
             self._check_datasets(datasets)
 
+    @mock.patch('openml._api_calls._perform_api_call')
+    def test_list_datasets_parse(self, api_call_mock):
+        api_call_mock.return_value = (
+            '<oml:data xmlns:oml="http://openml.org/openml">'
+            '<oml:dataset><oml:did>2</oml:did><oml:name>anneal</oml:name>'
+            '<oml:version>1</oml:version><oml:status>active</oml:status>'
+            '<oml:format>ARFF</oml:format>'
+            '<oml:quality name="NumberOfClasses">5.0</oml:quality>'
+            '<oml:quality name="MaxNominalAttDistinctValues">'
+            '10.5</oml:quality></oml:dataset>'
+            '<oml:dataset><oml:did>3</oml:did><oml:name>kr-vs-kp</oml:name>'
+            '<oml:version>1</oml:version><oml:status>active</oml:status>'
+            '<oml:format>ARFF</oml:format>'
+            '<oml:quality name="NumberOfClasses">2.0</oml:quality>'
+            '</oml:dataset></oml:data>'
+        )
+        datasets = openml.datasets.functions._list_datasets()
+        self.assertEqual(datasets, {
+            2: {'did': 2, 'name': 'anneal', 'format': 'ARFF',
+                'status': 'active', 'NumberOfClasses': 5,
+                'MaxNominalAttDistinctValues': 10.5},
+            3: {'did': 3, 'name': 'kr-vs-kp', 'format': 'ARFF',
+                'status': 'active', 'NumberOfClasses': 2},
+        })
+        self.assertIsInstance(datasets[2]['NumberOfClasses'], int)
+
+        xml_string = api_call_mock.return_value
+
+        def api_call(call, *args, **kwargs):
+            # Listings are paginated until there are no further results
+            if re.search('/offset/[1-9]', call):
+                raise openml.exceptions.OpenMLServerNoResult(372, 'No results')
+            return xml_string
+
+        api_call_mock.side_effect = api_call
+        datasets = openml.datasets.list_datasets(output_format='record')
+        self.assertEqual(datasets[3], openml.datasets.functions.DatasetRecord(
+            3, 'kr-vs-kp', 'ARFF', 'active', {'NumberOfClasses': 2}))
+        columns = openml.datasets.list_datasets(output_format='array')
+        self.assertEqual(sorted(columns['did']), [2, 3])
+        self.assertEqual(sorted(columns['NumberOfClasses']), [2, 5])
+
     def test_list_datasets_empty(self):
         datasets = openml.datasets.list_datasets(tag='NoOneWouldUseThisTagAnyway')
         if len(datasets) > 0:
@@ -292,6 +339,174 @@ class TestOpenMLDataset(TestBase):
         qualities = _get_dataset_qualities(self.workdir, 2)
         self.assertIsInstance(qualities, list)
 
+    def _copy_static_dataset_to_workdir(self, did, compression='none'):
+        static_did_dir = os.path.join(
+            self.static_cache_dir, 'org', 'openml', 'test', 'datasets',
+            str(did),
+        )
+        did_cache_dir = _create_cache_directory_for_id(
+            DATASETS_CACHE_DIR_NAME, did,
+        )
+        for filename in os.listdir(static_did_dir):
+            if filename.endswith('.xml'):
+                shutil.copy(os.path.join(static_did_dir, filename),
+                            did_cache_dir)
+        suffix = openml.utils._get_compression_suffix(compression)
+        with open(os.path.join(static_did_dir, 'dataset.arff'), 'rb') as src:
+            with openml.utils._open_compressed(
+                os.path.join(did_cache_dir, 'dataset.arff' + suffix), 'wb',
+            ) as dst:
+                shutil.copyfileobj(src, dst)
+        return did_cache_dir
+
+    def test_get_cached_dataset_compressed(self):
+        did_cache_dir = self._copy_static_dataset_to_workdir(2, 'gzip')
+        self.assertEqual(openml.datasets.functions._list_cached_datasets(),
+                         [2])
+        dataset = _get_cached_dataset(2)
+        self.assertEqual(dataset.data_file,
+                         os.path.join(did_cache_dir, 'dataset.arff.gz'))
+        self.assertTrue(dataset.data_pickle_file.endswith('.gz'))
+        self.assertTrue(os.path.exists(dataset.data_pickle_file))
+        X = dataset.get_data()
+        self.assertEqual(X.shape, (898, 39))
+        self.assertEqual(dataset.retrieve_class_labels(),
+                         ['1', '2', '3', '4', '5', 'U'])
+
+    def test_get_dataset_remove_arff(self):
+        openml.config.cache_keep_arff = False
+        did_cache_dir = self._copy_static_dataset_to_workdir(2)
+        dataset = openml.datasets.get_dataset(2)
+        self.assertFalse(os.path.exists(
+            os.path.join(did_cache_dir, 'dataset.arff')))
+        self.assertTrue(os.path.exists(
+            os.path.join(did_cache_dir, 'dataset_header.arff')))
+        self.assertEqual(dataset.get_data().shape, (898, 39))
+
+        # The dataset is still found in the cache
+        self.assertEqual(openml.datasets.functions._list_cached_datasets(),
+                         [2])
+        dataset = openml.datasets.get_dataset(2)
+        self.assertEqual(dataset.get_data().shape, (898, 39))
+        self.assertEqual(dataset.retrieve_class_labels(),
+                         ['1', '2', '3', '4', '5', 'U'])
+
+    def test_get_dataset_cached_shared_lock(self):
+        openml.config.memory_cache_size = 0
+        self._copy_static_dataset_to_workdir(2)
+        dataset = openml.datasets.get_dataset(2)
+
+        # Once the dataset is completely cached it is read without taking the
+        # exclusive lock
+        with mock.patch('openml.datasets.functions._download_dataset') as \
+                download_mock:
+            cached_dataset = openml.datasets.get_dataset(2)
+        self.assertEqual(download_mock.call_count, 0)
+        self.assertEqual(cached_dataset.name, dataset.name)
+
+        # Datasets with expired metadata are not
+        description_file = os.path.join(
+            os.path.dirname(cached_dataset.data_file), 'description.xml')
+        self._expire(description_file)
+        with mock.patch('openml.datasets.functions._download_dataset') as \
+                download_mock:
+            openml.datasets.get_dataset(2)
+        self.assertEqual(download_mock.call_count, 1)
+
+    def _expire(self, filename):
+        one_week_ago = time.time() - 7 * 86400
+        os.utime(filename, (one_week_ago, one_week_ago))
+
+    @mock.patch('openml._api_calls._perform_api_call')
+    def test_get_dataset_description_revalidated(self, api_mock):
+        did_cache_dir = self._copy_static_dataset_to_workdir(2)
+        description_file = os.path.join(did_cache_dir, 'description.xml')
+        arff_file = os.path.join(did_cache_dir, 'dataset.arff')
+        with open(description_file) as fh:
+            description_xml = fh.read()
+
+        # Fresh descriptions are not fetched again
+        _get_dataset_description(did_cache_dir, 2)
+        self.assertEqual(api_mock.call_count, 0)
+
+        # Stale descriptions are only fetched again if requested, i.e. under
+        # the exclusive lock
+        self._expire(description_file)
+        _get_dataset_description(did_cache_dir, 2, revalidate=False)
+        self.assertEqual(api_mock.call_count, 0)
+
+        # Then they are fetched, but the data is kept if it did not change
+        api_mock.return_value = description_xml.replace(
+            '<oml:status>active', '<oml:status>deactivated')
+        description = _get_dataset_description(did_cache_dir, 2)
+        api_mock.assert_called_once_with('data/2')
+        self.assertEqual(description['oml:status'], 'deactivated')
+        self.assertTrue(os.path.exists(arff_file))
+        self.assertFalse(openml.cache._is_expired(
+            description_file, openml.config.cache_ttl_description))
+
+        # If the data changed it is removed to be downloaded again
+        self._expire(description_file)
+        api_mock.return_value = description_xml.replace(
+            '4eaed8b6ec9d8211024b6c089b064761',
+            '00000000000000000000000000000000')
+        _get_dataset_description(did_cache_dir, 2)
+        self.assertFalse(os.path.exists(arff_file))
+
+    @mock.patch('openml._api_calls._perform_api_call')
+    def test_get_dataset_metadata_offline(self, api_mock):
+        did_cache_dir = self._copy_static_dataset_to_workdir(2)
+        for filename in ('description.xml', 'qualities.xml'):
+            self._expire(os.path.join(did_cache_dir, filename))
+        api_mock.side_effect = requests.exceptions.ConnectionError()
+        description = _get_dataset_description(did_cache_dir, 2)
+        self.assertEqual(description['oml:status'], 'active')
+        qualities = _get_dataset_qualities(did_cache_dir, 2)
+        self.assertEqual(len(qualities), 106)
+        self.assertEqual(api_mock.call_count, 2)
+
+        # Errors of the server are handled in the same way, unless the
+        # dataset is not available anymore
+        api_mock.side_effect = OpenMLServerError('Unexpected server error.')
+        description = _get_dataset_description(did_cache_dir, 2)
+        self.assertEqual(description['oml:status'], 'active')
+        self.assertEqual(len(_get_dataset_qualities(did_cache_dir, 2)), 106)
+        api_mock.side_effect = OpenMLServerException('No access granted',
+                                                     code=112)
+        self.assertRaises(OpenMLServerException, _get_dataset_description,
+                          did_cache_dir, 2)
+
+    @mock.patch('openml._api_calls._read_url')
+    def test_get_dataset_arff_deduplicated(self, read_url_mock):
+        static_did_dir = os.path.join(self.static_cache_dir, 'org', 'openml',
+                                      'test', 'datasets', '2')
+        with open(os.path.join(static_did_dir, 'dataset.arff')) as fh:
+            read_url_mock.return_value = fh.read()
+        openml.config.cache_directory = self.static_cache_dir
+        description = openml.datasets.functions.\
+            _get_cached_dataset_description(2)
+        openml.config.cache_directory = self.workdir
+
+        # Two dataset versions with the same data are downloaded only once
+        arff_files = []
+        for did in (2, 3):
+            did_cache_dir = _create_cache_directory_for_id(
+                DATASETS_CACHE_DIR_NAME, did,
+            )
+            arff_files.append(_get_dataset_arff(did_cache_dir, description))
+        self.assertEqual(read_url_mock.call_count, 1)
+        self.assertTrue(os.path.samefile(*arff_files))
+        self.assertEqual(openml.utils.remove_unused_blobs(), [])
+
+        # The data is removed once no dataset uses it anymore
+        for did in (2, 3):
+            openml.utils._remove_cache_dir_for_id(
+                DATASETS_CACHE_DIR_NAME, os.path.dirname(arff_files[did - 2]),
+            )
+        removed = openml.utils.remove_unused_blobs()
+        self.assertEqual(len(removed), 1)
+        self.assertFalse(os.path.exists(removed[0]))
+
     def test_deletion_of_cache_dir(self):
         # Simple removal
         did_cache_dir = openml.utils._create_cache_directory_for_id(
@@ -332,6 +547,10 @@ class TestOpenMLDataset(TestBase):
         labels = openml.datasets.get_dataset(2).retrieve_class_labels(
             target_name='product-type')
         self.assertEqual(labels, ['C', 'H', 'G'])
+        dataset = openml.datasets.get_dataset(2)
+        dataset.format = 'csv'
+        six.assertRaisesRegex(self, ValueError, 'Unknown data format csv',
+                              dataset.retrieve_class_labels)
 
     def test_upload_dataset_with_url(self):
         dataset = OpenMLDataset(
@@ -1,3 +1,13 @@
+import re
+import sys
+
+if sys.version_info[0] >= 3:
+    from unittest import mock
+else:
+    import mock
+
+import numpy as np
+
 import openml
 import openml.evaluations
 from openml.testing import TestBase
@@ -70,3 +80,230 @@ class TestEvaluationFunctions(TestBase):
             raise ValueError('UnitTest Outdated, got somehow results')
 
         self.assertIsInstance(evaluations, dict)
+
+    @mock.patch('openml._api_calls._perform_api_call')
+    def test_list_evaluations_parse(self, api_call_mock):
+        evaluation = ('<oml:evaluation><oml:run_id>%d</oml:run_id>'
+                      '<oml:task_id>1</oml:task_id>'
+                      '<oml:setup_id>2</oml:setup_id>'
+                      '<oml:flow_id>3</oml:flow_id>'
+                      '<oml:flow_name>weka.J48</oml:flow_name>'
+                      '<oml:data_id>4</oml:data_id>'
+                      '<oml:data_name>anneal</oml:data_name>'
+                      '<oml:function>predictive_accuracy</oml:function>'
+                      '<oml:upload_time>2014-01-01 00:00:00</oml:upload_time>'
+                      '<oml:value>0.5</oml:value></oml:evaluation>')
+        api_call_mock.return_value = (
+            '<oml:evaluations xmlns:oml="http://openml.org/openml">%s%s'
+            '</oml:evaluations>' % (evaluation % 10, evaluation % 11))
+        evaluations = openml.evaluations.functions._list_evaluations(
+            'predictive_accuracy', task=[1])
+        self.assertEqual(sorted(evaluations), [10, 11])
+        self.assertEqual(evaluations[10].run_id, 10)
+        self.assertEqual(evaluations[10].flow_id, 3)
+        self.assertEqual(evaluations[10].flow_name, 'weka.J48')
+        self.assertEqual(evaluations[11].value, 0.5)
+        self.assertIsNone(evaluations[11].array_data)
+        self.assertFalse(hasattr(evaluations[11], '__dict__'))
+
+        xml_string = api_call_mock.return_value
+
+        def api_call(call, *args, **kwargs):
+            # Listings are paginated until there are no further results
+            if re.search('/offset/[1-9]', call):
+                raise openml.exceptions.OpenMLServerNoResult(542, 'No results')
+            return xml_string
+
+        api_call_mock.side_effect = api_call
+        columns = openml.evaluations.list_evaluations(
+            'predictive_accuracy', task=[1], output_format='array')
+        self.assertEqual(list(columns), [
+            'run_id', 'task_id', 'setup_id', 'flow_id', 'flow_name',
+            'data_id', 'data_name', 'function', 'upload_time', 'value',
+            'array_data'])
+        self.assertEqual(sorted(columns['run_id']), [10, 11])
+        self.assertEqual(list(columns['value']), [0.5, 0.5])
+
+    @mock.patch('openml._api_calls._perform_api_call')
+    def test_list_evaluations_columns(self, api_call_mock):
+        evaluation = ('<oml:evaluation><oml:run_id>%d</oml:run_id>'
+                      '<oml:task_id>%d</oml:task_id>'
+                      '<oml:setup_id>%d</oml:setup_id>'
+                      '<oml:flow_id>3</oml:flow_id>'
+                      '<oml:flow_name>%s</oml:flow_name>'
+                      '<oml:data_id>4</oml:data_id>'
+                      '<oml:data_name>anneal</oml:data_name>'
+                      '<oml:function>predictive_accuracy</oml:function>'
+                      '<oml:upload_time>2014-01-01 00:00:00</oml:upload_time>'
+                      '%s</oml:evaluation>')
+        pages = [
+            [evaluation % (10, 1, 2, 'weka.J48', '<oml:value>0.5</oml:value>'),
+             evaluation % (11, 1, 5, 'weka.ZeroR', '<oml:value>0.25</oml:value>')],
+            [evaluation % (12, 7, 5, 'weka.ZeroR', '<oml:value>0.75</oml:value>'),
+             evaluation % (13, 7, 5, 'weka.J48', '')],
+            [evaluation % (14, 7, 5, 'weka.ZeroR', '<oml:value>0.25</oml:value>')],
+        ]
+
+        def api_call(call, *args, **kwargs):
+            page = int(re.search('/offset/([0-9]+)', call).group(1)) // 2
+            if page >= len(pages):
+                raise openml.exceptions.OpenMLServerNoResult(542, 'No results')
+            return ('<oml:evaluations xmlns:oml="http://openml.org/openml">'
+                    '%s</oml:evaluations>' % ''.join(pages[page]))
+
+        api_call_mock.side_effect = api_call
+        openml.config.listing_min_batch_size = 2
+        openml.config.listing_max_batch_size = 2
+
+        columns = openml.evaluations.list_evaluations(
+            'predictive_accuracy', output_format='array')
+        self.assertEqual(api_call_mock.call_count, 4)
+        self.assertEqual(list(columns['run_id']), [10, 11, 12, 13, 14])
+        self.assertEqual(columns['run_id'].dtype, np.int32)
+        self.assertEqual(columns['data_id'].dtype, np.int32)
+        self.assertEqual(list(columns['flow_name']), [
+            'weka.J48', 'weka.ZeroR', 'weka.ZeroR', 'weka.J48', 'weka.ZeroR'])
+        self.assertEqual(columns['value'].dtype, np.float64)
+        self.assertTrue(np.isnan(columns['value'][3]))
+        self.assertEqual(columns['upload_time'][0],
+                         np.datetime64('2014-01-01T00:00:00'))
+
+        matrix, tasks, setups = openml.evaluations.pivot_evaluations(columns)
+        self.assertEqual(list(tasks), [1, 7])
+        self.assertEqual(list(setups), [2, 5])
+        np.testing.assert_array_equal(matrix, [[0.5, 0.25], [np.nan, 0.5]])
+        matrix, _, _ = openml.evaluations.pivot_evaluations(columns,
+                                                            aggregate='max')
+        np.testing.assert_array_equal(matrix, [[0.5, 0.25], [np.nan, 0.75]])
+        matrix, flows, _ = openml.evaluations.pivot_evaluations(
+            columns, index='flow_name', aggregate='min')
+        self.assertEqual(list(flows), ['weka.J48', 'weka.ZeroR'])
+        np.testing.assert_array_equal(matrix, [[0.5, np.nan], [np.nan, 0.25]])
+
+        if openml.utils.pandas is not None:
+            api_call_mock.reset_mock()
+            frame = openml.evaluations.list_evaluations(
+                'predictive_accuracy', output_format='dataframe')
+            self.assertEqual(list(frame.index), [10, 11, 12, 13, 14])
+            self.assertEqual(frame['flow_name'].dtype.name, 'category')
+            matrix, _, _ = openml.evaluations.pivot_evaluations(frame)
+            np.testing.assert_array_equal(matrix,
+                                          [[0.5, 0.25], [np.nan, 0.5]])
+
+    @mock.patch('openml._api_calls._perform_api_call')
+    def test_list_evaluations_of_functions(self, api_call_mock):
+        evaluation = ('<oml:evaluation><oml:run_id>%d</oml:run_id>'
+                      '<oml:task_id>1</oml:task_id>'
+                      '<oml:setup_id>%d</oml:setup_id>'
+                      '<oml:flow_id>3</oml:flow_id>'
+                      '<oml:flow_name>weka.J48</oml:flow_name>'
+                      '<oml:data_id>4</oml:data_id>'
+                      '<oml:data_name>anneal</oml:data_name>'
+                      '<oml:function>%s</oml:function>'
+                      '<oml:upload_time>2014-01-01 00:00:00</oml:upload_time>'
+                      '<oml:value>%f</oml:value></oml:evaluation>')
+        responses = {
+            'predictive_accuracy': [(10, 2, 0.5), (11, 2, 0.75)],
+            'area_under_roc_curve': [(12, 5, 0.25), (10, 2, 0.625)],
+        }
+        functions = []
+
+        def api_call(call, *args, **kwargs):
+            function = re.search('/function/([a-z_]+)', call).group(1)
+            functions.append(function)
+            if re.search('/offset/[1-9]', call):
+                raise openml.exceptions.OpenMLServerNoResult(542, 'No results')
+            return ('<oml:evaluations xmlns:oml="http://openml.org/openml">'
+                    '%s</oml:evaluations>' % ''.join(
+                        evaluation % (run_id, setup_id, function, value)
+                        for run_id, setup_id, value in responses[function]))
+
+        api_call_mock.side_effect = api_call
+        function_list = ['predictive_accuracy', 'area_under_roc_curve']
+
+        evaluations = openml.evaluations.list_evaluations(function_list)
+        self.assertEqual(sorted(set(functions)), sorted(function_list))
+        self.assertEqual(sorted(evaluations), [10, 11, 12])
+        self.assertEqual(sorted(evaluations[10]), sorted(function_list))
+        self.assertEqual(evaluations[10]['area_under_roc_curve'].value, 0.625)
+        self.assertEqual(list(evaluations[12]), ['area_under_roc_curve'])
+
+        columns = openml.evaluations.list_evaluations(
+            function_list, output_format='array')
+        self.assertEqual(list(columns), [
+            'run_id', 'task_id', 'setup_id', 'flow_id', 'flow_name',
+            'data_id', 'data_name', 'predictive_accuracy',
+            'area_under_roc_curve'])
+        self.assertEqual(list(columns['run_id']), [10, 11, 12])
+        self.assertEqual(list(columns['setup_id']), [2, 2, 5])
+        self.assertEqual(list(columns['flow_name']), ['weka.J48'] * 3)
+        np.testing.assert_array_equal(columns['predictive_accuracy'],
+                                      [0.5, 0.75, np.nan])
+        np.testing.assert_array_equal(columns['area_under_roc_curve'],
+                                      [0.625, np.nan, 0.25])
+
+        self.assertRaisesRegexp(ValueError, 'At least one',
+                                openml.evaluations.list_evaluations, [])
+
+    @mock.patch('openml._api_calls._perform_api_call')
+    def test_sync(self, api_call_mock):
+        evaluation = ('<oml:evaluation><oml:run_id>%d</oml:run_id>'
+                      '<oml:task_id>%d</oml:task_id>'
+                      '<oml:setup_id>2</oml:setup_id>'
+                      '<oml:flow_id>%d</oml:flow_id>'
+                      '<oml:flow_name>weka.J48</oml:flow_name>'
+                      '<oml:data_id>4</oml:data_id>'
+                      '<oml:data_name>anneal</oml:data_name>'
+                      '<oml:function>predictive_accuracy</oml:function>'
+                      '<oml:upload_time>2014-01-01 00:00:00</oml:upload_time>'
+                      '<oml:value>0.5</oml:value></oml:evaluation>')
+        # run_id, task_id, flow_id of the evaluations on the server
+        server = [(10, 1, 3), (11, 1, 5), (12, 7, 3)]
+        offsets = []
+
+        def api_call(call, *args, **kwargs):
+            offset = int(re.search('/offset/([0-9]+)', call).group(1))
+            offsets.append(offset)
+            page = server[offset:offset + 2]
+            if len(page) == 0:
+                raise openml.exceptions.OpenMLServerNoResult(542, 'No results')
+            return ('<oml:evaluations xmlns:oml="http://openml.org/openml">'
+                    '%s</oml:evaluations>'
+                    % ''.join(evaluation % ids for ids in page))
+
+        api_call_mock.side_effect = api_call
+        openml.config.listing_min_batch_size = 2
+        openml.config.listing_max_batch_size = 2
+        sync = openml.evaluations.sync
+        list_local = openml.evaluations.list_local_evaluations
+
+        with mock.patch('openml.evaluations.warehouse.SYNC_OVERLAP', 1):
+            self.assertEqual(sync('predictive_accuracy'), 3)
+            self.assertEqual(offsets, [0, 2, 4])
+
+            # Only the end of the listing is requested again
+            server.extend([(13, 7, 5), (14, 8, 3)])
+            del offsets[:]
+            self.assertEqual(sync('predictive_accuracy'), 2)
+            self.assertEqual(offsets, [2, 4, 6])
+
+            # Filters are synced separately
+            self.assertEqual(sorted(list_local('predictive_accuracy',
+                                               task=[7], flow=[3])), [12])
+            self.assertEqual(list_local('area_under_roc_curve'), {})
+
+            # The listing shifted further than the overlap
+            del server[:3]
+            del offsets[:]
+            self.assertEqual(sync('predictive_accuracy'), 0)
+            self.assertEqual(offsets, [4, 0, 2])
+
+        evaluations = list_local('predictive_accuracy')
+        self.assertEqual(sorted(evaluations), [10, 11, 12, 13, 14])
+        self.assertEqual(evaluations[13].flow_id, 5)
+        self.assertEqual(evaluations[13].data_id, 4)
+        self.assertEqual(evaluations[13].value, 0.5)
+        columns = list_local('predictive_accuracy', setup=[2],
+                             output_format='array')
+        self.assertEqual(list(columns['run_id']), [10, 11, 12, 13, 14])
+        self.assertEqual(list(columns['task_id']), [1, 1, 7, 7, 8])
@@ -1,6 +1,7 @@
 import collections
 import copy
 import hashlib
+import os
 import re
 import sys
 import time
@@ -67,6 +68,47 @@ class TestFlow(TestBase):
         self.assertEqual(subflow_3.parameters['L'], '-1')
         self.assertEqual(len(subflow_3.components), 0)
 
+    @mock.patch('openml._api_calls._perform_api_call')
+    def test_get_flow_cached(self, api_call_mock):
+        model = sklearn.pipeline.Pipeline(steps=[
+            ('scaler', sklearn.preprocessing.StandardScaler()),
+            ('classifier', sklearn.tree.DecisionTreeClassifier()),
+        ])
+        flow = openml.flows.sklearn_to_flow(model)
+        flow.flow_id = 1
+        flow.components['scaler'].flow_id = 2
+        flow.components['classifier'].flow_id = 3
+        api_call_mock.return_value = flow._to_xml()
+
+        downloaded = openml.flows.get_flow(1)
+        self.assertEqual(api_call_mock.call_count, 1)
+        self.assertTrue(os.path.exists(os.path.join(
+            self.workdir, 'org', 'openml', 'test', 'flows', '1', 'flow.xml')))
+
+        # Neither the memory nor the disk cache needs to download the flow
+        self.assertEqual(openml.flows.get_flow(1).flow_id, 1)
+        openml.utils.clear_memory_cache()
+        cached = openml.flows.get_flow(1)
+        self.assertEqual(api_call_mock.call_count, 1)
+        openml.flows.functions.assert_flows_equal(downloaded, cached)
+        self.assertEqual(
+            openml.utils.cache_stats()['entity_types']['flows']['count'], 1)
+
+    @mock.patch('openml._api_calls._perform_api_call')
+    def test_flow_exists_remembered(self, api_call_mock):
+        api_call_mock.return_value = xmltodict.unparse({'oml:flow_exists': {
+            'oml:exists': 'false', 'oml:id': -1}})
+        self.assertFalse(openml.flows.flow_exists('flow', '1.0'))
+        # Flows which do not exist yet are looked up again
+        self.assertFalse(openml.flows.flow_exists('flow', '1.0'))
+        self.assertEqual(api_call_mock.call_count, 2)
+
+        api_call_mock.return_value = xmltodict.unparse({'oml:flow_exists': {
+            'oml:exists': 'true', 'oml:id': 5}})
+        self.assertEqual(openml.flows.flow_exists('flow', '1.0'), 5)
+        self.assertEqual(openml.flows.flow_exists('flow', '1.0'), 5)
+        self.assertEqual(api_call_mock.call_count, 3)
+
     def test_tagging(self):
         flow_list = openml.flows.list_flows(size=1)
         flow_id = list(flow_list.keys())[0]
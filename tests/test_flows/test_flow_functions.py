@@ -1,7 +1,14 @@
 from collections import OrderedDict
 import copy
+import re
+import sys
 import unittest
 
+if sys.version_info[0] >= 3:
+    from unittest import mock
+else:
+    import mock
+
 import six
 
 import openml
@@ -31,6 +38,42 @@ class TestFlowFunctions(unittest.TestCase):
         for fid in flows:
             self._check_flow(flows[fid])
 
+    @mock.patch('openml._api_calls._perform_api_call')
+    def test_list_flows_parse(self, api_call_mock):
+        api_call_mock.return_value = (
+            '<oml:flows xmlns:oml="http://openml.org/openml">'
+            '<oml:flow><oml:id>1</oml:id>'
+            '<oml:full_name>weka.J48(1)</oml:full_name>'
+            '<oml:name>weka.J48</oml:name><oml:version>1</oml:version>'
+            '<oml:external_version>Weka_3.7.5</oml:external_version>'
+            '<oml:uploader>2</oml:uploader></oml:flow>'
+            '<oml:flow><oml:id>3</oml:id>'
+            '<oml:full_name>weka.ZeroR(1)</oml:full_name>'
+            '<oml:name>weka.ZeroR</oml:name><oml:version>1</oml:version>'
+            '<oml:external_version/><oml:uploader>2</oml:uploader>'
+            '</oml:flow></oml:flows>'
+        )
+        flows = openml.flows.functions._list_flows()
+        self.assertEqual(sorted(flows), [1, 3])
+        for fid in flows:
+            self._check_flow(flows[fid])
+        self.assertEqual(flows[1]['external_version'], 'Weka_3.7.5')
+
+        xml_string = api_call_mock.return_value
+
+        def api_call(call, *args, **kwargs):
+            # Listings are paginated until there are no further results
+            if re.search('/offset/[1-9]', call):
+                raise openml.exceptions.OpenMLServerNoResult(500, 'No results')
+            return xml_string
+
+        api_call_mock.side_effect = api_call
+        flows = openml.flows.list_flows(output_format='record')
+        self.assertEqual(flows[3], openml.flows.functions.FlowRecord(
+            3, 'weka.ZeroR(1)', 'weka.ZeroR', '1', None, '2'))
+        columns = openml.flows.list_flows(output_format='array')
+        self.assertEqual(sorted(columns['id']), [1, 3])
+
     def test_list_flows_empty(self):
         flows = openml.flows.list_flows(tag='NoOneEverUsesThisTag123')
         if len(flows) > 0:
@@ -30,7 +30,7 @@ import openml
 from openml.flows import OpenMLFlow, sklearn_to_flow, flow_to_sklearn
 from openml.flows.functions import assert_flows_equal
 from openml.flows.sklearn_converter import _format_external_version, \
-    _check_dependencies, _check_n_jobs
+    _check_dependencies, _check_n_jobs, _clear_model_templates
 from openml.exceptions import PyOpenMLError
 
 this_directory = os.path.dirname(os.path.abspath(__file__))
@@ -698,3 +698,33 @@ class TestSklearn(unittest.TestCase):
 
         for i in range(len(illegal_models)):
             self.assertRaises(PyOpenMLError, _check_n_jobs, illegal_models[i])
+
+    def test_flow_to_sklearn_template(self):
+        _clear_model_templates()
+        model = sklearn.pipeline.Pipeline(steps=[
+            ('scaler', sklearn.preprocessing.StandardScaler()),
+            ('classifier', sklearn.tree.DecisionTreeClassifier(max_depth=3)),
+        ])
+        flow = sklearn_to_flow(model)
+
+        deserialize = 'openml.flows.sklearn_converter._deserialize_model'
+        with mock.patch(deserialize,
+                        wraps=openml.flows.sklearn_converter._deserialize_model) \
+                as deserialize_mock:
+            first = flow_to_sklearn(flow)
+            n_calls = deserialize_mock.call_count
+            second = flow_to_sklearn(flow)
+            # The second model is cloned from the cached template
+            self.assertEqual(deserialize_mock.call_count, n_calls)
+
+        self.assertIsNot(first, second)
+        self.assertIsNot(first.steps[1][1], second.steps[1][1])
+        self.assertEqual(str(first.get_params()), str(second.get_params()))
+
+        # Changing one model does not change the template
+        second.set_params(classifier__max_depth=5)
+        self.assertEqual(flow_to_sklearn(flow).steps[1][1].max_depth, 3)
+
+        # A different parameter value results in a different model
+        flow.components['classifier'].parameters['max_depth'] = '4'
+        self.assertEqual(flow_to_sklearn(flow).steps[1][1].max_depth, 4)
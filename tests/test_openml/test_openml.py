@@ -1,3 +1,6 @@
+import gzip
+import io
+import os
 import sys
 
 if sys.version_info[0] >= 3:
@@ -37,4 +40,92 @@ class TestInit(TestBase):
         self.assertEqual(task_mock.call_count, 2)
         for argument, fixture in six.moves.zip(task_mock.call_args_list, [(1,), (2,)]):
             self.assertEqual(argument[0], fixture)
-            
\ No newline at end of file
+            
+    def test_multipart_body(self):
+        def _rows():
+            for i in range(1000):
+                yield u'%d,\u00e4\n' % i
+
+        fh = io.BytesIO(b'@relation test')
+        body = openml._api_calls._MultipartBody(
+            {'api_key': 'abc', 'empty': None},
+            {'dataset': fh, 'predictions': ('predictions.arff', _rows())},
+        )
+        content = b''
+        while True:
+            chunk = body.read(100)
+            if not chunk:
+                break
+            self.assertLessEqual(len(chunk), 100)
+            content += chunk
+        body.close()
+        self.assertEqual(len(content), len(body))
+
+        boundary = ('--' + body.boundary).encode('ascii')
+        parts = content.split(boundary)
+        self.assertEqual(parts[0], b'')
+        self.assertEqual(parts[-1], b'--\r\n')
+        self.assertEqual(len(parts), 5)
+        self.assertEqual(
+            parts[1],
+            b'\r\nContent-Disposition: form-data; name="api_key"\r\n\r\n'
+            b'abc\r\n')
+        self.assertEqual(
+            parts[2],
+            b'\r\nContent-Disposition: form-data; name="dataset"; '
+            b'filename="dataset"\r\n\r\n@relation test\r\n')
+        predictions = parts[3].split(b'\r\n\r\n', 1)[1]
+        self.assertEqual(predictions,
+                         u''.join(_rows()).encode('utf8') + b'\r\n')
+
+    def test_multipart_body_compression(self):
+        content = u''.join(u'%d,0.5,a\n' % i for i in range(10000))
+        body = openml._api_calls._MultipartBody(
+            {}, {'description': ('description.xml', u'<xml/>'),
+                 'predictions': ('predictions.arff', iter([content]))},
+            compression='gzip',
+        )
+        parts = body.read().split(('--' + body.boundary).encode('ascii'))
+        body.close()
+        self.assertIn(b'<xml/>', parts[1])
+        headers, compressed = parts[2].split(b'\r\n\r\n', 1)
+        self.assertIn(b'filename="predictions.arff.gz"', headers)
+        self.assertIn(b'Content-Type: application/gzip', headers)
+        compressed = compressed[:-2]
+        self.assertLess(len(compressed), len(content) / 2)
+        with gzip.GzipFile(fileobj=io.BytesIO(compressed)) as fh:
+            self.assertEqual(fh.read().decode('utf8'), content)
+
+        self.assertRaisesRegexp(ValueError, 'Unknown upload compression',
+                                openml._api_calls._MultipartBody, {}, {},
+                                compression='bz2')
+
+    def test_check_arff(self):
+        path = os.path.join(self.workdir, 'data.arff')
+        header = (u'@RELATION test\n@ATTRIBUTE a NUMERIC\n'
+                  u'@ATTRIBUTE b {x,y}\n@DATA\n')
+        rows = [u'%d,%s\n' % (i, 'xy'[i % 2]) for i in range(10000)]
+        with io.open(path, 'w', encoding='utf8') as fh:
+            fh.write(header + u''.join(rows))
+        openml._api_calls._check_arff(path)
+        openml._api_calls._check_arff(path, full=True)
+
+        # A single invalid row is only found by the full validation
+        rows[5001] = u'1,z\n'
+        with io.open(path, 'w', encoding='utf8') as fh:
+            fh.write(header + u''.join(rows))
+        openml._api_calls._check_arff(path, sample_size=10)
+        self.assertRaisesRegexp(ValueError, 'not a valid arff file',
+                                openml._api_calls._check_arff, path,
+                                full=True)
+
+        # Invalid rows at the beginning, the end and in the header are found
+        for i in (0, 9999):
+            invalid = list(rows)
+            invalid[i] = u'1,z\n'
+            with io.open(path, 'w', encoding='utf8') as fh:
+                fh.write(header + u''.join(invalid))
+            self.assertRaises(ValueError, openml._api_calls._check_arff, path)
+        with io.open(path, 'w', encoding='utf8') as fh:
+            fh.write(header.replace(u'NUMERIC', u'NUMBER') + u''.join(rows))
+        self.assertRaises(ValueError, openml._api_calls._check_arff, path)
@@ -1,8 +1,18 @@
+import collections
+import os
+import re
 from time import time
 
+import mock
+import numpy as np
+import requests
+import six
+from requests.packages.urllib3.exceptions import MaxRetryError, \
+    NewConnectionError
 from sklearn.ensemble import RandomForestClassifier, AdaBoostClassifier
 from sklearn.linear_model import LogisticRegression
 from sklearn.model_selection import RandomizedSearchCV, StratifiedKFold
+import xmltodict
 
 from openml.testing import TestBase
 from openml.flows.sklearn_converter import sklearn_to_flow
@@ -66,3 +76,198 @@ class TestRun(TestBase):
         run.remove_tag(tag)
         run_list = openml.runs.list_runs(tag=tag)
         self.assertEqual(len(run_list), 0)
+
+    def _create_executed_run(self, task_id=1882, flow_id=1):
+        model = RandomizedSearchCV(LogisticRegression(), {'C': [0.1, 1.0]},
+                                   n_iter=2)
+        flow = sklearn_to_flow(model)
+        flow.flow_id = flow_id
+        flow.components['estimator'].flow_id = flow_id + 1
+        run = OpenMLRun(task_id=task_id, flow_id=flow_id, dataset_id=2,
+                        model=model, tags=['openml-python'],
+                        flow_name=flow.name)
+        run.parameter_settings = OpenMLRun._parse_parameters(flow)
+        run.data_content = [[0, fold, 0, row_id, 0.25, 0.75,
+                             'b' if row_id % 2 else 'a', 'a']
+                            for fold in range(2) for row_id in range(5)]
+        run.trace_attributes = [('repeat', 'NUMERIC'), ('fold', 'NUMERIC'),
+                                ('iteration', 'NUMERIC'),
+                                ('evaluation', 'NUMERIC'),
+                                ('selected', ['true', 'false']),
+                                ('parameter_C', 'STRING')]
+        run.trace_content = [[0, fold, iteration, 0.5 + iteration / 10,
+                              'true' if iteration else 'false',
+                              '%f' % [0.1, 1.0][iteration]]
+                             for fold in range(2) for iteration in range(2)]
+        run.fold_evaluations = {'predictive_accuracy': {0: {0: 0.5, 1: 0.7}}}
+        return run
+
+    def test_to_filesystem(self):
+        run = self._create_executed_run()
+        directory = os.path.join(self.workdir, 'run')
+        run.to_filesystem(directory)
+
+        loaded = openml.runs.from_filesystem(directory)
+        self.assertEqual(loaded._create_description_xml(),
+                         run._create_description_xml())
+        self.assertEqual(loaded.data_content, run.data_content)
+        self.assertEqual(loaded.trace_content, run.trace_content)
+        self.assertEqual(loaded.trace_attributes, run.trace_attributes)
+        self.assertEqual(loaded.dataset_id, 2)
+        self.assertEqual(loaded.flow_name, run.flow_name)
+        self.assertEqual(str(loaded.model), str(run.model))
+
+        # A run without trace and model replaces the stored one
+        run.trace_content = None
+        run.trace_attributes = None
+        run.to_filesystem(directory, store_model=False)
+        loaded = openml.runs.from_filesystem(directory)
+        self.assertIsNone(loaded.trace_content)
+        self.assertIsNone(loaded.model)
+
+    def test_to_filesystem_value_types(self):
+        run = self._create_executed_run()
+        # Regression predictions mixing integers and floats, and a column
+        # with missing values
+        for i, row in enumerate(run.data_content):
+            row[4] = i if i % 2 else i + 0.1
+            row[5] = None if i % 3 else 0.5
+        run.trace_content = None
+        directory = os.path.join(self.workdir, 'run')
+        run.to_filesystem(directory, store_model=False)
+
+        with np.load(os.path.join(directory, 'predictions.npz'),
+                     allow_pickle=False) as columns:
+            self.assertEqual(columns['column_0'].dtype.kind, 'i')
+            self.assertEqual(columns['column_6'].dtype.kind, 'U')
+        loaded = openml.runs.from_filesystem(directory)
+        self.assertEqual(loaded.data_content, run.data_content)
+        for loaded_row, row in zip(loaded.data_content, run.data_content):
+            self.assertEqual([type(value) for value in loaded_row],
+                             [type(value) for value in row])
+
+    def test_local_run_catalog(self):
+        local_ids = [openml.runs.store_run(self._create_executed_run(task_id))
+                     for task_id in (1, 2, 2)]
+        self.assertEqual(len(set(local_ids)), 3)
+
+        runs = openml.runs.list_local_runs(task=[2])
+        self.assertEqual(list(runs), local_ids[1:])
+        self.assertEqual(runs[local_ids[1]]['evaluations'],
+                         {'predictive_accuracy': 0.6})
+        self.assertEqual(len(openml.runs.list_local_runs(flow=[1])), 3)
+        self.assertEqual(len(openml.runs.list_local_runs(task=[1],
+                                                         flow=[2])), 0)
+
+        run = openml.runs.load_local_run(local_ids[0])
+        self.assertEqual(run.task_id, 1)
+        self.assertEqual(len(run.data_content), 10)
+
+        openml.runs.remove_local_run(local_ids[0])
+        self.assertEqual(list(openml.runs.list_local_runs()), local_ids[1:])
+        self.assertRaises(IOError, openml.runs.load_local_run, local_ids[0])
+
+    @mock.patch('openml.runs.upload._find_latest_run')
+    @mock.patch('openml.runs.run.get_task')
+    @mock.patch('openml._api_calls._perform_api_call')
+    def test_upload_queue(self, api_call_mock, get_task_mock,
+                          find_latest_run_mock):
+        find_latest_run_mock.return_value = 0
+        get_task_mock.return_value = mock.Mock(task_id=1882,
+                                               class_labels=['a', 'b'])
+        directory = os.path.join(self.workdir, 'upload_queue')
+        response = ('<oml:upload_run xmlns:oml="http://openml.org/openml">'
+                    '<oml:run_id>%d</oml:run_id></oml:upload_run>')
+
+        # The first upload is retried, the second one fails. The connection
+        # is refused, so the runs did not reach the server.
+        refused = requests.exceptions.ConnectionError(
+            MaxRetryError(None, '/run/', NewConnectionError(None, 'refused')))
+        api_call_mock.side_effect = [refused, response % 10, refused, refused]
+        with openml.runs.UploadQueue(directory, n_threads=1, max_retries=1,
+                                     retry_delay=0) as queue:
+            run = self._create_executed_run()
+            self.assertEqual(run.publish_async(queue).result(), 10)
+            self.assertEqual(run.run_id, 10)
+            failed = self._create_executed_run()
+            future = failed.publish_async(queue)
+            self.assertIsInstance(future.exception(),
+                                  requests.exceptions.ConnectionError)
+            self.assertIsNone(failed.run_id)
+        self.assertEqual(api_call_mock.call_count, 4)
+        files = api_call_mock.call_args[1]['file_dictionary']
+        self.assertEqual(sorted(files), ['description', 'predictions',
+                                         'trace'])
+
+        # The failed upload is still on disk and uploaded by the next queue
+        api_call_mock.side_effect = None
+        api_call_mock.return_value = response % 11
+        with openml.runs.UploadQueue(directory) as queue:
+            self.assertEqual([future.result() for future in queue.recovered],
+                             [11])
+        self.assertEqual(queue.pending(), [])
+
+    @mock.patch('openml.runs.run.get_task')
+    @mock.patch('openml._api_calls._perform_api_call')
+    def test_upload_queue_request_may_have_been_sent(self, api_call_mock,
+                                                     get_task_mock):
+        get_task_mock.return_value = mock.Mock(task_id=1882,
+                                               class_labels=['a', 'b'])
+        run = self._create_executed_run()
+        setup = collections.OrderedDict([
+            ('oml:setup_id', 5), ('oml:flow_id', 1),
+            ('oml:parameter', [collections.OrderedDict([
+                ('oml:id', i), ('oml:flow_id', parameter['oml:component']),
+                ('oml:full_name', parameter['oml:name']),
+                ('oml:parameter_name', parameter['oml:name']),
+                ('oml:data_type', None), ('oml:default_value', None),
+                ('oml:value', parameter['oml:value']),
+            ]) for i, parameter in enumerate(run.parameter_settings)]),
+        ])
+        run_ids = [7]
+
+        def api_call(call, *args, **kwargs):
+            if call == '/run/':
+                uploads.append(call)
+                if len(uploads) == 1:
+                    # Timed out before the request reached the server
+                    raise requests.exceptions.ReadTimeout()
+                run_ids.append(12)
+                # The response to this request is lost as well
+                raise requests.exceptions.ReadTimeout()
+            # Listings are paginated until there are no further results
+            if re.search('/offset/[1-9]', call):
+                raise openml.exceptions.OpenMLServerNoResult(512,
+                                                             'No results')
+            if call.startswith('setup/list'):
+                return xmltodict.unparse({'oml:setups': {
+                    '@xmlns:oml': 'http://openml.org/openml',
+                    'oml:setup': [setup]}})
+            return xmltodict.unparse({'oml:runs': {
+                '@xmlns:oml': 'http://openml.org/openml',
+                'oml:run': [collections.OrderedDict([
+                    ('oml:run_id', run_id), ('oml:task_id', 1882),
+                    ('oml:setup_id', 5), ('oml:flow_id', 1),
+                    ('oml:uploader', 1)]) for run_id in run_ids]}})
+
+        uploads = []
+        api_call_mock.side_effect = api_call
+        # Run 7 was uploaded before and is not taken for the queued run, which
+        # is uploaded again. The second request reached the server, the run
+        # is not uploaded a third time.
+        directory = os.path.join(self.workdir, 'upload_queue')
+        with openml.runs.UploadQueue(directory, retry_delay=0) as queue:
+            self.assertEqual(run.publish_async(queue).result(), 12)
+        self.assertEqual(len(uploads), 2)
+        self.assertEqual(queue.pending(), [])
+
+        # A run which may have been sent but cannot be looked up on the
+        # server is kept in the queue
+        run.parameter_settings = []
+        with openml.runs.UploadQueue(directory, retry_delay=0) as queue:
+            future = run.publish_async(queue)
+            six.assertRaisesRegex(self, ValueError,
+                                  'may have been uploaded already',
+                                  future.result)
+            self.assertEqual(len(queue.pending()), 1)
+        self.assertEqual(len(uploads), 3)
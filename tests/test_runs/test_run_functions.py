@@ -1,11 +1,19 @@
 import arff
 import collections
 import json
+import os
 import random
+import re
 import time
 import sys
 
+if sys.version_info[0] >= 3:
+    from unittest import mock
+else:
+    import mock
+
 import numpy as np
+import xmltodict
 
 import openml
 import openml.exceptions
@@ -572,6 +580,190 @@ class TestRun(TestBase):
             run_ids = _run_exists(task.task_id, setup_exists)
             self.assertTrue(run_ids, msg=(run_ids, clf))
 
+    @mock.patch('openml._api_calls._perform_api_call')
+    def test_prefetch_run_lookups(self, api_call_mock):
+        model = sklearn.pipeline.Pipeline(steps=[
+            ('VarianceThreshold', VarianceThreshold()),
+            ('Estimator', DecisionTreeClassifier()),
+        ])
+        server_flow = sklearn_to_flow(model)
+        server_flow.flow_id = 1
+        server_flow.components['VarianceThreshold'].flow_id = 2
+        server_flow.components['Estimator'].flow_id = 3
+        seeded_model = _get_seeded_model(sklearn.base.clone(model), seed=1)
+        parameters = openml.runs.OpenMLRun._parse_parameters(server_flow,
+                                                             seeded_model)
+
+        def setup_dict(setup_id, parameters):
+            # The server returns null values as empty values
+            return collections.OrderedDict([
+                ('oml:setup_id', setup_id),
+                ('oml:flow_id', 1),
+                ('oml:parameter', [collections.OrderedDict([
+                    ('oml:id', i),
+                    ('oml:flow_id', parameter['oml:component']),
+                    ('oml:full_name', parameter['oml:name']),
+                    ('oml:parameter_name', parameter['oml:name']),
+                    ('oml:data_type', None),
+                    ('oml:default_value', None),
+                    ('oml:value', None if parameter['oml:value'] == 'null'
+                     else parameter['oml:value']),
+                ]) for i, parameter in enumerate(parameters)]),
+            ])
+
+        other_parameters = [dict(parameter) for parameter in parameters]
+        other_parameters[0]['oml:value'] = '0.5'
+        responses = {
+            'flow/exists': xmltodict.unparse({'oml:flow_exists': {
+                'oml:exists': 'true', 'oml:id': 1}}),
+            'flow/1': server_flow._to_xml(),
+            'setup/list': xmltodict.unparse({'oml:setups': {
+                '@xmlns:oml': 'http://openml.org/openml',
+                'oml:setup': [setup_dict(10, parameters),
+                              setup_dict(11, other_parameters)]}}),
+            'run/list': xmltodict.unparse({'oml:runs': {
+                '@xmlns:oml': 'http://openml.org/openml',
+                'oml:run': [collections.OrderedDict([
+                    ('oml:run_id', 100), ('oml:task_id', 1),
+                    ('oml:setup_id', 10), ('oml:flow_id', 1),
+                    ('oml:uploader', 1)])]}}),
+        }
+
+        def api_call(call, *args, **kwargs):
+            # Listings are paginated until there are no further results
+            if re.search('/offset/[1-9]', call):
+                raise openml.exceptions.OpenMLServerNoResult(512,
+                                                             'No results')
+            return [response for prefix, response in responses.items()
+                    if call.startswith(prefix)][0]
+
+        api_call_mock.side_effect = api_call
+
+        self.assertIn('null', [parameter['oml:value']
+                               for parameter in parameters])
+        setup_ids = openml.runs.prefetch_run_lookups([1, 2], [model], seed=1)
+        self.assertEqual(setup_ids, [10])
+        n_calls = api_call_mock.call_count
+
+        # All lookups of the duplicate check are answered locally
+        self.assertEqual(openml.flows.flow_exists(server_flow.name,
+                                                  server_flow.external_version),
+                         1)
+        self.assertEqual(openml.setups.setup_exists(server_flow,
+                                                    seeded_model), 10)
+        self.assertEqual(_run_exists(1, 10), set([100]))
+        self.assertEqual(_run_exists(2, 10), set())
+        self.assertEqual(api_call_mock.call_count, n_calls)
+
+        # Known runs expire
+        openml.config.cache_ttl_run_lookups = 0
+        _run_exists(1, 10)
+        self.assertGreater(api_call_mock.call_count, n_calls)
+
+    @mock.patch('openml._api_calls._perform_api_call')
+    def test_run_models_on_tasks(self, api_call_mock):
+        openml.config.cache_directory = self.static_cache_dir
+        openml.config.cache_ttl_description = None
+        openml.config.cache_ttl_qualities = None
+
+        models = [DummyClassifier(strategy='most_frequent'),
+                  DummyClassifier(strategy='most_frequent'),
+                  DummyClassifier(strategy='prior')]
+        server_flow = sklearn_to_flow(models[0])
+        server_flow.flow_id = 1
+
+        def api_call(call, *args, **kwargs):
+            if call == 'flow/exists':
+                return xmltodict.unparse({'oml:flow_exists': {
+                    'oml:exists': 'true', 'oml:id': 1}})
+            elif call == 'flow/1':
+                return server_flow._to_xml()
+            elif call == '/setup/exists/':
+                return xmltodict.unparse({'oml:setup_exists': {
+                    'oml:exists': 'false', 'oml:id': -1}})
+            # There are no setups of the flow on the server yet
+            raise openml.exceptions.OpenMLServerNoResult(674, 'No results')
+
+        api_call_mock.side_effect = api_call
+
+        runs = {}
+        for n_jobs in (None, 2):
+            runs[n_jobs] = list(openml.runs.run_models_on_tasks(
+                models, [1882], seed=1, n_jobs=n_jobs))
+            # The duplicate model is only run once
+            self.assertEqual(len(runs[n_jobs]), 2)
+            for run in runs[n_jobs]:
+                self.assertEqual(run.task_id, 1882)
+                self.assertEqual(run.flow_id, 1)
+                self.assertEqual(run.dataset_id, 2)
+                # 10 times 10-fold cross-validation on 898 instances
+                self.assertEqual(len(run.data_content), 8980)
+                self.assertEqual(len(run.fold_evaluations[
+                    'predictive_accuracy'][0]), 10)
+
+        # Folds executed in other processes give the same predictions
+        strategies = lambda runs: [run.model.strategy for run in runs]
+        self.assertEqual(strategies(runs[None]), strategies(runs[2]))
+        for run, other_run in zip(runs[None], runs[2]):
+            self.assertEqual(run.data_content, other_run.data_content)
+        # Models are not changed
+        self.assertIsNone(models[0].random_state)
+
+        # Runs stored in the local run catalog are not run again
+        openml.runs.store_run(runs[None][0], store_model=False)
+        runs = list(openml.runs.run_models_on_tasks(models, [1882], seed=1))
+        self.assertEqual(strategies(runs), ['prior'])
+
+    @mock.patch('openml._api_calls._perform_api_call')
+    def test_run_model_on_task_resume(self, api_call_mock):
+        openml.config.cache_directory = self.static_cache_dir
+        openml.config.cache_ttl_description = None
+        openml.config.cache_ttl_qualities = None
+        task = openml.tasks.get_task(1882)
+
+        model = DummyClassifier(strategy='stratified')
+        server_flow = sklearn_to_flow(model)
+        server_flow.flow_id = 1
+        api_call_mock.side_effect = lambda call, *args, **kwargs: {
+            'flow/exists': xmltodict.unparse({'oml:flow_exists': {
+                'oml:exists': 'true', 'oml:id': 1}}),
+            'flow/1': server_flow._to_xml(),
+            '/setup/exists/': xmltodict.unparse({'oml:setup_exists': {
+                'oml:exists': 'false', 'oml:id': -1}}),
+        }[call]
+
+        run_model_on_fold = openml.runs.functions._run_model_on_fold
+        random_states = []
+        crash = [True]
+
+        def crash_after_30_folds(model, *args, **kwargs):
+            if crash[0] and len(random_states) == 30:
+                raise MemoryError()
+            random_states.append(model.random_state)
+            return run_model_on_fold(model, *args, **kwargs)
+
+        with mock.patch('openml.runs.functions._run_model_on_fold',
+                        side_effect=crash_after_30_folds):
+            self.assertRaises(MemoryError,
+                              openml.runs.run_model_on_task, task,
+                              sklearn.base.clone(model), resume=True)
+            checkpoint_dir, = os.listdir(os.path.join(
+                openml.config.get_cache_directory(), 'run_checkpoints'))
+            del random_states[:]
+            crash[0] = False
+            run = openml.runs.run_model_on_task(
+                task, sklearn.base.clone(model), resume=True)
+
+        # Only the remaining folds were executed, with the same random state
+        self.assertEqual(len(random_states), 70)
+        self.assertEqual(len(set(random_states)), 1)
+        self.assertEqual(run.model.random_state, random_states[0])
+        self.assertEqual(len(run.data_content), 8980)
+        self.assertEqual(len(run.fold_evaluations['predictive_accuracy']), 10)
+        self.assertFalse(os.path.exists(os.path.join(
+            openml.config.get_cache_directory(), 'run_checkpoints',
+            checkpoint_dir)))
+
     def test__get_seeded_model(self):
         # randomized models that are initialized without seeds, can be seeded
         randomized_clfs = [
@@ -1,7 +1,13 @@
+import re
 import sys
 import hashlib
 import time
 
+if sys.version_info[0] >= 3:
+    from unittest import mock
+else:
+    import mock
+
 import openml
 import openml.exceptions
 from openml.testing import TestBase
@@ -144,6 +150,46 @@ class TestSetupFunctions(TestBase):
 
         self.assertIsInstance(setups, dict)
 
+    @mock.patch('openml._api_calls._perform_api_call')
+    def test_list_setups_output_format(self, api_call_mock):
+        parameter = ('<oml:parameter><oml:id>%d</oml:id>'
+                     '<oml:flow_id>5</oml:flow_id>'
+                     '<oml:full_name>weka.J48(1)_%s</oml:full_name>'
+                     '<oml:parameter_name>%s</oml:parameter_name>'
+                     '<oml:data_type>option</oml:data_type>'
+                     '<oml:default_value>0.25</oml:default_value>'
+                     '<oml:value>%s</oml:value></oml:parameter>')
+        api_call_mock.return_value = (
+            '<oml:setups xmlns:oml="http://openml.org/openml">'
+            '<oml:setup><oml:setup_id>1</oml:setup_id>'
+            '<oml:flow_id>5</oml:flow_id>%s%s</oml:setup>'
+            '<oml:setup><oml:setup_id>2</oml:setup_id>'
+            '<oml:flow_id>5</oml:flow_id>%s</oml:setup></oml:setups>'
+            % (parameter % (10, 'C', 'C', '0.1'),
+               parameter % (11, 'M', 'M', '2'),
+               parameter % (10, 'C', 'C', '0.3'))
+        )
+        xml_string = api_call_mock.return_value
+
+        def api_call(call, *args, **kwargs):
+            # Listings are paginated until there are no further results
+            if re.search('/offset/[1-9]', call):
+                raise openml.exceptions.OpenMLServerNoResult(674, 'No results')
+            return xml_string
+
+        api_call_mock.side_effect = api_call
+        setups = openml.setups.list_setups(output_format='record')
+        self.assertEqual(setups[1].parameters[11].value, '2')
+        self.assertFalse(hasattr(setups[1], '__dict__'))
+        self.assertFalse(hasattr(setups[1].parameters[11], '__dict__'))
+
+        columns = openml.setups.list_setups(output_format='array')
+        self.assertEqual(list(columns), ['setup_id', 'flow_id',
+                                         'weka.J48(1)_C', 'weka.J48(1)_M'])
+        self.assertEqual(list(columns['setup_id']), [1, 2])
+        self.assertEqual(list(columns['weka.J48(1)_C']), ['0.1', '0.3'])
+        self.assertEqual(list(columns['weka.J48(1)_M']), ['2', None])
+
     def test_setuplist_offset(self):
         # TODO: remove after pull on live for better testing
         # openml.config.server = self.production_server
@@ -158,6 +204,18 @@ class TestSetupFunctions(TestBase):
 
         self.assertEqual(len(all), size * 2)
 
+    def test_get_parameters_hash(self):
+        _get_parameters_hash = openml.setups.functions._get_parameters_hash
+        # Values serialized by the client match the values of the server
+        self.assertEqual(
+            _get_parameters_hash([(1, 'max_depth', 'null'),
+                                  (2, 'C', '1'), (2, 'kernel', '"rbf"')]),
+            _get_parameters_hash([(2, 'kernel', '"rbf"'), (2, 'C', 1),
+                                  ('1', 'max_depth', None)]),
+        )
+        self.assertNotEqual(_get_parameters_hash([(2, 'C', '1')]),
+                            _get_parameters_hash([(2, 'C', '"1"')]))
+
     def test_get_cached_setup(self):
         openml.config.cache_directory = self.static_cache_dir
         openml.setups.functions._get_cached_setup(1)
@@ -1,5 +1,7 @@
 import inspect
 import os
+import shutil
+import tempfile
 import unittest
 
 import numpy as np
@@ -15,17 +17,17 @@ class OpenMLSplitTest(unittest.TestCase):
         __file__ = inspect.getfile(OpenMLSplitTest)
         self.directory = os.path.dirname(__file__)
         # This is for dataset
-        self.arff_filename = os.path.join(
+        static_arff_filename = os.path.join(
             self.directory, "..", "files", "org", "openml", "test",
             "tasks", "1882", "datasplits.arff"
         )
-        self.pd_filename = self.arff_filename.replace(".arff", ".pkl")
+        # Reading the splits caches them next to the arff, work on a copy
+        self.workdir = tempfile.mkdtemp()
+        self.arff_filename = os.path.join(self.workdir, "datasplits.arff")
+        shutil.copy(static_arff_filename, self.arff_filename)
 
     def tearDown(self):
-        try:
-            os.remove(self.pd_filename)
-        except:
-            pass
+        shutil.rmtree(self.workdir)
 
     def test_eq(self):
         split = OpenMLSplit._from_arff_file(self.arff_filename)
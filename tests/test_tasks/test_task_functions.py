@@ -1,4 +1,5 @@
 import os
+import shutil
 import sys
 
 import six
@@ -24,6 +25,24 @@ class TestTask(TestBase):
         self.assertEqual(len(tasks), 3)
         self.assertIsInstance(list(tasks.values())[0], OpenMLTask)
 
+    def test__get_cached_tasks_from_index(self):
+        for tid in (1, 3):
+            task_dir = openml.utils._create_cache_directory_for_id('tasks', tid)
+            shutil.copy(os.path.join(self.static_cache_dir, 'org', 'openml',
+                                     'test', 'tasks', str(tid), 'task.xml'),
+                        task_dir)
+        tasks = openml.tasks.functions._get_cached_tasks()
+        self.assertEqual(list(tasks), [1, 3])
+
+        # The second time the tasks are created from the index of the cache
+        with mock.patch('openml.tasks.functions._get_cached_task') as mocked:
+            cached_tasks = openml.tasks.functions._get_cached_tasks()
+        self.assertEqual(mocked.call_count, 0)
+        self.assertEqual(list(cached_tasks), [1, 3])
+        for tid in (1, 3):
+            self.assertEqual(cached_tasks[tid].__dict__,
+                             tasks[tid].__dict__)
+
     def test__get_cached_task(self):
         openml.config.cache_directory = self.static_cache_dir
         task = openml.tasks.functions._get_cached_task(1)
@@ -74,6 +93,32 @@ class TestTask(TestBase):
 
         self.assertIsInstance(tasks, dict)
 
+    @mock.patch('openml.tasks.functions._get_estimation_procedure_list')
+    @mock.patch('openml._api_calls._perform_api_call')
+    def test_list_tasks_parse(self, api_call_mock, procedures_mock):
+        procedures_mock.return_value = [
+            {'id': 1, 'name': '10-fold Crossvalidation'}]
+        api_call_mock.return_value = (
+            '<oml:tasks xmlns:oml="http://openml.org/openml">'
+            '<oml:task><oml:task_id>1</oml:task_id>'
+            '<oml:task_type_id>1</oml:task_type_id><oml:did>1</oml:did>'
+            '<oml:name>anneal</oml:name>'
+            '<oml:task_type>Supervised Classification</oml:task_type>'
+            '<oml:status>active</oml:status>'
+            '<oml:input name="estimation_procedure">1</oml:input>'
+            '<oml:input name="target_feature">class</oml:input>'
+            '<oml:quality name="NumberOfClasses">6.0</oml:quality>'
+            '<oml:quality name="NumberOfMissingValues"/>'
+            '</oml:task></oml:tasks>'
+        )
+        tasks = openml.tasks.functions._list_tasks(task_type_id=1)
+        self.assertEqual(tasks, {1: {
+            'tid': 1, 'ttid': 1, 'did': 1, 'name': 'anneal',
+            'task_type': 'Supervised Classification', 'status': 'active',
+            'estimation_procedure': '10-fold Crossvalidation',
+            'target_feature': 'class', 'NumberOfClasses': 6,
+            'NumberOfMissingValues': 0.0}})
+
     def test_list_tasks_by_tag(self):
         num_basic_tasks = 100 # number is flexible, check server if fails
         tasks = openml.tasks.list_tasks(tag='study_14')
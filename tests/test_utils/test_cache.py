@@ -0,0 +1,331 @@
+import os
+import shutil
+import sys
+import threading
+import time
+import unittest
+
+if sys.version_info[0] >= 3:
+    from unittest import mock
+else:
+    import mock
+
+import openml
+import openml.cache
+from openml.testing import TestBase
+
+
+class TestCache(TestBase):
+    _multiprocess_can_split_ = True
+
+    def _create_entity(self, entity_type, entity_id, size):
+        entity_dir = openml.utils._create_cache_directory_for_id(
+            entity_type, entity_id,
+        )
+        with open(os.path.join(entity_dir, 'description.xml'), 'wb') as fh:
+            fh.write(b'0' * size)
+        openml.cache._record_access(entity_type, entity_id)
+        return entity_dir
+
+    def test_cache_stats(self):
+        self._create_entity('datasets', 1, 100)
+        self._create_entity('datasets', 2, 200)
+        self._create_entity('tasks', 1, 50)
+        stats = openml.utils.cache_stats()
+        self.assertEqual(stats['size'], 350)
+        self.assertEqual(stats['count'], 3)
+        self.assertEqual(stats['entity_types']['datasets']['size'], 300)
+        self.assertEqual(stats['entity_types']['datasets']['count'], 2)
+        self.assertEqual(stats['entity_types']['tasks']['count'], 1)
+
+    def test_rebuild_cache_index(self):
+        self._create_entity('runs', 1, 100)
+        os.remove(openml.cache._get_index_file())
+        # The index is rebuilt from the cache directory
+        stats = openml.utils.cache_stats()
+        self.assertEqual(stats['count'], 1)
+        self.assertEqual(stats['entity_types']['runs']['size'], 100)
+
+    def test_cached_entity_index(self):
+        entity_dir = openml.utils._create_cache_directory_for_id('runs', 1)
+        # Newly created directories are indexed right away
+        entry = openml.cache._get_cached_entity('runs', 1)
+        self.assertEqual(entry['files'], [])
+        self.assertIsNone(entry['fields'])
+
+        with open(os.path.join(entity_dir, 'description.xml'), 'wb') as fh:
+            fh.write(b'0' * 10)
+        openml.cache._record_access('runs', 1, fields={'task_id': 2},
+                                    checksum='abc')
+        entry = openml.cache._get_cached_entity('runs', 1)
+        self.assertEqual(entry['files'], ['description.xml'])
+        self.assertEqual(entry['size'], 10)
+        self.assertEqual(entry['fields'], {'task_id': 2})
+        self.assertEqual(entry['checksum'], 'abc')
+        self.assertEqual(list(openml.cache._get_cached_entities('runs')), [1])
+        self.assertIsNone(openml.cache._get_cached_entity('runs', 2))
+
+        # Parsed fields are lost when rebuilding the index, files are not
+        openml.utils.rebuild_cache_index()
+        entry = openml.cache._get_cached_entity('runs', 1)
+        self.assertEqual(entry['files'], ['description.xml'])
+        self.assertIsNone(entry['fields'])
+
+    def test_cached_entities_changed_on_disk(self):
+        self._create_entity('runs', 1, 10)
+        self._create_entity('runs', 2, 10)
+        # Directories changed by other means are indexed again when listing
+        runs_dir = os.path.join(openml.config.get_cache_directory(), 'runs')
+        shutil.copytree(os.path.join(runs_dir, '1'),
+                        os.path.join(runs_dir, '3'))
+        shutil.rmtree(os.path.join(runs_dir, '2'))
+        time.sleep(0.01)
+        with open(os.path.join(runs_dir, '1', 'predictions.arff'), 'wb') as fh:
+            fh.write(b'0' * 5)
+        entries = openml.cache._get_cached_entities('runs')
+        self.assertEqual(list(entries), [1, 3])
+        self.assertEqual(entries[1]['files'],
+                         ['description.xml', 'predictions.arff'])
+        self.assertEqual(entries[1]['size'], 15)
+        self.assertEqual(entries[3]['files'], ['description.xml'])
+
+    def test_prune_cache_lru(self):
+        dirs = [self._create_entity('datasets', did, 100)
+                for did in range(1, 5)]
+        # Dataset 1 is used again and therefore the most recently used
+        time.sleep(0.01)
+        openml.cache._record_access('datasets', 1)
+
+        self.assertEqual(openml.utils.prune_cache(250, dry_run=True),
+                         [('datasets', 2), ('datasets', 3)])
+        self.assertTrue(all(os.path.exists(dir_) for dir_ in dirs))
+
+        removed = openml.utils.prune_cache(250)
+        self.assertEqual(removed, [('datasets', 2), ('datasets', 3)])
+        self.assertEqual([os.path.exists(dir_) for dir_ in dirs],
+                         [True, False, False, True])
+        self.assertEqual(openml.utils.cache_stats()['size'], 200)
+
+    def test_prune_cache_lfu(self):
+        for did in range(1, 4):
+            self._create_entity('datasets', did, 100)
+        openml.cache._record_access('datasets', 1)
+        openml.cache._record_access('datasets', 3)
+        removed = openml.utils.prune_cache(200, policy='lfu')
+        self.assertEqual(removed, [('datasets', 2)])
+
+    def test_prune_cache_skips_entities_in_use(self):
+        for did in range(1, 4):
+            self._create_entity('datasets', did, 100)
+        with openml.cache._lock_entity('datasets', 1):
+            removed = openml.utils.prune_cache(100)
+        self.assertEqual(removed, [('datasets', 2), ('datasets', 3)])
+
+    def test_lock_entity_shared(self):
+        lock = openml.cache._get_entity_lock('datasets', 1)
+        with openml.cache._lock_entity('datasets', 1, shared=True):
+            # Readers do not block each other, but block writers
+            with openml.cache._lock_entity('datasets', 1, shared=True):
+                self.assertFalse(lock.acquire(blocking=False))
+        self.assertTrue(lock.acquire(blocking=False))
+        lock.release()
+
+        # Writers block readers of other threads
+        events = []
+        def read():
+            with openml.cache._lock_entity('datasets', 1, shared=True):
+                events.append('read')
+        with openml.cache._lock_entity('datasets', 1):
+            reader = threading.Thread(target=read)
+            reader.start()
+            time.sleep(0.1)
+            events.append('written')
+        reader.join()
+        self.assertEqual(events, ['written', 'read'])
+
+    @unittest.skipIf(openml.cache.fcntl is None, 'requires fcntl')
+    def test_lock_entity_waiting_for_other_process(self):
+        lock = openml.cache._get_entity_lock('datasets', 1)
+        # Lock the lock file like another process would
+        other_process = openml.cache._InterProcessLock(
+            lock._process_lock.path,
+        )
+        other_process.acquire()
+        reader = threading.Thread(target=lock.acquire,
+                                  kwargs={'shared': True})
+        reader.daemon = True
+        reader.start()
+        time.sleep(0.1)
+        # The waiting reader does not block the other threads
+        self.assertFalse(lock.acquire(shared=True, blocking=False))
+        self.assertFalse(lock.acquire(blocking=False))
+        other_process.release()
+        reader.join(5)
+        self.assertFalse(reader.is_alive())
+        lock.release(shared=True)
+
+    def test_cache_size_limit(self):
+        openml.config.cache_size_limit = 250
+        dirs = [self._create_entity('datasets', did, 100)
+                for did in range(1, 4)]
+        self.assertEqual(openml.utils.cache_stats()['count'], 2)
+        self.assertEqual([os.path.exists(dir_) for dir_ in dirs],
+                         [False, True, True])
+
+    def test_cache_size_limit_threshold(self):
+        openml.config.cache_size_limit = 1000
+        openml.cache._added_since_prune = 0
+        self._create_entity('datasets', 1, 990)
+        # The limit is only enforced once 5% of it were added
+        self._create_entity('datasets', 2, 20)
+        self.assertEqual(openml.utils.cache_stats()['size'], 1010)
+        self._create_entity('datasets', 3, 40)
+        self.assertEqual(openml.utils.cache_stats()['size'], 60)
+
+    def test_cache_size_blobs(self):
+        self._create_entity('runs', 1, 10)
+        arff_files = []
+        for did in (1, 2):
+            did_cache_dir = openml.utils._create_cache_directory_for_id(
+                'datasets', did,
+            )
+            arff_files.append(os.path.join(did_cache_dir, 'dataset.arff'))
+            if did == 1:
+                with open(arff_files[0], 'wb') as fh:
+                    fh.write(b'0' * 100)
+                openml.cache._store_blob(arff_files[0], 'abc')
+            else:
+                openml.cache._link_blob(openml.cache._get_blob_file('abc'),
+                                        arff_files[1])
+            openml.cache._record_access('datasets', did)
+        # The file is used by two datasets but counts only once
+        stats = openml.utils.cache_stats()
+        self.assertEqual(stats['size'], 110)
+        self.assertEqual(stats['blob_size'], 100)
+        self.assertEqual(stats['entity_types']['datasets']['size'], 0)
+
+        # The blob is shared with other servers, whose caches count it too
+        blob_file = openml.cache._get_blob_file('abc')
+        self.assertTrue(blob_file.startswith(openml.config.cache_directory))
+        self.assertFalse(blob_file.startswith(
+            openml.config.get_cache_directory()))
+        server = openml.config.server
+        openml.config.server = 'https://www.openml.org/api/v1/xml'
+        did_cache_dir = openml.utils._create_cache_directory_for_id(
+            'datasets', 1,
+        )
+        openml.cache._link_blob(blob_file,
+                                os.path.join(did_cache_dir, 'dataset.arff'))
+        openml.cache._record_access('datasets', 1)
+        self.assertEqual(openml.utils.cache_stats()['size'], 100)
+        openml.config.server = server
+
+        # Removing the first dataset frees no space, the second one does
+        self.assertEqual(openml.utils.prune_cache(105, dry_run=True,
+                                                  entity_types=['datasets']),
+                         [('datasets', 1), ('datasets', 2)])
+        self.assertEqual(openml.utils.prune_cache(105,
+                                                  entity_types=['datasets']),
+                         [('datasets', 1), ('datasets', 2)])
+        self.assertEqual(openml.utils.cache_stats()['size'], 10)
+        # The other server still uses the blob
+        self.assertTrue(os.path.exists(blob_file))
+
+    def test_parse_size(self):
+        self.assertEqual(openml.config._parse_size('None'), None)
+        self.assertEqual(openml.config._parse_size('1024'), 1024)
+        self.assertEqual(openml.config._parse_size('2K'), 2048)
+        self.assertEqual(openml.config._parse_size('1.5GB'),
+                         int(1.5 * 1024 ** 3))
+
+    def test_parse_duration(self):
+        self.assertEqual(openml.config._parse_duration('None'), None)
+        self.assertEqual(openml.config._parse_duration('60'), 60)
+        self.assertEqual(openml.config._parse_duration('30m'), 1800)
+        self.assertEqual(openml.config._parse_duration('1.5d'), 129600)
+
+    def test_memory_cache(self):
+        run_dir = openml.utils._create_cache_directory_for_id('runs', 1)
+        shutil.copy(os.path.join(self.static_cache_dir, 'org', 'openml',
+                                 'test', 'runs', '1', 'description.xml'),
+                    run_dir)
+        run = openml.runs.get_run(1)
+        self.assertEqual(openml.utils.memory_cache_stats(),
+                         {'hits': 0, 'misses': 1, 'size': 1, 'max_size': 100})
+
+        # The run is not parsed again and modifying it does not change the
+        # cached run
+        run.task_id = -1
+        with mock.patch('openml.runs.functions._get_cached_run') as mocked:
+            cached_run = openml.runs.get_run(1)
+        self.assertEqual(mocked.call_count, 0)
+        self.assertNotEqual(cached_run.task_id, -1)
+        self.assertIsNot(cached_run, openml.runs.get_run(1))
+        self.assertEqual(openml.utils.memory_cache_stats()['hits'], 2)
+
+        openml.utils.clear_memory_cache('runs', 1)
+        self.assertEqual(openml.utils.memory_cache_stats()['size'], 0)
+        # Entities removed from the disk cache are removed from memory, too
+        openml.runs.get_run(1)
+        openml.utils._remove_cache_dir_for_id('runs', run_dir)
+        self.assertEqual(openml.utils.memory_cache_stats()['size'], 0)
+
+    def test_memory_cache_size(self):
+        openml.config.memory_cache_size = 2
+        for entity_id in range(1, 4):
+            openml.cache._memoize('runs', entity_id, {'id': entity_id})
+        self.assertIsNone(openml.cache._get_memoized('runs', 1))
+        self.assertEqual(openml.cache._get_memoized('runs', 3), {'id': 3})
+        # Expired entities are not returned
+        openml.cache._memoize('runs', 4, {'id': 4}, expires=time.time() - 1)
+        self.assertIsNone(openml.cache._get_memoized('runs', 4))
+        # Entities of another server are not returned
+        openml.config.server = 'https://www.openml.org/api/v1/xml'
+        self.assertIsNone(openml.cache._get_memoized('runs', 3))
+
+    def test_single_flight(self):
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def fetch(entity_id):
+            calls.append(entity_id)
+            started.set()
+            release.wait()
+            if entity_id == 2:
+                raise ValueError('Entity 2 does not exist')
+            return {'id': entity_id}
+
+        for entity_id in (1, 2):
+            results = []
+
+            def get():
+                try:
+                    results.append(openml.cache._single_flight(
+                        'flows', entity_id, fetch, entity_id))
+                except ValueError as e:
+                    results.append(e)
+
+            started.clear()
+            release.clear()
+            threads = [threading.Thread(target=get) for _ in range(4)]
+            threads[0].start()
+            started.wait()
+            for thread in threads[1:]:
+                thread.start()
+            # Give the other threads time to join the call in flight
+            time.sleep(0.1)
+            release.set()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(len(results), 4)
+            if entity_id == 1:
+                self.assertEqual(results, [{'id': 1}] * 4)
+                # All threads receive their own copy
+                self.assertEqual(len(set(id(result) for result in results)),
+                                 4)
+            else:
+                self.assertTrue(all(isinstance(result, ValueError)
+                                    for result in results))
+        self.assertEqual(calls, [1, 2])
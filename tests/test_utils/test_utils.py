@@ -1,4 +1,23 @@
+from collections import OrderedDict
+import os
+import re
+import stat
+import sys
+import threading
+import time
+import unittest
+
+import numpy as np
+import requests
+import six
+
+if sys.version_info[0] >= 3:
+    from unittest import mock
+else:
+    import mock
+
 from openml.testing import TestBase
+from openml.exceptions import OpenMLServerNoResult
 import openml
 
 
@@ -15,4 +34,313 @@ class OpenMLTaskTest(TestBase):
 
         # TODO implement these tests
         # datasets = openml.utils.list_all(list_datasets, limit=50)
-        # self.assertEqual(len(datasets), 50)
\ No newline at end of file
+        # self.assertEqual(len(datasets), 50)
+
+    def _set_batch_size(self, batch_size):
+        # Requesting the fake pages is fast, their size would grow otherwise
+        openml.config.listing_min_batch_size = batch_size
+        openml.config.listing_max_batch_size = batch_size
+
+    def _create_listing_call(self, n_records=25):
+        calls = []
+        requested = {}
+
+        def _list_records(limit, offset, tag=None):
+            calls.append((offset, limit, tag))
+            requested.setdefault(offset, threading.Event()).set()
+            if offset >= n_records:
+                raise OpenMLServerNoResult('No results')
+            return OrderedDict((i, {'id': i}) for i in
+                               range(offset, min(offset + limit, n_records)))
+
+        return _list_records, calls, requested
+
+    def test_iter_all(self):
+        self._set_batch_size(10)
+        listing_call, calls, requested = self._create_listing_call()
+        records = openml.utils.iter_all(listing_call, tag='study_1')
+        self.assertEqual(next(records), {'id': 0})
+        # The second page is requested while the first one is consumed
+        self.assertTrue(requested.setdefault(10, threading.Event()).wait(5))
+        self.assertEqual([record['id'] for record in records],
+                         list(range(1, 25)))
+        self.assertEqual(calls, [(0, 10, 'study_1'), (10, 10, 'study_1'),
+                                 (20, 10, 'study_1'), (30, 10, 'study_1')])
+
+        listing_call, calls, _ = self._create_listing_call()
+        records = list(openml.utils.iter_all(listing_call, offset=3, size=15))
+        self.assertEqual([record['id'] for record in records],
+                         list(range(3, 18)))
+        self.assertEqual(calls, [(3, 10, None), (13, 5, None)])
+
+        listing_call, calls, _ = self._create_listing_call(n_records=0)
+        self.assertRaises(OpenMLServerNoResult, list,
+                          openml.utils.iter_all(listing_call))
+
+    def test_list_all_pages(self):
+        self._set_batch_size(10)
+        listing_call, calls, _ = self._create_listing_call()
+        records = openml.utils.list_all(listing_call, offset=3, size=15)
+        self.assertEqual(sorted(records), list(range(3, 18)))
+        self.assertEqual(calls, [(3, 10, None), (13, 5, None)])
+
+    def test_list_all_concurrent(self):
+        self._set_batch_size(10)
+        openml.config.listing_concurrency = 3
+        listing_call, calls, _ = self._create_listing_call(n_records=45)
+        active = [0, 0]
+        lock = threading.Lock()
+
+        def _list_records(limit, offset):
+            with lock:
+                active[0] += 1
+                active[1] = max(active)
+            time.sleep(0.05)
+            try:
+                return listing_call(limit, offset)
+            finally:
+                with lock:
+                    active[0] -= 1
+
+        records = openml.utils.iter_all(_list_records)
+        self.assertEqual([record['id'] for record in records],
+                         list(range(45)))
+        self.assertGreater(active[1], 1)
+        self.assertLessEqual(active[1], 3)
+        offsets = sorted(call[0] for call in calls)
+        self.assertEqual(offsets[:6], [0, 10, 20, 30, 40, 50])
+
+        # A short first page is not followed by parallel requests
+        active[1] = 0
+        listing_call, calls, _ = self._create_listing_call(n_records=5)
+        records = openml.utils.list_all(_list_records)
+        self.assertEqual(sorted(records), list(range(5)))
+        self.assertEqual(calls, [(0, 10, None), (10, 10, None)])
+        self.assertEqual(active[1], 1)
+
+    def test_adapt_batch_size(self):
+        target = openml.utils.LISTING_TARGET_SECONDS
+        self.assertEqual(openml.utils._adapt_batch_size(1000, 1000, target),
+                         1000)
+        # Changes by at most a factor of two
+        self.assertEqual(openml.utils._adapt_batch_size(1000, 1000, 0), 2000)
+        self.assertEqual(openml.utils._adapt_batch_size(1000, 1000,
+                                                        target * 1.25), 800)
+        self.assertEqual(openml.utils._adapt_batch_size(1000, 1000,
+                                                        target * 10), 500)
+        # Large responses limit the page size
+        max_bytes = openml.utils.LISTING_MAX_PAGE_BYTES
+        self.assertEqual(openml.utils._adapt_batch_size(1000, 1000, 0,
+                                                        max_bytes), 1000)
+
+    def test_list_all_adaptive(self):
+        openml.config.listing_min_batch_size = 5
+        openml.config.listing_max_batch_size = 40
+        listing_call, calls, _ = self._create_listing_call(n_records=100)
+
+        # Listings start with the minimal page size, the fast fake server
+        # lets the pages grow up to the maximum
+        records = openml.utils.list_all(listing_call)
+        self.assertEqual(sorted(records), list(range(100)))
+        self.assertEqual([call[1] for call in calls], [5, 10, 20, 40, 40, 40])
+
+        # Too large pages time out and are requested in smaller pieces
+        def _list_records(limit, offset):
+            if limit > 10:
+                raise requests.exceptions.ReadTimeout()
+            return listing_call(limit, offset)
+
+        del calls[:]
+        records = openml.utils.iter_all(_list_records, size=60)
+        self.assertEqual([record['id'] for record in records],
+                         list(range(60)))
+        # The pages do not grow to the size which timed out again
+        self.assertEqual(calls, [(0, 5, None), (5, 10, None), (15, 10, None),
+                                 (25, 10, None), (35, 10, None),
+                                 (45, 10, None), (55, 5, None)])
+
+        # Pages of the minimal size are not split up further
+        openml.config.listing_min_batch_size = 20
+        self.assertRaises(requests.exceptions.ReadTimeout, list,
+                          openml.utils.iter_all(_list_records))
+
+    @mock.patch('requests.get')
+    def test_list_all_timeout(self, get_mock):
+        openml.config.listing_min_batch_size = 5
+        openml.config.listing_max_batch_size = 40
+        openml.config.listing_timeout = 3
+        limits = []
+
+        def _get(url, params, timeout):
+            self.assertEqual(timeout, 3)
+            limit, offset = [int(value) for value in re.search(
+                'limit/([0-9]+)/offset/([0-9]+)', url).groups()]
+            limits.append(limit)
+            # Pages of more than 20 results take longer than the timeout
+            if limit > 20:
+                raise requests.exceptions.ReadTimeout()
+            response = mock.Mock(status_code=200,
+                                 headers={'Content-Encoding': 'gzip'})
+            if offset >= 50:
+                response.status_code = 412
+                response.text = ('<oml:error xmlns:oml="http://openml.org/'
+                                 'openml"><oml:code>372</oml:code>'
+                                 '<oml:message>No results</oml:message>'
+                                 '</oml:error>')
+            else:
+                response.text = (
+                    '<oml:data xmlns:oml="http://openml.org/openml">%s'
+                    '</oml:data>' % ''.join(
+                        '<oml:dataset><oml:did>%d</oml:did><oml:name>d'
+                        '</oml:name><oml:format>ARFF</oml:format><oml:status>'
+                        'active</oml:status></oml:dataset>' % did
+                        for did in range(offset, min(offset + limit, 50))))
+            response.content = response.text.encode('utf8')
+            return response
+
+        get_mock.side_effect = _get
+        datasets = openml.datasets.list_datasets()
+        self.assertEqual(sorted(datasets), list(range(50)))
+        # The pages grow until they time out and are split up
+        self.assertEqual(limits, [5, 10, 20, 40, 20, 20, 20])
+
+        # Other requests wait for the server
+        get_mock.side_effect = None
+        get_mock.return_value = mock.Mock(
+            status_code=200, headers={'Content-Encoding': 'gzip'},
+            text='<oml:data_set_description/>', content=b'')
+        openml._api_calls._perform_api_call('data/1')
+        self.assertIsNone(get_mock.call_args[1]['timeout'])
+
+    def test_iter_listing(self):
+        xml_string = (
+            '<oml:runs xmlns:oml="http://openml.org/openml">'
+            '<oml:run><oml:run_id>1</oml:run_id><oml:name> a </oml:name>'
+            '<oml:tag>x</oml:tag><oml:tag>y</oml:tag></oml:run>'
+            '<oml:run><oml:run_id>2</oml:run_id><oml:name/></oml:run>'
+            '</oml:runs>'
+        )
+        records = openml.utils._iter_listing(xml_string, 'runs', 'run')
+        first = next(records)
+        self.assertEqual(openml.utils._get_child_texts(first),
+                         {'run_id': '1', 'name': 'a', 'tag': 'y'})
+        self.assertEqual([tag.text for tag in
+                          openml.utils._get_children(first, 'tag')],
+                         ['x', 'y'])
+        second = next(records)
+        # Processed records are discarded
+        self.assertEqual(len(first), 0)
+        self.assertEqual(openml.utils._get_child_texts(second),
+                         {'run_id': '2', 'name': None})
+        self.assertEqual(list(records), [])
+
+        six.assertRaisesRegex(self, ValueError, 'does not contain "oml:runs"',
+                              list, openml.utils._iter_listing(
+                                  xml_string.replace('openml.org', 'x'),
+                                  'runs', 'run'))
+        six.assertRaisesRegex(self, ValueError,
+                              'does not contain "oml:setups"',
+                              list, openml.utils._iter_listing(
+                                  xml_string, 'setups', 'setup'))
+
+    def test_records_to_columns(self):
+        records = OrderedDict([
+            (2, openml.datasets.functions.DatasetRecord(
+                2, 'anneal', 'ARFF', 'active',
+                {'NumberOfClasses': 5, 'MeanSkewness': 0.5})),
+            (3, openml.datasets.functions.DatasetRecord(
+                3, 'kr-vs-kp', 'ARFF', 'active', {'NumberOfClasses': 2})),
+        ])
+        self.assertIs(openml.utils._format_listing(records, 'record'),
+                      records)
+        columns = openml.utils._format_listing(records, 'array')
+        self.assertEqual(list(columns), ['did', 'name', 'format', 'status',
+                                         'NumberOfClasses', 'MeanSkewness'])
+        self.assertEqual(columns['did'].dtype, np.int64)
+        self.assertEqual(columns['name'].dtype, object)
+        self.assertEqual(list(columns['name']), ['anneal', 'kr-vs-kp'])
+        self.assertEqual(list(columns['NumberOfClasses']), [5, 2])
+        self.assertEqual(columns['MeanSkewness'].dtype, np.float64)
+        self.assertEqual(columns['MeanSkewness'][0], 0.5)
+        self.assertTrue(np.isnan(columns['MeanSkewness'][1]))
+
+        # Dicts which lack keys of other dicts
+        columns = openml.utils._records_to_columns([{'a': 1}, {'b': 'x'}])
+        self.assertEqual(list(columns), ['a', 'b'])
+        self.assertEqual(list(columns['b']), [None, 'x'])
+        self.assertEqual(openml.utils._records_to_columns([]), OrderedDict())
+
+        six.assertRaisesRegex(self, ValueError, 'Unknown output_format',
+                              openml.utils._format_listing, records,
+                              'columns')
+
+    @unittest.skipIf(openml.utils.pandas is None, 'requires pandas')
+    def test_format_listing_dataframe(self):
+        records = {1: openml.runs.functions.RunRecord(1, 2, 3, 4, 5),
+                   6: openml.runs.functions.RunRecord(6, 7, 8, 9, 10)}
+        frame = openml.utils._format_listing(records, 'dataframe')
+        self.assertEqual(list(frame.columns), ['run_id', 'task_id',
+                                               'setup_id', 'flow_id',
+                                               'uploader'])
+        self.assertEqual(frame.loc[6, 'task_id'], 7)
+
+    def test_open_compressed(self):
+        content = u'@RELATION test\n\u00e4\n'
+        for compression, suffix in openml.utils.COMPRESSION_SUFFIXES.items():
+            try:
+                self.assertEqual(
+                    openml.utils._get_compression_suffix(compression), suffix)
+            except ValueError:
+                # Optional compression library not installed
+                continue
+            filename = os.path.join(self.workdir, 'test.arff' + suffix)
+            with openml.utils._open_compressed(filename, 'wt') as fh:
+                fh.write(content)
+            with openml.utils._open_compressed(filename, 'rt') as fh:
+                self.assertEqual(fh.read(), content)
+
+        six.assertRaisesRegex(self, ValueError, 'Unknown compression bzip',
+                              openml.utils._get_compression_suffix, 'bzip')
+
+    def test_atomic_write(self):
+        directory = openml.utils._create_cache_directory_for_id('runs', 1)
+        filename = os.path.join(directory, 'description.xml')
+        with openml.utils._atomic_write(filename) as fh:
+            fh.write(u'<oml:data_set_description/>')
+        self.assertEqual(openml.utils._read_cache_file(filename),
+                         u'<oml:data_set_description/>')
+        manifest = openml.utils._read_manifest(directory)
+        self.assertEqual(manifest['description.xml']['size'], 27)
+
+        # An exception while writing neither changes the file nor leaves
+        # temporary files behind
+        try:
+            with openml.utils._atomic_write(filename) as fh:
+                fh.write(u'<oml:data_set')
+                raise KeyboardInterrupt()
+        except KeyboardInterrupt:
+            pass
+        self.assertEqual(sorted(os.listdir(directory)),
+                         ['description.xml', 'manifest.json'])
+        self.assertTrue(openml.utils._verify_cache_file(filename))
+
+        # Truncated files are not valid cache files
+        with open(filename, 'w') as fh:
+            fh.write('<oml:data_set')
+        self.assertFalse(openml.utils._verify_cache_file(filename))
+        self.assertRaises(IOError, openml.utils._read_cache_file, filename)
+
+    @unittest.skipIf(os.name == 'nt', 'file modes are not supported')
+    def test_atomic_write_mode(self):
+        directory = openml.utils._create_cache_directory_for_id('runs', 1)
+        with open(os.path.join(directory, 'other.xml'), 'w'):
+            pass
+        expected = stat.S_IMODE(
+            os.stat(os.path.join(directory, 'other.xml')).st_mode)
+        with openml.utils._atomic_write(
+                os.path.join(directory, 'description.xml')) as fh:
+            fh.write(u'<oml:run/>')
+        # Cache files can be read by other users like files written by open
+        for filename in ('description.xml', 'manifest.json'):
+            self.assertEqual(stat.S_IMODE(
+                os.stat(os.path.join(directory, filename)).st_mode), expected)